@@ -0,0 +1,90 @@
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+
+# Dashboards are built from several independent queries. Each query waits
+# on the database for most of its run time, so issuing them from a small
+# pool of threads makes a dashboard cost roughly its slowest query instead
+# of the sum of all of them.
+#
+# Django's async ORM is no help here: every async query is handed to the
+# same thread-sensitive executor, so the queries of one request still run
+# one after another. The pool works the same under WSGI and ASGI (where
+# sync views run in a per-request thread).
+#
+# Worker threads have their own database connections, so tasks run inline
+# whenever the caller is inside a transaction; the workers could not see
+# its uncommitted rows. A worker closes its connection after every task,
+# so a process holds at most DASHBOARD_QUERY_WORKERS extra connections,
+# and only while dashboards are being built.
+
+_lock = threading.Lock()
+_local = threading.local()
+_pool = {'executor': None}
+
+
+def _max_workers():
+    return getattr(settings, 'DASHBOARD_QUERY_WORKERS', 1)
+
+
+def _executor():
+    with _lock:
+        if _pool['executor'] is None:
+            _pool['executor'] = ThreadPoolExecutor(
+                max_workers=_max_workers(), thread_name_prefix='dashboard-query',
+            )
+        return _pool['executor']
+
+
+@atexit.register
+def _shutdown():
+    if _pool['executor'] is not None:
+        _pool['executor'].shutdown(wait=False)
+
+
+class serial:
+    """Context manager that makes ``run_concurrently`` run tasks inline in
+    the current thread, e.g. to measure the difference."""
+
+    def __enter__(self):
+        self.previous = getattr(_local, 'serial', False)
+        _local.serial = True
+
+    def __exit__(self, *exc_info):
+        _local.serial = self.previous
+
+
+def _run_in_worker(task):
+    _local.serial = True  # tasks that fan out again run inline
+    try:
+        return task()
+    finally:
+        # Persistent connections (CONN_MAX_AGE) would otherwise stay open
+        # in every idle worker
+        connection.close()
+
+
+def _inline():
+    return (
+        getattr(_local, 'serial', False)
+        or _max_workers() <= 1
+        or connection.in_atomic_block
+    )
+
+
+def run_concurrently(**tasks):
+    """Run independent zero-argument callables and return their results by
+    name. A queryset may be passed instead of a callable; it is evaluated
+    to a list."""
+    tasks = {
+        name: (lambda queryset=task: list(queryset)) if hasattr(task, '_fetch_all') else task
+        for name, task in tasks.items()
+    }
+    if len(tasks) < 2 or _inline():
+        return {name: task() for name, task in tasks.items()}
+    executor = _executor()
+    futures = {name: executor.submit(_run_in_worker, task) for name, task in tasks.items()}
+    return {name: future.result() for name, future in futures.items()}
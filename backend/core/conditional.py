@@ -0,0 +1,85 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .dashboard_cache import dashboard_entry, dashboard_key
+from .pagination import KeysetPagination
+
+
+def _etag(*parts):
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def _not_modified(request, etag, last_modified=None):
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def conditional_list(request, queryset, timestamp_field, respond):
+    """Answer a list request with a 304 when the client's copy is current.
+
+    The validators come from one aggregate over the filtered queryset (row
+    count, highest pk and newest ``timestamp_field``), so an unchanged list
+    is never fetched or serialized. ``respond`` builds the full response
+    otherwise.
+
+    Cursor pages are cheap range scans, so for them the page is built and
+    its ETag taken from its own rows instead of aggregating the whole list.
+    """
+    if KeysetPagination.is_requested(request):
+        response = respond()
+        if response.status_code != 200:
+            return response
+        body = json.dumps(response.data, cls=JSONEncoder, sort_keys=True)
+        etag = _etag(request.get_full_path(), request.user.pk, body)
+        response = _not_modified(request, etag) or response
+        response['ETag'] = etag
+        return response
+
+    fingerprint = queryset.order_by().aggregate(
+        count=Count('pk'), last_pk=Max('pk'), last_modified=Max(timestamp_field),
+    )
+    last_modified = fingerprint['last_modified']
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    etag = _etag(
+        request.get_full_path(), request.user.pk, fingerprint['count'], fingerprint['last_pk'],
+        last_modified.isoformat() if last_modified else '',
+    )
+
+    response = _not_modified(request, etag, timestamp)
+    if response is None:
+        response = respond()
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    return response
+
+
+def conditional_dashboard(request, scope, owner_id, compute, shared_scopes=(), variant=''):
+    """Serve a cached dashboard, answering with a 304 when the client already
+    holds the current version.
+
+    The ETag is derived from the cache versions and Last-Modified is the
+    time the cached data was computed, so checking them costs no queries.
+    Versions kept in a per-process cache do not move for other processes'
+    writes, so validators are only sent when DASHBOARD_ETAGS says the
+    cache is shared.
+    """
+    key = dashboard_key(scope, owner_id, shared_scopes, variant)
+    data, computed_at = dashboard_entry(key, compute)
+    if not getattr(settings, 'DASHBOARD_ETAGS', False):
+        return Response(data)
+
+    etag = _etag(key)
+    response = _not_modified(request, etag, computed_at)
+    if response is None:
+        response = Response(data)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(computed_at)
+    return response
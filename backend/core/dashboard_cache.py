@@ -0,0 +1,145 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+# Dashboard responses are cached under keys that embed the current version of
+# every scope they read from. Writes bump the owning scope's version instead
+# of deleting entries, so stale responses simply stop being addressed and
+# age out. Scopes are either per owner (a user, center or staff member) or
+# shared (``owner_id=None``) for data every dashboard of a kind shows.
+#
+# Saves and deletes bump versions through signal handlers in each app.
+# Queryset ``update()``/``bulk_create()`` bypass signals, so code writing
+# that way must call ``invalidate()`` itself. Versions live in the cache,
+# so a write retires the responses of every process sharing it (see
+# CACHES); anything else only expires after DASHBOARD_CACHE_TIMEOUT.
+
+STATS_KEYS = ('hits', 'misses', 'coalesced')
+LOCK_WAIT_INTERVAL = 0.05
+
+
+def _cache():
+    return caches[getattr(settings, 'DASHBOARD_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+
+
+def _lock_timeout():
+    return getattr(settings, 'DASHBOARD_CACHE_LOCK_TIMEOUT', 10)
+
+
+def _version_key(scope, owner_id):
+    return f'dashboard:version:{scope}:{owner_id if owner_id is not None else "*"}'
+
+
+def get_version(scope, owner_id=None):
+    cache = _cache()
+    key = _version_key(scope, owner_id)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted version can never come back as
+        # a value that older cached responses were stored under.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(scope, owner_id=None):
+    cache = _cache()
+    key = _version_key(scope, owner_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def invalidate(scope, owner_id=None):
+    """Retire cached dashboards for a scope.
+
+    The version is bumped immediately and again once the surrounding
+    transaction commits, so a request that recomputes in between cannot
+    leave a response built from pre-commit data cached under the new
+    version.
+    """
+    bump_version(scope, owner_id)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: bump_version(scope, owner_id))
+
+
+def _record(stat):
+    cache = _cache()
+    key = f'dashboard:stats:{stat}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def cache_stats():
+    cache = _cache()
+    values = cache.get_many([f'dashboard:stats:{stat}' for stat in STATS_KEYS])
+    return {stat: values.get(f'dashboard:stats:{stat}', 0) for stat in STATS_KEYS}
+
+
+def dashboard_key(scope, owner_id, shared_scopes=(), variant=''):
+    """Cache key of the current version of a dashboard response."""
+    versions = [get_version(scope, owner_id)]
+    versions += [get_version(shared) for shared in shared_scopes]
+    return f'dashboard:{scope}:{owner_id}:{variant}:' + '.'.join(str(v) for v in versions)
+
+
+def dashboard_entry(key, compute):
+    """``(data, computed_at)`` of the dashboard cached under ``key`` (see
+    ``dashboard_key``), computing it at most once per version.
+
+    Concurrent misses for the same key are coalesced: one request computes
+    while the others wait for its result, up to the lock timeout.
+    ``computed_at`` is the Unix time the data was computed.
+    """
+    cache = _cache()
+
+    entry = cache.get(key)
+    if entry is not None:
+        _record('hits')
+        return entry
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, _lock_timeout()):
+        try:
+            entry = (compute(), int(time.time()))
+            cache.set(key, entry, _timeout())
+        finally:
+            cache.delete(lock_key)
+        _record('misses')
+        return entry
+
+    deadline = time.monotonic() + _lock_timeout()
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            _record('coalesced')
+            return entry
+        if cache.get(lock_key) is None:
+            break
+
+    # The computing request failed or timed out; compute without the lock
+    _record('misses')
+    entry = (compute(), int(time.time()))
+    cache.set(key, entry, _timeout())
+    return entry
+
+
+def cached_dashboard(scope, owner_id, compute, shared_scopes=(), variant=''):
+    """Return ``compute()`` from the cache, computing it at most once per
+    version.
+
+    ``shared_scopes`` are owner-less scopes the response also depends on and
+    ``variant`` distinguishes responses for different query parameters.
+    """
+    return dashboard_entry(dashboard_key(scope, owner_id, shared_scopes, variant), compute)[0]
@@ -0,0 +1,98 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db import models
+
+# Pickups describe their materials in free-form JSON. Each app keeps a
+# line-item table derived from it, so per-material totals are SQL
+# aggregates. Accepted shapes:
+#
+#   {"plastic": 2.5, "paper": 1}
+#   [{"material": "plastic", "quantity": 2.5}, ...]   (also type/name, kg/weight_kg)
+#   ["plastic", "paper"] or "Plastic, Paper"          (quantity unknown, 0)
+#
+# Names are lower-cased and repeated materials are summed.
+
+MATERIAL_KEYS = ('material', 'type', 'name')
+QUANTITY_KEYS = ('quantity', 'quantity_kg', 'weight_kg', 'kg')
+MAX_MATERIAL_LENGTH = 50
+
+
+def _quantity(value):
+    try:
+        quantity = Decimal(str(value))
+    except (InvalidOperation, ValueError, TypeError):
+        return Decimal(0)
+    if not quantity.is_finite() or quantity < 0:
+        return Decimal(0)
+    return quantity.quantize(Decimal('0.01'))
+
+
+def _first(entry, keys):
+    return next((entry[key] for key in keys if key in entry), None)
+
+
+def material_quantities(value):
+    """``{material: Decimal kg}`` parsed from a pickup's materials JSON."""
+    if isinstance(value, dict):
+        pairs = value.items()
+    elif isinstance(value, str):
+        pairs = ((name, 0) for name in value.split(','))
+    elif isinstance(value, list):
+        pairs = (
+            (_first(entry, MATERIAL_KEYS), _first(entry, QUANTITY_KEYS)) if isinstance(entry, dict) else (entry, 0)
+            for entry in value
+        )
+    else:
+        pairs = ()
+
+    quantities = {}
+    for name, quantity in pairs:
+        if not isinstance(name, str) or not name.strip():
+            continue
+        material = name.strip().lower()[:MAX_MATERIAL_LENGTH]
+        quantities[material] = quantities.get(material, Decimal(0)) + _quantity(quantity)
+    return quantities
+
+
+class MaterialLineQuerySet(models.QuerySet):
+    """Queryset of a line-item model whose ``PARENT_FIELD`` points at the
+    pickup the lines were derived from."""
+
+    def replace_for(self, parent, quantities, existing=True, **fields):
+        """Make ``parent``'s lines match ``quantities``; ``fields`` are the
+        denormalized parent values stored on every line. Pass
+        ``existing=False`` for a new parent, which has no lines to delete."""
+        parent_field = self.model.PARENT_FIELD
+        if existing:
+            self.filter(**{parent_field: parent}).delete()
+        self.bulk_create(
+            self.model(**{parent_field: parent}, material=material, quantity_kg=quantity, **fields)
+            for material, quantity in quantities.items()
+        )
+
+    def totals_by_material(self, **filters):
+        """``{material: kg}`` for the lines, with one more total per
+        ``name=Q(...)`` filter, e.g. ``completed=Q(pickup__status='completed')``
+        gives ``{material: {'total': kg, 'completed': kg}}``."""
+        rows = self.order_by().values('material').annotate(
+            total=models.Sum('quantity_kg'),
+            **{name: models.Sum('quantity_kg', filter=condition) for name, condition in filters.items()},
+        )
+        if not filters:
+            return {row['material']: row['total'] for row in rows}
+        return {
+            row.pop('material'): {name: value or Decimal(0) for name, value in row.items()}
+            for row in rows
+        }
+
+
+def breakdown(*totals):
+    """Merge ``totals_by_material`` results (with filters) into
+    ``{material: {'<name>_kg': float}}`` for a dashboard."""
+    merged = {}
+    for material_totals in totals:
+        for material, values in material_totals.items():
+            entry = merged.setdefault(material, {})
+            for name, value in values.items():
+                entry[f'{name}_kg'] = round(entry.get(f'{name}_kg', 0) + float(value), 2)
+    return dict(sorted(merged.items()))
@@ -0,0 +1,124 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination
+
+from .streaming import STREAM_FORMATS, streaming_response
+
+
+class KeysetPagination:
+    """Cursor pagination over a descending ``(ordering_field, id)`` key.
+
+    Each page is a range scan that starts right after the row the cursor
+    points at, so deep pages cost the same as the first one and rows written
+    while a client is paging do not shift later pages. Cursors are opaque
+    base64 tokens; ``per_page`` is clamped to ``max_per_page``.
+    """
+
+    cursor_query_param = 'cursor'
+    per_page_query_param = 'per_page'
+
+    def __init__(self, ordering_field, default_per_page=20, max_per_page=100):
+        self.ordering_field = ordering_field
+        self.default_per_page = default_per_page
+        self.max_per_page = max_per_page
+
+    @classmethod
+    def is_requested(cls, request):
+        return cls.cursor_query_param in request.query_params
+
+    def get_per_page(self, request):
+        try:
+            per_page = int(request.query_params.get(self.per_page_query_param, self.default_per_page))
+        except ValueError:
+            per_page = self.default_per_page
+        return max(1, min(per_page, self.max_per_page))
+
+    def encode_cursor(self, row, direction):
+        value = getattr(row, self.ordering_field)
+        if hasattr(value, 'isoformat'):
+            # Keep full precision; DjangoJSONEncoder truncates to milliseconds
+            value = value.isoformat()
+        payload = {'v': value, 'id': row.pk, 'd': direction}
+        data = json.dumps(payload, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, queryset, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            field = queryset.model._meta.get_field(self.ordering_field)
+            value = field.to_python(payload['v'])
+            if value is None or payload['d'] not in ('next', 'prev'):
+                raise ValueError(token)
+            return value, int(payload['id']), payload['d']
+        except (ValueError, TypeError, KeyError, DjangoValidationError) as exc:
+            raise ValidationError({self.cursor_query_param: 'Invalid cursor.'}) from exc
+
+    def paginate_queryset(self, queryset, request):
+        """Return ``(rows, next_cursor, previous_cursor)`` for the request."""
+        field = self.ordering_field
+        per_page = self.get_per_page(request)
+        token = request.query_params.get(self.cursor_query_param)
+
+        if not token:
+            rows = list(queryset.order_by(f'-{field}', '-id')[:per_page + 1])
+            has_more, has_less = len(rows) > per_page, False
+            rows = rows[:per_page]
+        else:
+            value, pk, direction = self.decode_cursor(queryset, token)
+            if direction == 'next':
+                rows = list(
+                    queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk}))
+                    .order_by(f'-{field}', '-id')[:per_page + 1]
+                )
+                has_more, has_less = len(rows) > per_page, True
+                rows = rows[:per_page]
+            else:
+                rows = list(
+                    queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk}))
+                    .order_by(field, 'id')[:per_page + 1]
+                )
+                has_more, has_less = True, len(rows) > per_page
+                rows = rows[:per_page][::-1]
+
+        next_cursor = self.encode_cursor(rows[-1], 'next') if rows and has_more else None
+        previous_cursor = self.encode_cursor(rows[0], 'prev') if rows and has_less else None
+        return rows, next_cursor, previous_cursor
+
+    def get_paginated_data(self, data, next_cursor, previous_cursor):
+        return {
+            'results': data,
+            'next': next_cursor,
+            'previous': previous_cursor,
+        }
+
+
+class ListPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+def list_response(request, queryset, serializer_class, view=None, context=None):
+    """Serialize ``queryset`` for a list endpoint.
+
+    ``?page=``/``?page_size=`` returns a page with
+    ``count``/``next``/``previous``/``results`` and ``?stream=ndjson``
+    streams NDJSON. Otherwise the list is the same JSON array as always,
+    streamed as rows are serialized so no list is held in memory whole.
+    """
+    params = request.query_params
+    if 'page' in params or ListPagination.page_size_query_param in params:
+        paginator = ListPagination()
+        page = paginator.paginate_queryset(queryset, request, view=view)
+        serializer = serializer_class(page, many=True, context=context)
+        return paginator.get_paginated_response(serializer.data)
+
+    stream_format = params.get('stream')
+    if stream_format not in STREAM_FORMATS:
+        stream_format = 'json'
+    return streaming_response(queryset, serializer_class, stream_format, context=context)
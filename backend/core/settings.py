@@ -101,6 +101,73 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# Cached dashboards and their write versions are only shared by processes
+# that share this cache. The in-memory fallback belongs to one process: with
+# several workers set REDIS_URL, or a worker may keep serving a dashboard
+# that another worker's write invalidated until DASHBOARD_CACHE_TIMEOUT.
+# Nothing that must be current (auth, token blacklist, emission factors,
+# leaderboard ranks) relies on this cache.
+
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "relife-default",
+            "OPTIONS": {"MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", "10000"))},
+        }
+    }
+
+# Send ETag/Last-Modified on dashboards and answer 304s. Their validators
+# are the cache versions, so this is only safe with a cache every worker
+# shares; by default it is on when REDIS_URL is set
+DASHBOARD_ETAGS = os.getenv("DASHBOARD_ETAGS", "1" if os.getenv("REDIS_URL") else "0") == "1"
+
+# Seconds a cached dashboard response may be served; writes invalidate sooner
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv("DASHBOARD_CACHE_TIMEOUT", "300"))
+
+# Threads per process that run a dashboard's independent queries
+# concurrently. Each opens a database connection for the length of a task,
+# so count them against the database's connection limit. 1 runs the
+# queries one after another; raise it once `manage.py benchmark_dashboard`
+# shows a win on the production database
+DASHBOARD_QUERY_WORKERS = int(os.getenv("DASHBOARD_QUERY_WORKERS", "1"))
+
+# Threads per process that generate queued reports; with 0 they are left to
+# the run_report_worker command
+REPORT_BACKGROUND_THREADS = int(os.getenv("REPORT_BACKGROUND_THREADS", "1"))
+
+# Seconds without progress after which a running report is taken over
+REPORT_STALE_AFTER = int(os.getenv("REPORT_STALE_AFTER", "300"))
+
+# Recycling records re-scored per transaction by the recompute_co2 command
+CO2_RECOMPUTE_CHUNK_SIZE = int(os.getenv("CO2_RECOMPUTE_CHUNK_SIZE", "5000"))
+
+# Seconds a process scores records with its in-memory emission factors
+# before checking the table for changes
+EMISSION_FACTOR_CHECK_INTERVAL = float(os.getenv("EMISSION_FACTOR_CHECK_INTERVAL", "1"))
+
+# Seconds a process assigns pickups with its in-memory center index before
+# checking the user table for moved, added or removed centers
+CENTER_INDEX_CHECK_INTERVAL = float(os.getenv("CENTER_INDEX_CHECK_INTERVAL", "1"))
+
+# Seconds a process trusts its refresh-token blacklist filter before
+# checking the table for tokens other processes blacklisted
+TOKEN_BLACKLIST_CHECK_INTERVAL = float(os.getenv("TOKEN_BLACKLIST_CHECK_INTERVAL", "1"))
+
+# Seconds an authenticated user stays in the per-process user cache
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", "30"))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -148,7 +215,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
 
 }
@@ -157,6 +224,7 @@ from datetime import timedelta
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.ClaimsTokenRefreshSerializer",
 }
 
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
@@ -0,0 +1,100 @@
+import json
+import re
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+# EXPLAIN QUERY PLAN details that mean a whole table is read row by row or
+# the result is sorted in a temporary b-tree instead of read in index order.
+# "SCAN t USING [COVERING] INDEX i" walks an index and is allowed.
+FULL_SCAN_RE = re.compile(r'^SCAN (TABLE )?\S+$')
+TEMP_SORT_PREFIX = 'USE TEMP B-TREE'
+ORDER_BY_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+def response_rows(response):
+    """Parsed body of a list response, streamed or not."""
+    if getattr(response, 'streaming', False):
+        return json.loads(b''.join(response.streaming_content))
+    return response.data
+
+
+class QueryBudgetMixin:
+    """Assertions that an endpoint's query count does not grow with its data.
+
+    Mix into a ``TestCase``/``APITestCase`` whose ``self.client`` is already
+    authenticated.
+    """
+
+    budget_sizes = (1, 10, 50)
+
+    def assertQueryBudget(self, url, seed, max_queries, sizes=None, data=None):
+        """GET ``url`` after ``seed(size)`` for each dataset size.
+
+        Each size runs in its own rolled-back transaction, so ``seed`` may
+        simply create ``size`` rows. Fails if any request issues more than
+        ``max_queries`` queries or if the count differs between sizes.
+        """
+        counts = {}
+        for size in sizes or self.budget_sizes:
+            with transaction.atomic():
+                seed(size)
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(url, data)
+                    # Streaming bodies only query while being consumed
+                    if getattr(response, 'streaming', False):
+                        b''.join(response.streaming_content)
+                self.assertLess(response.status_code, 400, response)
+                counts[size] = len(context.captured_queries)
+                transaction.set_rollback(True)
+
+            self.assertLessEqual(
+                counts[size], max_queries,
+                f"{url} issued {counts[size]} queries for {size} rows "
+                f"(budget {max_queries}):\n"
+                + "\n".join(query['sql'] for query in context.captured_queries),
+            )
+        self.assertEqual(
+            len(set(counts.values())), 1,
+            f"{url} query count grows with the dataset: {counts}",
+        )
+        return counts
+
+
+class QueryPlanMixin:
+    """Assertions on the SQLite query plans of an endpoint's queries.
+
+    Every SELECT the endpoint issues is re-run under ``EXPLAIN QUERY PLAN``
+    and the test fails when any step is a full table scan or a temporary
+    b-tree sort. ``sorted_results`` tolerates the final ORDER BY sort of
+    endpoints whose order is computed per request (search relevance); sorts
+    for GROUP BY or DISTINCT still fail. Skipped on other database backends.
+    """
+
+    def assertIndexedQueries(self, url, data=None, sorted_results=False):
+        if connection.vendor != 'sqlite':
+            self.skipTest('query plan checks run on SQLite only')
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, data)
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200, response)
+
+        problems = []
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    if sorted_results and detail == ORDER_BY_SORT:
+                        continue
+                    if FULL_SCAN_RE.match(detail) or detail.startswith(TEMP_SORT_PREFIX):
+                        problems.append(f'{detail}\n    {sql}')
+        self.assertFalse(
+            problems,
+            f"{url} {data or ''} has unindexed query steps:\n" + "\n".join(problems),
+        )
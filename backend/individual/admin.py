@@ -1,10 +1,12 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import Pickup, Challenge, Reward, RecyclingHistory, MarketplaceItem
+from .models import Pickup, Challenge, Reward, RecyclingHistory, MarketplaceItem, UserImpactSummary, EmissionFactor
 
 admin.site.register(Pickup)
 admin.site.register(Challenge)
 admin.site.register(Reward)
 admin.site.register(RecyclingHistory)
 admin.site.register(MarketplaceItem)
+admin.site.register(UserImpactSummary)
+admin.site.register(EmissionFactor)
@@ -0,0 +1,222 @@
+import operator
+import threading
+from datetime import datetime, time
+from time import monotonic
+from decimal import Decimal
+from functools import reduce
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.dashboard_cache import invalidate
+from . import progress
+from .models import EmissionFactor, RecyclingHistory, UserImpactSummary
+
+# A recycling record saves its weight times the emission factor of its
+# material. Factors are versioned: an EmissionFactor row applies to records
+# dated from its ``valid_from`` until the material's next version, so a
+# correction only re-scores the period it covers.
+#
+# Records created without a CO2 figure are scored on save and at ingest,
+# and ``manage.py recompute_co2`` re-scores stored records in bulk after a
+# factor changes. Records that carry a CO2 figure but no factor were
+# entered by hand and are never touched.
+#
+# Each process keeps the factors in memory. It re-reads the (small) table
+# at most every EMISSION_FACTOR_CHECK_INTERVAL seconds and rebuilds its
+# arrays when the rows changed, so records scored by other processes in
+# that window after a factor change carry the old factor until
+# ``recompute_co2`` runs.
+#
+# Weights are handled as integer hundredths of a kg and factors as integer
+# ten-thousandths, so the vectorized path rounds exactly like the Decimal
+# columns it writes to.
+
+# Records the engine owns: scored before, or never given a CO2 figure
+SCORED = Q(emission_factor__isnull=False) | Q(co2_saved_kg=0)
+
+# Rows per bulk_update statement; its CASE expression gets slower per row
+# as it grows
+BULK_UPDATE_BATCH_SIZE = 200
+# Values per IN (...) list, below SQLite's default limit on bound parameters
+IN_CHUNK_SIZE = 900
+
+_lock = threading.Lock()
+_shared = {'table': None, 'rows': None, 'checked_at': 0.0}
+
+
+def _chunk_size():
+    return getattr(settings, 'CO2_RECOMPUTE_CHUNK_SIZE', 5000)
+
+
+def _check_interval():
+    return getattr(settings, 'EMISSION_FACTOR_CHECK_INTERVAL', 1.0)
+
+
+def _hundredths(value):
+    return int(Decimal(str(value or 0)).quantize(Decimal('0.01')) * 100)
+
+
+def _timestamp(day):
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_default_timezone()).timestamp()
+
+
+class FactorTable:
+    """Every factor version by material, as arrays sorted by ``valid_from``."""
+
+    def __init__(self, factors):
+        versions = {}
+        for pk, material_type, valid_from, kg_co2_per_kg in factors:
+            versions.setdefault(material_type, []).append(
+                (_timestamp(valid_from), pk, int(kg_co2_per_kg * 10000))
+            )
+        self.versions = {
+            material_type: tuple(np.array(column) for column in zip(*sorted(rows)))
+            for material_type, rows in versions.items()
+        }
+
+    def score(self, material_types, weights, timestamps):
+        """CO2 saved in hundredths of a kg and the id of the factor applied
+        (0 where no factor covers the record), for parallel arrays of
+        material types, weights in hundredths of a kg and POSIX dates."""
+        co2 = np.zeros(len(weights), dtype=np.int64)
+        factor_ids = np.zeros(len(weights), dtype=np.int64)
+        if not len(weights):
+            return co2, factor_ids
+        material_types = np.char.lower(np.char.strip(np.asarray(material_types, dtype=str)))
+        for material_type, (starts, ids, factors) in self.versions.items():
+            rows = np.flatnonzero(material_types == material_type)
+            if not rows.size:
+                continue
+            version = np.searchsorted(starts, timestamps[rows], side='right') - 1
+            covered = version >= 0
+            rows, version = rows[covered], version[covered]
+            factor_ids[rows] = ids[version]
+            # hundredths x ten-thousandths, rounded half up to hundredths
+            co2[rows] = (weights[rows] * factors[version] + 5000) // 10000
+        return co2, factor_ids
+
+
+def factor_table():
+    """The current process's factor table, rebuilt when the factors
+    changed."""
+    now = monotonic()
+    table = _shared['table']
+    if table is not None and now - _shared['checked_at'] < _check_interval():
+        return table
+    with _lock:
+        rows = tuple(
+            EmissionFactor.objects.order_by('pk').values_list('pk', 'material_type', 'valid_from', 'kg_co2_per_kg')
+        )
+        if _shared['table'] is None or _shared['rows'] != rows:
+            _shared['table'] = FactorTable(rows)
+            _shared['rows'] = rows
+        _shared['checked_at'] = now
+        return _shared['table']
+
+
+def factors_changed():
+    """Reload this process's factor table on its next use."""
+    _shared['table'] = None
+
+
+def is_scored(history):
+    return history.emission_factor_id is not None or not history.co2_saved_kg
+
+
+def score_records(records):
+    """Set ``co2_saved_kg`` and ``emission_factor`` of RecyclingHistory
+    instances from the current factors, without saving them."""
+    if not records:
+        return
+    co2, factor_ids = factor_table().score(
+        [record.material_type for record in records],
+        np.array([_hundredths(record.weight_kg) for record in records], dtype=np.int64),
+        np.array([record.date.timestamp() for record in records]),
+    )
+    for record, amount, factor_id in zip(records, co2.tolist(), factor_ids.tolist()):
+        record.co2_saved_kg = Decimal(amount).scaleb(-2)
+        record.emission_factor_id = factor_id or None
+
+
+def _rescore(rows, table):
+    """Re-score one chunk of ``(pk, user_id, material_type, weight_kg, date,
+    co2_saved_kg, emission_factor_id)`` rows; returns how many changed."""
+    pks, user_ids, material_types, weights, dates, co2, factor_ids = zip(*rows)
+    old_co2 = np.array([_hundredths(value) for value in co2], dtype=np.int64)
+    old_factor_ids = np.array([factor_id or 0 for factor_id in factor_ids], dtype=np.int64)
+    new_co2, new_factor_ids = table.score(
+        material_types,
+        np.array([_hundredths(value) for value in weights], dtype=np.int64),
+        np.array([date.timestamp() for date in dates]),
+    )
+    changed = np.flatnonzero((new_co2 != old_co2) | (new_factor_ids != old_factor_ids))
+    if not changed.size:
+        return 0
+
+    records, by_factor, events, deltas_by_user = [], {}, [], {}
+    for i, amount, factor_id, delta in zip(
+        changed.tolist(), new_co2[changed].tolist(), new_factor_ids[changed].tolist(),
+        (new_co2[changed] - old_co2[changed]).tolist(),
+    ):
+        by_factor.setdefault(factor_id or None, []).append(pks[i])
+        if delta:
+            records.append(RecyclingHistory(pk=pks[i], co2_saved_kg=Decimal(amount).scaleb(-2)))
+            delta = Decimal(delta).scaleb(-2)
+            deltas = deltas_by_user.setdefault(user_ids[i], {'co2_saved_kg': Decimal(0)})
+            deltas['co2_saved_kg'] += delta
+            events.append((user_ids[i], dates[i], material_types[i], {'co2_saved_kg': delta}))
+
+    # Amounts differ per row, factors are shared by many: one CASE column
+    # for the amounts and a plain UPDATE per factor version
+    RecyclingHistory.objects.bulk_update(records, ['co2_saved_kg'], batch_size=BULK_UPDATE_BATCH_SIZE)
+    now = timezone.now()
+    for factor_id, factor_pks in by_factor.items():
+        for start in range(0, len(factor_pks), IN_CHUNK_SIZE):
+            RecyclingHistory.objects.filter(pk__in=factor_pks[start:start + IN_CHUNK_SIZE]).update(
+                emission_factor_id=factor_id, updated_at=now,
+            )
+    # bulk_update skips the handlers that keep summaries and challenges current
+    UserImpactSummary.objects.apply_batch_deltas(deltas_by_user)
+    progress.record(events)
+    for user_id in deltas_by_user:
+        invalidate('individual', user_id)
+    return len(records)
+
+
+def recompute(material_types=None, since=None, chunk_size=None):
+    """Re-score stored records with the current factors, optionally only
+    those of ``material_types`` or dated on or after ``since``.
+
+    Rows are read in primary-key chunks as columns, scored with array
+    operations and the changed ones written back, each chunk in its own
+    transaction. Returns ``(scanned, updated)``.
+    """
+    chunk_size = chunk_size or _chunk_size()
+    table = factor_table()
+    records = RecyclingHistory.objects.filter(SCORED)
+    if material_types:
+        records = records.filter(
+            reduce(operator.or_, (Q(material_type__iexact=material_type) for material_type in material_types))
+        )
+    if since is not None:
+        records = records.filter(date__gte=since)
+
+    scanned = updated = 0
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                records.select_for_update().filter(pk__gt=last_pk).order_by('pk').values_list(
+                    'pk', 'user_id', 'material_type', 'weight_kg', 'date', 'co2_saved_kg', 'emission_factor_id',
+                )[:chunk_size]
+            )
+            if not rows:
+                break
+            updated += _rescore(rows, table)
+        scanned += len(rows)
+        last_pk = rows[-1][0]
+    return scanned, updated
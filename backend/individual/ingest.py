@@ -0,0 +1,174 @@
+import codecs
+import csv
+import json
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from users.models import User
+from .emissions import score_records
+from .models import RecyclingHistory
+from .serializers import RecyclingHistoryIngestSerializer
+from .signals import recycling_history_bulk_created
+
+# Uploads are read line by line and written in fixed-size batches, so memory
+# use depends on the batch size rather than the size of the file. Each batch
+# is inserted in its own transaction and derived totals are updated once per
+# batch through ``recycling_history_bulk_created``.
+
+INGEST_FORMATS = {
+    'csv': ('text/csv', 'application/csv'),
+    'ndjson': ('application/x-ndjson', 'application/jsonl', 'application/json-lines'),
+}
+# Uploader types that may record weights for other users
+INGEST_ANY_USER_TYPES = ('recycling_center', 'staff')
+
+
+def _batch_size():
+    return getattr(settings, 'RECYCLING_INGEST_BATCH_SIZE', 1000)
+
+
+def _max_reported_errors():
+    return getattr(settings, 'RECYCLING_INGEST_MAX_ERRORS', 1000)
+
+
+def detect_format(content_type, filename=None, requested=None):
+    """Return ``'csv'``/``'ndjson'`` for an upload, or None if unsupported."""
+    if requested:
+        return requested if requested in INGEST_FORMATS else None
+    if filename:
+        extension = filename.rsplit('.', 1)[-1].lower()
+        if extension in ('csv', 'ndjson', 'jsonl'):
+            return 'csv' if extension == 'csv' else 'ndjson'
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    for name, content_types in INGEST_FORMATS.items():
+        if content_type in content_types:
+            return name
+    return None
+
+
+def iter_csv_rows(lines):
+    """Yield ``(line_number, row_or_None, error)`` for a CSV with a header."""
+    reader = csv.DictReader(lines)
+    try:
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None, 'Row has more columns than the header.'
+                continue
+            yield reader.line_num, {key: value for key, value in row.items() if value not in ('', None)}, None
+    except csv.Error as exc:
+        yield reader.line_num, None, f'Malformed CSV: {exc}'
+
+
+def iter_ndjson_rows(lines):
+    """Yield ``(line_number, row_or_None, error)`` for newline-delimited JSON."""
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None, 'Malformed JSON.'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, 'Each line must be a JSON object.'
+            continue
+        yield line_number, row, None
+
+
+class RecyclingHistoryIngest:
+    """Validate and insert the rows of one upload on behalf of ``uploader``."""
+
+    def __init__(self, uploader, batch_size=None):
+        self.uploader = uploader
+        self.batch_size = batch_size or _batch_size()
+        self.max_errors = _max_reported_errors()
+        self.may_assign_users = uploader.user_type in INGEST_ANY_USER_TYPES
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def run(self, stream, ingest_format):
+        # utf-8-sig drops the byte order mark spreadsheet exports often add
+        lines = codecs.iterdecode(stream, 'utf-8-sig')
+        rows = iter_csv_rows(lines) if ingest_format == 'csv' else iter_ndjson_rows(lines)
+        try:
+            batch = []
+            for line_number, row, error in rows:
+                if error:
+                    self.add_error(line_number, {'non_field_errors': [error]})
+                    continue
+                batch.append((line_number, row))
+                if len(batch) >= self.batch_size:
+                    self.process_batch(batch)
+                    batch = []
+            if batch:
+                self.process_batch(batch)
+        except UnicodeDecodeError:
+            self.add_error(None, {'non_field_errors': ['File is not valid UTF-8.']})
+        return self.report()
+
+    def add_error(self, line_number, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line_number, 'errors': errors})
+
+    def process_batch(self, batch):
+        validated = []
+        for line_number, row in batch:
+            serializer = RecyclingHistoryIngestSerializer(data=row)
+            if serializer.is_valid():
+                validated.append((line_number, serializer.validated_data))
+            else:
+                self.add_error(line_number, serializer.errors)
+
+        # Owners are resolved with one query for the whole batch
+        emails = {data['user'] for _, data in validated if 'user' in data}
+        owners = dict(User.objects.filter(email__in=emails).values_list('email', 'pk')) if emails else {}
+
+        instances, lines, unscored = [], [], []
+        for line_number, data in validated:
+            user_id = self.uploader.pk
+            if 'user' in data:
+                email = data['user']
+                if email != self.uploader.email:
+                    if not self.may_assign_users:
+                        self.add_error(line_number, {'user': ['You can only upload your own recycling history.']})
+                        continue
+                    if email not in owners:
+                        self.add_error(line_number, {'user': ['Unknown user.']})
+                        continue
+                    user_id = owners[email]
+            instance = RecyclingHistory(
+                user_id=user_id,
+                material_type=data['material_type'],
+                weight_kg=data['weight_kg'],
+                date=data['date'],
+                co2_saved_kg=data.get('co2_saved_kg', 0),
+            )
+            if 'co2_saved_kg' not in data:
+                unscored.append(instance)
+            instances.append(instance)
+            lines.append(line_number)
+
+        if not instances:
+            return
+        # bulk_create skips the pre_save handler that scores single saves
+        score_records(unscored)
+        try:
+            with transaction.atomic():
+                created = RecyclingHistory.objects.bulk_create(instances)
+                recycling_history_bulk_created.send(sender=RecyclingHistory, instances=created)
+        except DatabaseError as exc:
+            for line_number in lines:
+                self.add_error(line_number, {'non_field_errors': [f'Could not be saved: {exc}']})
+            return
+        self.created += len(created)
+
+    def report(self):
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
@@ -0,0 +1,199 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from users.models import User
+from .models import LeaderboardEntry, RecyclingHistory
+
+# Leaderboards rank users by recycled kg. Each user has a LeaderboardEntry
+# on every board their rows count towards: all time, the calendar month
+# and the week (Monday first) of each row, once globally (blank region)
+# and once in their region. Recycling writes add their kg to those entries
+# in the writer's transaction, with a couple of queries per board however
+# many rows were written.
+#
+# A user's rank is one more than the number of larger totals on the board,
+# counted on the (board, -total_kg) index; nothing is cached between
+# requests, so writers only ever touch their own entries. Pages of a board
+# count once and rank the rest of the page from its rows.
+
+PERIODS = ('all', 'month', 'week')
+# period_start of the all-time boards
+ALL_TIME = date(2000, 1, 1)
+
+
+def period_start(period, day):
+    if period == 'month':
+        return day.replace(day=1)
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    return ALL_TIME
+
+
+def boards_for(day, region=''):
+    """``(period, period_start, region)`` of every board a row dated ``day``
+    counts towards."""
+    regions = ('', region) if region else ('',)
+    return [(period, period_start(period, day), board_region) for period in PERIODS for board_region in regions]
+
+
+def current_boards(region=''):
+    return boards_for(timezone.localdate(), region)
+
+
+def _board_filter(board):
+    period, start, region = board
+    return models.Q(period=period, period_start=start, region=region)
+
+
+def _any_board(boards):
+    return models.Q(*[_board_filter(board) for board in boards], _connector=models.Q.OR)
+
+
+def entries(board):
+    """Ranked entries of a board, largest total first."""
+    return LeaderboardEntry.objects.filter(_board_filter(board), total_kg__gt=0).order_by('-total_kg', 'user_id')
+
+
+class PageRanks:
+    """Ranks of a board's entries read in board order, as pages are.
+
+    The first entry is ranked with a count of the larger and equal totals
+    on the board; later, smaller totals are ranked from those and the
+    entries read since, so a page costs one query. A total larger than
+    the previous one starts over with a count.
+    """
+
+    def __init__(self, board):
+        self.board = board
+        self.anchor = None
+        self.last = None
+
+    def rank(self, total):
+        if not total or total <= 0:
+            return None
+        if self.last is None or total > self.last[0]:
+            counts = entries(self.board).aggregate(
+                larger=models.Count('pk', filter=models.Q(total_kg__gt=total)),
+                at_least=models.Count('pk', filter=models.Q(total_kg__gte=total)),
+            )
+            # (anchor total, entries at or above it, entries read below it)
+            self.anchor = [total, counts['at_least'], 0]
+            self.last = (total, counts['larger'] + 1)
+        elif total < self.last[0]:
+            self.last = (total, self.anchor[1] + self.anchor[2] + 1)
+        if total < self.anchor[0]:
+            self.anchor[2] += 1
+        return self.last[1]
+
+
+def standing(user):
+    """The user's rank, total and the number of ranked users on each
+    current board, e.g. ``{'week': {'rank': 3, 'total_kg': ..., 'participants': 40}}``
+    with a ``regional`` entry of the same shape when the user has a region."""
+    boards = current_boards(user.region)
+    totals = {
+        (period, start, region): total_kg
+        for period, start, region, total_kg in LeaderboardEntry.objects.filter(
+            _any_board(boards), user=user,
+        ).values_list('period', 'period_start', 'region', 'total_kg')
+    }
+    aggregates = {}
+    for i, board in enumerate(boards):
+        aggregates[f'participants_{i}'] = models.Count('pk', filter=_board_filter(board))
+        aggregates[f'ahead_{i}'] = models.Count(
+            'pk', filter=_board_filter(board) & models.Q(total_kg__gt=totals.get(board, 0)),
+        )
+    counts = LeaderboardEntry.objects.filter(_any_board(boards), total_kg__gt=0).aggregate(**aggregates)
+    result = {'region': user.region}
+    for i, board in enumerate(boards):
+        total = totals.get(board, Decimal(0))
+        entry = {
+            'rank': counts[f'ahead_{i}'] + 1 if total > 0 else None,
+            'total_kg': float(total), 'participants': counts[f'participants_{i}'],
+        }
+        period, _, region = board
+        if region:
+            result.setdefault('regional', {})[period] = entry
+        else:
+            result[period] = entry
+    return result
+
+
+def apply_events(events):
+    """Add recycled kg to leaderboards for ``(user_id, date, kg)`` events."""
+    events = [(user_id, when, kg) for user_id, when, kg in events if kg]
+    if not events:
+        return
+    regions = dict(User.objects.filter(pk__in={user_id for user_id, _, _ in events}).values_list('pk', 'region'))
+    deltas = defaultdict(lambda: defaultdict(Decimal))
+    for user_id, when, kg in events:
+        for board in boards_for(timezone.localdate(when), regions.get(user_id, '')):
+            deltas[board][user_id] += Decimal(str(kg))
+
+    now = timezone.now()
+    for board, by_user in deltas.items():
+        by_user = {user_id: kg for user_id, kg in by_user.items() if kg}
+        if not by_user:
+            continue
+        period, start, region = board
+        # Missing entries are created empty first, so concurrent writers
+        # both end up adding to the same row
+        LeaderboardEntry.objects.bulk_create(
+            [
+                LeaderboardEntry(period=period, period_start=start, region=region, user_id=user_id)
+                for user_id in by_user
+            ],
+            ignore_conflicts=True,
+        )
+        LeaderboardEntry.objects.filter(_board_filter(board), user_id__in=by_user).update(
+            total_kg=models.F('total_kg') + models.Case(
+                *[models.When(user_id=user_id, then=models.Value(kg)) for user_id, kg in by_user.items()],
+                output_field=LeaderboardEntry._meta.get_field('total_kg'),
+            ),
+            updated_at=now,
+        )
+
+
+def rebuild(user_ids=None):
+    """Recompute leaderboard entries from RecyclingHistory, for
+    ``user_ids`` only or for everyone. Returns the number of entries."""
+    history = RecyclingHistory.objects.order_by()
+    users = User.objects.all()
+    if user_ids is not None:
+        history = history.filter(user_id__in=user_ids)
+        users = users.filter(pk__in=user_ids)
+    regions = dict(users.exclude(region='').values_list('pk', 'region'))
+
+    totals = []
+    for period, trunc in (('all', None), ('month', TruncMonth), ('week', TruncWeek)):
+        rows = history
+        if trunc is not None:
+            rows = rows.annotate(start=trunc('date', output_field=models.DateField()))
+            rows = rows.values('user_id', 'start')
+        else:
+            rows = rows.values('user_id')
+        for row in rows.annotate(kg=models.Sum('weight_kg')):
+            totals.append((period, row.get('start', ALL_TIME), row['user_id'], row['kg']))
+
+    rows = []
+    for period, start, user_id, kg in totals:
+        if not kg:
+            continue
+        board_regions = ('', regions[user_id]) if user_id in regions else ('',)
+        rows.extend(
+            LeaderboardEntry(period=period, period_start=start, region=region, user_id=user_id, total_kg=kg)
+            for region in board_regions
+        )
+
+    with transaction.atomic():
+        existing = LeaderboardEntry.objects.order_by()
+        if user_ids is not None:
+            existing = existing.filter(user_id__in=user_ids)
+        existing.delete()
+        LeaderboardEntry.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
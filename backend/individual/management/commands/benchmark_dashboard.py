@@ -0,0 +1,105 @@
+import statistics
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import concurrent
+from individual.models import Challenge, Pickup, RecyclingHistory, Reward, UserImpactSummary
+from individual.views import IndividualDashboardView
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the individual dashboard's wall-clock latency with its "
+        "queries run one after another and concurrently."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, dest='user_id',
+            help="Benchmark this existing user instead of seeding one.",
+        )
+        parser.add_argument(
+            '--rows', type=int, default=2000,
+            help="Rows of each kind to seed for the benchmark user.",
+        )
+        parser.add_argument('--iterations', type=int, default=50)
+
+    def handle(self, *args, user_id=None, rows=2000, iterations=50, **options):
+        if user_id is not None:
+            try:
+                user = User.objects.get(pk=user_id)
+            except User.DoesNotExist:
+                raise CommandError(f"User {user_id} does not exist.")
+            self.run(user, iterations)
+            return
+
+        # Seeded rows are committed so the worker threads can read them
+        user = self.seed(rows)
+        try:
+            self.run(user, iterations)
+        finally:
+            user.delete()
+
+    def seed(self, rows):
+        user = User.objects.create_user(email=f'benchmark-{uuid.uuid4().hex}@example.com')
+        now = timezone.now()
+        Pickup.objects.bulk_create(
+            Pickup(
+                user=user, date=now + timedelta(hours=i if i % 2 else -i), address=f'{i} Benchmark Road',
+                status='scheduled' if i % 2 else 'completed',
+            )
+            for i in range(rows)
+        )
+        Challenge.objects.bulk_create(
+            Challenge(
+                user=user, title=f'Challenge {i}', description='', target=10, progress=i % 12,
+                points_reward=10, start_date=now - timedelta(days=i), end_date=now + timedelta(days=i),
+                is_active=i % 3 == 0,
+            )
+            for i in range(rows)
+        )
+        Reward.objects.bulk_create(
+            Reward(user=user, name=f'Reward {i}', points_required=i, description='') for i in range(rows)
+        )
+        RecyclingHistory.objects.bulk_create(
+            RecyclingHistory(
+                user=user, material_type='plastic', weight_kg=Decimal('1.50'),
+                co2_saved_kg=Decimal('0.75'), date=now - timedelta(hours=i),
+            )
+            for i in range(rows)
+        )
+        UserImpactSummary.objects.rebuild(user_ids=[user.pk])
+        return user
+
+    def run(self, user, iterations):
+        view = IndividualDashboardView()
+        # Warm up connections and the worker pool
+        view.get_dashboard_data(user)
+        with concurrent.serial():
+            view.get_dashboard_data(user)
+
+        with concurrent.serial():
+            serial = self.measure(view, user, iterations)
+        parallel = self.measure(view, user, iterations)
+
+        for label, timings in (('serial', serial), ('concurrent', parallel)):
+            self.stdout.write(
+                f"{label:>10}: median {statistics.median(timings):.2f} ms, "
+                f"mean {statistics.mean(timings):.2f} ms, max {max(timings):.2f} ms"
+            )
+        speedup = statistics.median(serial) / statistics.median(parallel)
+        self.stdout.write(self.style.SUCCESS(f"Median speedup: {speedup:.2f}x"))
+
+    def measure(self, view, user, iterations):
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            view.get_dashboard_data(user)
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
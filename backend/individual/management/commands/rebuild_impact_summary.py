@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from individual.models import UserImpactSummary
+
+
+class Command(BaseCommand):
+    help = "Rebuild or verify the per-user impact summaries from the raw tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help="Only report summaries that differ from the raw tables.",
+        )
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help="Limit to this user id (may be repeated).",
+        )
+
+    def handle(self, *args, verify=False, user_ids=None, **options):
+        if verify:
+            self.verify(user_ids)
+            return
+
+        with transaction.atomic():
+            summaries = UserImpactSummary.objects.rebuild(user_ids=user_ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(summaries)} summaries."))
+
+    def verify(self, user_ids):
+        expected = UserImpactSummary.objects.compute(user_ids)
+        stored = UserImpactSummary.objects.all()
+        if user_ids is not None:
+            stored = stored.filter(user_id__in=user_ids)
+        stored = {summary.user_id: summary for summary in stored}
+
+        mismatches = 0
+        for user_id, values in expected.items():
+            summary = stored.get(user_id)
+            if summary is None:
+                # Missing rows are rebuilt lazily on the next dashboard read
+                continue
+            for field in UserImpactSummary.COUNTER_FIELDS:
+                actual, wanted = getattr(summary, field), values.get(field, 0)
+                if actual != wanted:
+                    mismatches += 1
+                    self.stdout.write(f"user {user_id}: {field} is {actual}, expected {wanted}")
+
+        if mismatches:
+            raise CommandError(f"{mismatches} summary values are out of date.")
+        self.stdout.write(self.style.SUCCESS(f"{len(stored)} summaries verified."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from individual.leaderboard import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every leaderboard entry from recycling history. Run it after "
+        "migrating, and to repair boards changed by writes that bypass the "
+        "model signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help="Limit to this user id (may be repeated).",
+        )
+
+    def handle(self, *args, user_ids=None, **options):
+        count = rebuild(user_ids)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} leaderboard entries."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from individual.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Repopulate the marketplace full-text index from the listings table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, database='default', **options):
+        rebuild_search_index(using=database)
+        self.stdout.write(self.style.SUCCESS("Marketplace search index rebuilt."))
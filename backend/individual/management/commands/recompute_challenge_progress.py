@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from individual.progress import recompute
+
+
+class Command(BaseCommand):
+    help = "Recompute the progress of active metric challenges from recycling and pickup rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--challenge', type=int, action='append', dest='challenge_ids',
+            help="Limit to this challenge id (may be repeated).",
+        )
+
+    def handle(self, *args, challenge_ids=None, **options):
+        count = recompute(challenge_ids)
+        self.stdout.write(self.style.SUCCESS(f"Recomputed progress of {count} challenge(s)."))
@@ -0,0 +1,31 @@
+from datetime import date, datetime, time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from individual.emissions import recompute
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-score the CO2 saved by recycling records with the current emission "
+        "factors, e.g. after a factor was added or corrected. Records with a "
+        "hand-entered CO2 figure are left alone."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--material', action='append', dest='material_types',
+            help="Limit to this material type (may be repeated).",
+        )
+        parser.add_argument(
+            '--since', type=date.fromisoformat,
+            help="Limit to records dated on or after this day (YYYY-MM-DD).",
+        )
+        parser.add_argument('--chunk-size', type=int, help="Records read and written per transaction.")
+
+    def handle(self, *args, material_types=None, since=None, chunk_size=None, **options):
+        if since is not None:
+            since = timezone.make_aware(datetime.combine(since, time.min), timezone.get_default_timezone())
+        scanned, updated = recompute(material_types, since, chunk_size)
+        self.stdout.write(self.style.SUCCESS(f"Scanned {scanned} records, updated {updated}."))
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("individual", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserImpactSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "total_recycled_kg",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "co2_saved_kg",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("challenges_completed", models.IntegerField(default=0)),
+                ("pickups_scheduled", models.IntegerField(default=0)),
+                ("pickups_completed", models.IntegerField(default=0)),
+                ("pickups_cancelled", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="impact_summary",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "User Impact Summaries",
+            },
+        ),
+    ]
@@ -0,0 +1,88 @@
+from django.db import migrations
+
+FTS_TABLE = "individual_marketplaceitem_fts"
+ITEM_TABLE = "individual_marketplaceitem"
+
+SQLITE_FORWARD = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        name, description, tokenize='porter unicode61', prefix='2 3'
+    )
+    """,
+    f"""
+    INSERT INTO {FTS_TABLE}(rowid, name, description)
+    SELECT id, name, description FROM {ITEM_TABLE} WHERE is_available
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON {ITEM_TABLE}
+    WHEN new.is_available BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_update
+    AFTER UPDATE OF name, description, is_available ON {ITEM_TABLE} BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        SELECT new.id, new.name, new.description WHERE new.is_available;
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON {ITEM_TABLE} BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRESQL_FORWARD = [
+    f"""
+    ALTER TABLE {ITEM_TABLE} ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    f"""
+    CREATE INDEX {ITEM_TABLE}_search_idx ON {ITEM_TABLE}
+    USING GIN (search_vector) WHERE is_available
+    """,
+]
+
+POSTGRESQL_REVERSE = [
+    f"DROP INDEX IF EXISTS {ITEM_TABLE}_search_idx",
+    f"ALTER TABLE {ITEM_TABLE} DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("individual", "0002_userimpactsummary"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor(
+                {"sqlite": SQLITE_FORWARD, "postgresql": POSTGRESQL_FORWARD}
+            ),
+            run_for_vendor(
+                {"sqlite": SQLITE_REVERSE, "postgresql": POSTGRESQL_REVERSE}
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("individual", "0003_marketplace_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="challenge",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="recyclinghistory",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="reward",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("individual", "0004_updated_at"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="challenge",
+            index=models.Index(
+                fields=["user", "is_active", "-start_date"],
+                name="challenge_user_active_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="challenge",
+            index=models.Index(
+                fields=["user", "-start_date"], name="challenge_user_start_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="challenge",
+            index=models.Index(
+                fields=["user", "-end_date"], name="challenge_user_end_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="marketplaceitem",
+            index=models.Index(
+                condition=models.Q(("is_available", True)),
+                fields=["category", "-created_at"],
+                name="item_available_category_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="marketplaceitem",
+            index=models.Index(
+                condition=models.Q(("is_available", True)),
+                fields=["-created_at"],
+                name="item_available_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pickup",
+            index=models.Index(
+                fields=["user", "status", "date"], name="pickup_user_status_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pickup",
+            index=models.Index(fields=["user", "-date"], name="pickup_user_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="recyclinghistory",
+            index=models.Index(fields=["user", "-date"], name="history_user_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="recyclinghistory",
+            index=models.Index(fields=["date"], name="history_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="reward",
+            index=models.Index(
+                fields=["user", "-created_at"], name="reward_user_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reward",
+            index=models.Index(
+                fields=["user", "is_claimed", "-created_at"],
+                name="reward_user_claimed_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reward",
+            index=models.Index(
+                condition=models.Q(("is_claimed", True)),
+                fields=["user", "-claimed_at"],
+                name="reward_user_claimed_at_idx",
+            ),
+        ),
+    ]
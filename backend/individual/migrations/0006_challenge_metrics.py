@@ -0,0 +1,47 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("individual", "0005_composite_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="challenge",
+            name="completed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="challenge",
+            name="material_type",
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="challenge",
+            name="metric",
+            field=models.CharField(
+                choices=[
+                    ("manual", "Manual"),
+                    ("pickups_completed", "Pickups completed"),
+                    ("recycled_kg", "Recycled kg"),
+                    ("co2_saved_kg", "CO2 saved kg"),
+                ],
+                default="manual",
+                max_length=20,
+            ),
+        ),
+        migrations.AddField(
+            model_name="challenge",
+            name="metric_total",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name="userimpactsummary",
+            name="points_earned",
+            field=models.IntegerField(default=0),
+        ),
+    ]
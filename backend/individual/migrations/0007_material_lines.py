@@ -0,0 +1,81 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core.materials import material_quantities
+
+BATCH_SIZE = 1000
+
+
+def create_lines(apps, schema_editor):
+    Pickup = apps.get_model("individual", "Pickup")
+    PickupMaterial = apps.get_model("individual", "PickupMaterial")
+    lines = []
+    rows = Pickup.objects.values_list("pk", "materials", "date")
+    for pk, materials, date in rows.iterator(chunk_size=BATCH_SIZE):
+        for material, quantity in material_quantities(materials).items():
+            lines.append(
+                PickupMaterial(
+                    pickup_id=pk,
+                    material=material,
+                    quantity_kg=quantity,
+                    date=date,
+                )
+            )
+        if len(lines) >= BATCH_SIZE:
+            PickupMaterial.objects.bulk_create(lines)
+            lines = []
+    PickupMaterial.objects.bulk_create(lines)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("individual", "0006_challenge_metrics"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PickupMaterial",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("material", models.CharField(max_length=50)),
+                (
+                    "quantity_kg",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=10),
+                ),
+                ("date", models.DateTimeField()),
+                (
+                    "pickup",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="material_lines",
+                        to="individual.pickup",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["material", "date"], name="pickupmaterial_material_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="pickupmaterial",
+            constraint=models.UniqueConstraint(
+                fields=("pickup", "material"), name="pickupmaterial_unique"
+            ),
+        ),
+        migrations.RunPython(create_lines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("individual", "0007_material_lines"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EmissionFactor",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("material_type", models.CharField(max_length=50)),
+                ("kg_co2_per_kg", models.DecimalField(decimal_places=4, max_digits=8)),
+                ("valid_from", models.DateField()),
+                ("source", models.CharField(blank=True, max_length=255)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ["material_type", "valid_from"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="emissionfactor",
+            constraint=models.UniqueConstraint(
+                fields=("material_type", "valid_from"), name="emissionfactor_unique"
+            ),
+        ),
+        migrations.AddField(
+            model_name="recyclinghistory",
+            name="emission_factor",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="individual.emissionfactor",
+            ),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("individual", "0008_emission_factors"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeaderboardEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[
+                            ("all", "All time"),
+                            ("month", "Monthly"),
+                            ("week", "Weekly"),
+                        ],
+                        max_length=5,
+                    ),
+                ),
+                ("period_start", models.DateField()),
+                ("region", models.CharField(blank=True, default="", max_length=50)),
+                (
+                    "total_kg",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Leaderboard Entries",
+                "indexes": [
+                    models.Index(
+                        fields=[
+                            "period",
+                            "period_start",
+                            "region",
+                            "-total_kg",
+                            "user",
+                        ],
+                        name="leaderboard_rank_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="leaderboardentry",
+            constraint=models.UniqueConstraint(
+                fields=("period", "period_start", "region", "user"),
+                name="leaderboard_entry_unique",
+            ),
+        ),
+    ]
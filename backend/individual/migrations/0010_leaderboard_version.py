@@ -0,0 +1,47 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("individual", "0009_leaderboard"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Leaderboard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[
+                            ("all", "All time"),
+                            ("month", "Monthly"),
+                            ("week", "Weekly"),
+                        ],
+                        max_length=5,
+                    ),
+                ),
+                ("period_start", models.DateField()),
+                ("region", models.CharField(blank=True, default="", max_length=50)),
+                ("version", models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="leaderboard",
+            constraint=models.UniqueConstraint(
+                fields=("period", "period_start", "region"), name="leaderboard_unique"
+            ),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("individual", "0010_leaderboard_version"),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name="Leaderboard",
+        ),
+    ]
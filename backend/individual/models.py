@@ -1,5 +1,8 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+
+from core.materials import MaterialLineQuerySet
 
 class Pickup(models.Model):
     STATUS_CHOICES = [
@@ -18,11 +21,45 @@ class Pickup(models.Model):
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['user', 'status', 'date'], name='pickup_user_status_date_idx'),
+            models.Index(fields=['user', '-date'], name='pickup_user_date_idx'),
+        ]
 
     def __str__(self):
         return f"Pickup for {self.user.email} on {self.date}"
 
+class PickupMaterial(models.Model):
+    """One material of a pickup, kept in sync with ``Pickup.materials``."""
+    PARENT_FIELD = 'pickup'
+    
+    pickup = models.ForeignKey(Pickup, on_delete=models.CASCADE, related_name='material_lines')
+    material = models.CharField(max_length=50)
+    quantity_kg = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Copy of the pickup's date so date ranges are read from this table's index
+    date = models.DateTimeField()
+    
+    objects = MaterialLineQuerySet.as_manager()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['pickup', 'material'], name='pickupmaterial_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['material', 'date'], name='pickupmaterial_material_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.quantity_kg}kg {self.material} for pickup {self.pickup_id}"
+
 class Challenge(models.Model):
+    METRIC_CHOICES = [
+        ('manual', 'Manual'),
+        ('pickups_completed', 'Pickups completed'),
+        ('recycled_kg', 'Recycled kg'),
+        ('co2_saved_kg', 'CO2 saved kg'),
+    ]
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
     description = models.TextField()
@@ -32,10 +69,21 @@ class Challenge(models.Model):
     start_date = models.DateTimeField()
     end_date = models.DateTimeField()
     is_active = models.BooleanField(default=True)
+    # Progress of non-manual challenges is kept by individual.progress
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES, default='manual')
+    material_type = models.CharField(max_length=50, blank=True)  # empty counts every material
+    metric_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    completed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-start_date']
+        indexes = [
+            models.Index(fields=['user', 'is_active', '-start_date'], name='challenge_user_active_idx'),
+            models.Index(fields=['user', '-start_date'], name='challenge_user_start_idx'),
+            models.Index(fields=['user', '-end_date'], name='challenge_user_end_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.user.email}"
@@ -48,10 +96,45 @@ class Reward(models.Model):
     is_claimed = models.BooleanField(default=False)
     claimed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='reward_user_created_idx'),
+            models.Index(fields=['user', 'is_claimed', '-created_at'], name='reward_user_claimed_idx'),
+            models.Index(
+                fields=['user', '-claimed_at'],
+                name='reward_user_claimed_at_idx',
+                condition=models.Q(is_claimed=True),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.user.email}"
 
+class EmissionFactor(models.Model):
+    """kg of CO2 saved per kg of a recycled material, for records dated on
+    or after ``valid_from`` until the material's next version."""
+    material_type = models.CharField(max_length=50)  # lower case
+    kg_co2_per_kg = models.DecimalField(max_digits=8, decimal_places=4)
+    valid_from = models.DateField()
+    source = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['material_type', 'valid_from']
+        constraints = [
+            models.UniqueConstraint(fields=['material_type', 'valid_from'], name='emissionfactor_unique'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        self.material_type = self.material_type.strip().lower()
+        super().save(*args, **kwargs)
+    
+    def __str__(self):
+        return f"{self.material_type}: {self.kg_co2_per_kg} kg CO2/kg from {self.valid_from}"
+
 class RecyclingHistory(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     material_type = models.CharField(max_length=50)  # plastic, paper, metal, glass, electronics
@@ -59,15 +142,57 @@ class RecyclingHistory(models.Model):
     pickup = models.ForeignKey(Pickup, on_delete=models.CASCADE, null=True, blank=True)
     date = models.DateTimeField()
     co2_saved_kg = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Factor version co2_saved_kg was computed with; empty when it was entered by hand
+    emission_factor = models.ForeignKey(
+        EmissionFactor, on_delete=models.PROTECT, null=True, blank=True, related_name='+',
+    )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = "Recycling Histories"
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['user', '-date'], name='history_user_date_idx'),
+            models.Index(fields=['date'], name='history_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.material_type} recycling by {self.user.email}"
 
+class LeaderboardEntry(models.Model):
+    """A user's recycled kg on one leaderboard: the all-time, monthly or
+    weekly board starting on ``period_start``, either global (blank
+    ``region``) or regional. Maintained by ``individual.leaderboard``."""
+    PERIOD_CHOICES = [
+        ('all', 'All time'),
+        ('month', 'Monthly'),
+        ('week', 'Weekly'),
+    ]
+    
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    region = models.CharField(max_length=50, blank=True, default='')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    total_kg = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = "Leaderboard Entries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'period_start', 'region', 'user'], name='leaderboard_entry_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['period', 'period_start', 'region', '-total_kg', 'user'], name='leaderboard_rank_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.total_kg}kg on {self.period} {self.period_start} {self.region}".rstrip()
+
 class MarketplaceItem(models.Model):
     CATEGORY_CHOICES = [
         ('furniture', 'Furniture'),
@@ -90,6 +215,176 @@ class MarketplaceItem(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Listings are only ever browsed while available
+            models.Index(
+                fields=['category', '-created_at'], name='item_available_category_idx',
+                condition=models.Q(is_available=True),
+            ),
+            models.Index(
+                fields=['-created_at'], name='item_available_created_idx',
+                condition=models.Q(is_available=True),
+            ),
+        ]
 
     def __str__(self):
-        return f"{self.name} - {self.user.email}"
\ No newline at end of file
+        return f"{self.name} - {self.user.email}"
+
+class UserImpactSummaryManager(models.Manager):
+    def apply_deltas(self, user_id, deltas, rebuild_missing=True):
+        """Add ``deltas`` to the user's summary row with a single UPDATE.
+
+        When the user has no summary yet it is built from the raw tables
+        instead (unless ``rebuild_missing`` is False), since those already
+        include the change being recorded.
+        """
+        deltas = {field: value for field, value in deltas.items() if value}
+        if not deltas:
+            return
+        updated = self.filter(user_id=user_id).update(
+            **{field: models.F(field) + value for field, value in deltas.items()},
+            updated_at=timezone.now(),
+        )
+        if not updated and rebuild_missing:
+            self.rebuild(user_ids=[user_id])
+
+    def apply_batch_deltas(self, deltas_by_user):
+        """Add per-user deltas for many users with a single UPDATE.
+
+        Users without a summary row are rebuilt from the raw tables, as in
+        ``apply_deltas``.
+        """
+        deltas_by_user = {
+            user_id: {field: value for field, value in deltas.items() if value}
+            for user_id, deltas in deltas_by_user.items()
+        }
+        deltas_by_user = {user_id: deltas for user_id, deltas in deltas_by_user.items() if deltas}
+        if not deltas_by_user:
+            return
+        existing = set(
+            self.filter(user_id__in=deltas_by_user).values_list('user_id', flat=True)
+        )
+        missing = [user_id for user_id in deltas_by_user if user_id not in existing]
+
+        fields = {field for user_id in existing for field in deltas_by_user[user_id]}
+        if fields:
+            updates = {}
+            for field in fields:
+                output_field = self.model._meta.get_field(field)
+                updates[field] = models.F(field) + models.Case(
+                    *[
+                        models.When(user_id=user_id, then=models.Value(deltas_by_user[user_id][field]))
+                        for user_id in existing if field in deltas_by_user[user_id]
+                    ],
+                    default=models.Value(0),
+                    output_field=output_field,
+                )
+            self.filter(user_id__in=existing).update(**updates, updated_at=timezone.now())
+        if missing:
+            self.rebuild(user_ids=missing)
+
+    def for_user(self, user):
+        try:
+            return self.get(user=user)
+        except self.model.DoesNotExist:
+            return self.rebuild(user_ids=[user.pk])[0]
+
+    def compute(self, user_ids=None):
+        """Compute summary values for ``user_ids`` (all users when None) from
+        the raw tables, using one grouped query per source table."""
+        values = {}
+
+        def scoped(queryset):
+            if user_ids is not None:
+                queryset = queryset.filter(user_id__in=user_ids)
+            return queryset.values('user_id')
+
+        def row(user_id):
+            return values.setdefault(user_id, {})
+
+        for entry in scoped(RecyclingHistory.objects.order_by()).annotate(
+            kg=models.Sum('weight_kg'), co2=models.Sum('co2_saved_kg')
+        ):
+            row(entry['user_id']).update(
+                total_recycled_kg=entry['kg'] or 0,
+                co2_saved_kg=entry['co2'] or 0,
+            )
+
+        for entry in scoped(
+            Challenge.objects.order_by().filter(progress__gte=models.F('target'))
+        ).annotate(count=models.Count('id')):
+            row(entry['user_id'])['challenges_completed'] = entry['count']
+
+        for entry in scoped(
+            Challenge.objects.order_by().filter(completed_at__isnull=False)
+        ).annotate(points=models.Sum('points_reward')):
+            row(entry['user_id'])['points_earned'] = entry['points'] or 0
+
+        for entry in scoped(Pickup.objects.order_by()).values('user_id', 'status').annotate(
+            count=models.Count('id')
+        ):
+            field = f"pickups_{entry['status']}"
+            if field in UserImpactSummary.PICKUP_COUNT_FIELDS:
+                row(entry['user_id'])[field] = entry['count']
+
+        if user_ids is not None:
+            for user_id in user_ids:
+                row(user_id)
+        return values
+
+    def rebuild(self, user_ids=None):
+        """Recompute and store summaries, returning the saved rows.
+
+        Rows are upserted, so concurrent rebuilds of a user that has no
+        summary yet both succeed instead of one failing on the unique user.
+        """
+        summaries = []
+        for user_id, values in self.compute(user_ids).items():
+            fields = {field: 0 for field in UserImpactSummary.COUNTER_FIELDS}
+            fields.update(values)
+            summaries.append(self.model(user_id=user_id, **fields))
+        return self.bulk_create(
+            summaries, batch_size=500, update_conflicts=True, unique_fields=['user'],
+            update_fields=[*UserImpactSummary.COUNTER_FIELDS, 'updated_at'],
+        )
+
+
+class UserImpactSummary(models.Model):
+    """Denormalized per-user totals read by the individual dashboard.
+
+    Kept current by the handlers in ``individual.signals`` and rebuilt or
+    verified from the raw tables with ``manage.py rebuild_impact_summary``.
+    """
+
+    PICKUP_COUNT_FIELDS = ['pickups_scheduled', 'pickups_completed', 'pickups_cancelled']
+    COUNTER_FIELDS = [
+        'total_recycled_kg', 'co2_saved_kg', 'challenges_completed', 'points_earned',
+        *PICKUP_COUNT_FIELDS,
+    ]
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='impact_summary'
+    )
+    total_recycled_kg = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    co2_saved_kg = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    challenges_completed = models.IntegerField(default=0)
+    points_earned = models.IntegerField(default=0)
+    pickups_scheduled = models.IntegerField(default=0)
+    pickups_completed = models.IntegerField(default=0)
+    pickups_cancelled = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = UserImpactSummaryManager()
+
+    class Meta:
+        verbose_name_plural = "User Impact Summaries"
+
+    def __str__(self):
+        return f"Impact summary for {self.user.email}"
+
+    @property
+    def pickup_counts(self):
+        return {
+            status: getattr(self, f'pickups_{status}')
+            for status, _ in Pickup.STATUS_CHOICES
+        }
@@ -0,0 +1,204 @@
+import threading
+import weakref
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.utils import timezone
+
+from core.dashboard_cache import invalidate
+from .models import Challenge, Pickup, RecyclingHistory, UserImpactSummary
+
+# Challenges with a metric other than 'manual' track their progress from the
+# rows users create. Saves and deletes of those rows record progress events;
+# the events of a transaction are buffered and applied once it commits, with
+# one locked read and one UPDATE for all affected challenges, so a bulk
+# import costs the same handful of queries as a single save.
+
+_pending = threading.local()
+
+
+def pickup_events(pickup, sign=1):
+    if pickup.status != 'completed':
+        return []
+    return [(pickup.user_id, pickup.date, None, {'pickups_completed': Decimal(sign)})]
+
+
+def recycling_events(history, sign=1):
+    return [(
+        history.user_id,
+        history.date,
+        history.material_type,
+        {
+            'recycled_kg': sign * Decimal(str(history.weight_kg or 0)),
+            'co2_saved_kg': sign * Decimal(str(history.co2_saved_kg or 0)),
+        },
+    )]
+
+
+EVENTS = {
+    Pickup: pickup_events,
+    RecyclingHistory: recycling_events,
+}
+
+
+def counts_towards(challenge, when, material_type):
+    if not challenge.start_date <= when <= challenge.end_date:
+        return False
+    if challenge.metric == 'pickups_completed':
+        return True
+    return not challenge.material_type or challenge.material_type == material_type
+
+
+class _Batch:
+    """Events of one savepoint level, applied by its on_commit callback."""
+
+    def __init__(self, key, events):
+        self.key = key
+        self.events = list(events)
+
+    def flush(self):
+        buffers = _buffers()
+        if buffers.get(self.key) is self:
+            del buffers[self.key]
+        apply_events(self.events)
+
+
+def _buffers():
+    buffers = getattr(_pending, 'buffers', None)
+    if buffers is None:
+        # Only the registered on_commit callback keeps a batch alive, so
+        # batches whose callback a rollback discarded drop out of the map
+        # instead of swallowing later events recorded under the same key.
+        buffers = _pending.buffers = weakref.WeakValueDictionary()
+    return buffers
+
+
+def record(events):
+    """Queue progress events to be applied when the transaction commits,
+    or apply them right away in autocommit mode."""
+    if not events:
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        apply_events(events)
+        return
+    # Batches are keyed by the savepoint stack so events recorded in a
+    # savepoint that is rolled back are dropped along with its callback.
+    key = (connection.alias, *connection.savepoint_ids)
+    buffers = _buffers()
+    batch = buffers.get(key)
+    if batch is not None:
+        batch.events.extend(events)
+        return
+    batch = buffers[key] = _Batch(key, events)
+    transaction.on_commit(batch.flush, using=connection.alias)
+
+
+def apply_events(events):
+    """Apply progress events to the active metric challenges of their users."""
+    by_user = defaultdict(list)
+    for user_id, when, material_type, amounts in events:
+        by_user[user_id].append((when, material_type, amounts))
+
+    with transaction.atomic():
+        challenges = list(
+            Challenge.objects.select_for_update()
+            .filter(user_id__in=by_user, is_active=True)
+            .exclude(metric='manual')
+            .order_by('pk')
+        )
+        totals = {}
+        for challenge in challenges:
+            delta = sum(
+                (
+                    amounts.get(challenge.metric, 0)
+                    for when, material_type, amounts in by_user[challenge.user_id]
+                    if counts_towards(challenge, when, material_type)
+                ),
+                Decimal(0),
+            )
+            if delta:
+                totals[challenge.pk] = max(challenge.metric_total + delta, Decimal(0))
+        store_totals([challenge for challenge in challenges if challenge.pk in totals], totals)
+
+
+def compute_totals(challenges):
+    """Metric totals of ``challenges`` computed from the raw tables."""
+    totals = {}
+    for challenge in challenges:
+        if challenge.metric == 'pickups_completed':
+            total = Pickup.objects.filter(
+                user_id=challenge.user_id, status='completed',
+                date__gte=challenge.start_date, date__lte=challenge.end_date,
+            ).count()
+        else:
+            source = 'weight_kg' if challenge.metric == 'recycled_kg' else 'co2_saved_kg'
+            history = RecyclingHistory.objects.filter(
+                user_id=challenge.user_id,
+                date__gte=challenge.start_date, date__lte=challenge.end_date,
+            )
+            if challenge.material_type:
+                history = history.filter(material_type=challenge.material_type)
+            total = history.aggregate(total=models.Sum(source))['total']
+        totals[challenge.pk] = Decimal(total or 0)
+    return totals
+
+
+def recompute(challenge_ids=None):
+    """Recompute the progress of active metric challenges from the raw
+    tables (all of them when ``challenge_ids`` is None)."""
+    with transaction.atomic():
+        challenges = Challenge.objects.select_for_update().filter(is_active=True).exclude(metric='manual')
+        if challenge_ids is not None:
+            challenges = challenges.filter(pk__in=challenge_ids)
+        challenges = list(challenges.order_by('pk'))
+        store_totals(challenges, compute_totals(challenges))
+    return len(challenges)
+
+
+def _by_pk(values, output_field):
+    return models.Case(
+        *[models.When(pk=pk, then=models.Value(value)) for pk, value in values.items()],
+        output_field=output_field,
+    )
+
+
+def store_totals(challenges, totals):
+    """Write new metric totals for locked ``challenges`` and complete those
+    that reached their target.
+
+    Completion deactivates the challenge, stamps ``completed_at`` and
+    credits ``points_reward`` to the owner's impact summary in the same
+    transaction, so points are granted exactly once.
+    """
+    if not challenges:
+        return
+    now = timezone.now()
+    summary_deltas = defaultdict(dict)
+    progress, completed = {}, []
+    for challenge in challenges:
+        new_progress = int(totals[challenge.pk])
+        progress[challenge.pk] = new_progress
+        reached = new_progress >= challenge.target
+        deltas = summary_deltas[challenge.user_id]
+        deltas['challenges_completed'] = (
+            deltas.get('challenges_completed', 0)
+            + int(reached) - int(challenge.progress >= challenge.target)
+        )
+        if reached:
+            completed.append(challenge.pk)
+            deltas['points_earned'] = deltas.get('points_earned', 0) + challenge.points_reward
+
+    Challenge.objects.filter(pk__in=progress).update(
+        metric_total=_by_pk(totals, Challenge._meta.get_field('metric_total')),
+        progress=_by_pk(progress, models.IntegerField()),
+        updated_at=now,
+    )
+    if completed:
+        Challenge.objects.filter(pk__in=completed).update(is_active=False, completed_at=now)
+
+    UserImpactSummary.objects.apply_batch_deltas(summary_deltas)
+    # Queryset updates skip the handlers that retire cached dashboards
+    for user_id in summary_deltas:
+        invalidate('individual', user_id)
@@ -0,0 +1,72 @@
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+from .models import MarketplaceItem
+
+# SQLite keeps available listings in an FTS5 table maintained by triggers;
+# PostgreSQL uses a generated tsvector column with a partial GIN index. Both
+# are created by migration 0003 and only exist on their own backend.
+FTS_TABLE = 'individual_marketplaceitem_fts'
+SEARCH_VECTOR_COLUMN = 'search_vector'
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TERMS = 8
+
+
+def search_terms(query):
+    return TERM_RE.findall(query.lower())[:MAX_TERMS]
+
+
+def search_marketplace(queryset, query):
+    """Filter ``queryset`` to items matching every term in ``query`` (each
+    term also matches as a prefix), ordered by relevance then recency."""
+    terms = search_terms(query)
+    if not terms:
+        return queryset.order_by('-created_at')
+
+    vendor = connections[queryset.db].vendor
+    table = MarketplaceItem._meta.db_table
+
+    if vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {table}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+            # FTS5 rank is bm25, where lower is more relevant
+            select={'search_rank': f'{FTS_TABLE}.rank'},
+        ).order_by('search_rank', '-created_at')
+
+    if vendor == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        return queryset.extra(
+            where=[f"{table}.{SEARCH_VECTOR_COLUMN} @@ to_tsquery('english', %s)"],
+            params=[tsquery],
+            select={
+                'search_rank': f"-ts_rank({table}.{SEARCH_VECTOR_COLUMN}, to_tsquery('english', %s))",
+            },
+            select_params=[tsquery],
+        ).order_by('search_rank', '-created_at')
+
+    for term in terms:
+        queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+    return queryset.order_by('-created_at')
+
+
+def rebuild_search_index(using='default'):
+    """Repopulate the SQLite FTS table from the listings table.
+
+    The PostgreSQL column is generated, so it never needs rebuilding.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    table = MarketplaceItem._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, name, description) '
+            f'SELECT id, name, description FROM {table} WHERE is_available'
+        )
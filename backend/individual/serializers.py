@@ -1,5 +1,7 @@
+from decimal import Decimal
+
 from rest_framework import serializers
-from .models import Pickup, Challenge, Reward, RecyclingHistory, MarketplaceItem
+from .models import Pickup, Challenge, Reward, RecyclingHistory, MarketplaceItem, LeaderboardEntry
 from users.models import User
 
 class UserSerializer(serializers.ModelSerializer):
@@ -16,7 +18,8 @@ class ChallengeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Challenge
         fields = ['id', 'title', 'description', 'target', 'progress', 'points_reward', 
-                  'start_date', 'end_date', 'is_active', 'created_at']
+                  'start_date', 'end_date', 'is_active', 'metric', 'material_type', 'completed_at',
+                  'created_at']
 
 class RewardSerializer(serializers.ModelSerializer):
     class Meta:
@@ -49,4 +52,30 @@ class IndividualDashboardSerializer(serializers.Serializer):
     recycling_history = RecyclingHistorySerializer(many=True)
     total_recycled_kg = serializers.DecimalField(max_digits=10, decimal_places=2)
     co2_saved_total = serializers.DecimalField(max_digits=10, decimal_places=2)
-    challenges_completed_count = serializers.IntegerField()
\ No newline at end of file
+    challenges_completed_count = serializers.IntegerField()
+    pickup_counts = serializers.DictField(child=serializers.IntegerField())
+    leaderboard = serializers.DictField()
+
+class LeaderboardEntrySerializer(serializers.ModelSerializer):
+    rank = serializers.SerializerMethodField()
+    name = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = LeaderboardEntry
+        fields = ['rank', 'user', 'name', 'total_kg']
+    
+    def get_rank(self, obj):
+        return self.context['ranks'].rank(obj.total_kg)
+    
+    def get_name(self, obj):
+        return obj.user.get_full_name() or f"Recycler {obj.user_id}"
+
+class RecyclingHistoryIngestSerializer(serializers.Serializer):
+    """One row of a bulk recycling upload. ``user`` is the owner's email and
+    defaults to the uploader."""
+    user = serializers.EmailField(required=False)
+    material_type = serializers.CharField(max_length=50)
+    weight_kg = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+    date = serializers.DateTimeField()
+    # Computed from the material's emission factor when omitted
+    co2_saved_kg = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), required=False)
@@ -0,0 +1,263 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from core.dashboard_cache import invalidate
+from core.materials import material_quantities
+from users.models import User
+from . import leaderboard, progress
+from .emissions import factors_changed, is_scored, score_records
+from .models import (
+    Challenge, EmissionFactor, Pickup, PickupMaterial, RecyclingHistory, Reward, UserImpactSummary,
+)
+
+# Sent once per ``bulk_create`` batch of RecyclingHistory rows with
+# ``instances``, since bulk inserts skip the per-row save signals.
+recycling_history_bulk_created = Signal()
+
+# Each tracked row contributes a fixed amount to its owner's summary. On save
+# the previous contribution is subtracted and the new one added, so edits,
+# status changes and owner reassignments all become a single delta UPDATE
+# inside the writer's transaction.
+
+def recycling_contribution(history):
+    return {
+        'total_recycled_kg': Decimal(str(history.weight_kg or 0)),
+        'co2_saved_kg': Decimal(str(history.co2_saved_kg or 0)),
+    }
+
+
+def challenge_contribution(challenge):
+    return {
+        'challenges_completed': int(challenge.progress >= challenge.target),
+        'points_earned': challenge.points_reward if challenge.completed_at else 0,
+    }
+
+
+def pickup_contribution(pickup):
+    field = f'pickups_{pickup.status}'
+    if field not in UserImpactSummary.PICKUP_COUNT_FIELDS:
+        return {}
+    return {field: 1}
+
+
+CONTRIBUTIONS = {
+    RecyclingHistory: recycling_contribution,
+    Challenge: challenge_contribution,
+    Pickup: pickup_contribution,
+}
+
+
+def _negate(contribution):
+    return {field: -value for field, value in contribution.items()}
+
+
+def _merge(*contributions):
+    merged = {}
+    for contribution in contributions:
+        for field, value in contribution.items():
+            merged[field] = merged.get(field, 0) + value
+    return merged
+
+
+@receiver(pre_save, sender=RecyclingHistory)
+@receiver(pre_save, sender=Challenge)
+@receiver(pre_save, sender=Pickup)
+def remember_previous_contribution(sender, instance, raw=False, **kwargs):
+    instance._previous_contribution = None
+    instance._previous_row = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    previous = sender.objects.filter(pk=instance.pk).first()
+    instance._previous_row = previous
+    if previous is not None:
+        instance._previous_contribution = (
+            previous.user_id, CONTRIBUTIONS[sender](previous)
+        )
+
+
+SCORED_INPUTS = ('weight_kg', 'material_type', 'date')
+
+
+@receiver(pre_save, sender=RecyclingHistory)
+def score_co2(sender, instance, raw=False, **kwargs):
+    # Records without a CO2 figure are scored, and scored records are
+    # re-scored when their weight, material or date change. A CO2 figure
+    # set by hand is a correction: it keeps the figure and drops the
+    # factor, so recompute_co2 leaves it alone too.
+    if raw:
+        return
+    previous = getattr(instance, '_previous_row', None)
+    if previous is not None and instance.co2_saved_kg and instance.co2_saved_kg != previous.co2_saved_kg:
+        instance.emission_factor_id = None
+    elif is_scored(instance) and (
+        previous is None or not instance.co2_saved_kg
+        or any(getattr(instance, field) != getattr(previous, field) for field in SCORED_INPUTS)
+    ):
+        score_records([instance])
+
+
+@receiver(post_save, sender=EmissionFactor)
+@receiver(post_delete, sender=EmissionFactor)
+def reload_emission_factors(sender, instance, **kwargs):
+    factors_changed()
+
+
+# Registered before record_progress_on_save, which clears ``_previous_row``
+@receiver(post_save, sender=RecyclingHistory)
+def update_leaderboards_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    events = [(instance.user_id, instance.date, instance.weight_kg)]
+    previous = getattr(instance, '_previous_row', None)
+    if previous is not None:
+        if (previous.user_id, previous.date, previous.weight_kg) == events[0]:
+            return
+        events.append((previous.user_id, previous.date, -previous.weight_kg))
+    leaderboard.apply_events(events)
+
+
+@receiver(post_delete, sender=RecyclingHistory)
+def update_leaderboards_on_delete(sender, instance, **kwargs):
+    leaderboard.apply_events([(instance.user_id, instance.date, -instance.weight_kg)])
+
+
+@receiver(recycling_history_bulk_created)
+def update_leaderboards_on_bulk_create(sender, instances, **kwargs):
+    leaderboard.apply_events([(instance.user_id, instance.date, instance.weight_kg) for instance in instances])
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_region(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._previous_region = None
+    if raw or instance.pk is None or (update_fields is not None and 'region' not in update_fields):
+        return
+    instance._previous_region = User.objects.filter(pk=instance.pk).values_list('region', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def move_regional_entries(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_region', None)
+    if not raw and not created and previous is not None and previous != instance.region:
+        leaderboard.rebuild(user_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Pickup)
+def sync_pickup_materials(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not {'materials', 'date'} & set(update_fields)):
+        return
+    previous = getattr(instance, '_previous_row', None)
+    if previous is not None and previous.materials == instance.materials:
+        if previous.date != instance.date:
+            PickupMaterial.objects.filter(pickup=instance).update(date=instance.date)
+        return
+    PickupMaterial.objects.replace_for(
+        instance, material_quantities(instance.materials), existing=not created, date=instance.date,
+    )
+
+
+@receiver(post_save, sender=RecyclingHistory)
+@receiver(post_save, sender=Challenge)
+@receiver(post_save, sender=Pickup)
+def update_summary_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    current = CONTRIBUTIONS[sender](instance)
+    previous = getattr(instance, '_previous_contribution', None)
+    instance._previous_contribution = None
+    if previous is None:
+        UserImpactSummary.objects.apply_deltas(instance.user_id, current)
+        return
+
+    previous_user_id, previous_contribution = previous
+    if previous_user_id == instance.user_id:
+        UserImpactSummary.objects.apply_deltas(
+            instance.user_id, _merge(current, _negate(previous_contribution))
+        )
+    else:
+        UserImpactSummary.objects.apply_deltas(
+            previous_user_id, _negate(previous_contribution)
+        )
+        UserImpactSummary.objects.apply_deltas(instance.user_id, current)
+
+
+@receiver(post_delete, sender=RecyclingHistory)
+@receiver(post_delete, sender=Challenge)
+@receiver(post_delete, sender=Pickup)
+def update_summary_on_delete(sender, instance, **kwargs):
+    # The summary itself may already be gone when the owner is being deleted,
+    # so a missing row is left for the next read to rebuild.
+    UserImpactSummary.objects.apply_deltas(
+        instance.user_id,
+        _negate(CONTRIBUTIONS[sender](instance)),
+        rebuild_missing=False,
+    )
+
+
+@receiver(post_save, sender=RecyclingHistory)
+@receiver(post_save, sender=Pickup)
+def record_progress_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    events = progress.EVENTS[sender](instance)
+    previous = getattr(instance, '_previous_row', None)
+    instance._previous_row = None
+    if previous is not None:
+        events += progress.EVENTS[sender](previous, sign=-1)
+    progress.record(events)
+
+
+@receiver(post_delete, sender=RecyclingHistory)
+@receiver(post_delete, sender=Pickup)
+def record_progress_on_delete(sender, instance, **kwargs):
+    progress.record(progress.EVENTS[sender](instance, sign=-1))
+
+
+@receiver(post_save, sender=Challenge)
+def recompute_challenge_progress(sender, instance, raw=False, **kwargs):
+    # Metric, window or target edits change what the progress should be
+    if raw or instance.metric == 'manual' or not instance.is_active:
+        return
+    transaction.on_commit(lambda: progress.recompute([instance.pk]))
+
+
+@receiver(recycling_history_bulk_created)
+def record_progress_on_bulk_create(sender, instances, **kwargs):
+    progress.record([event for instance in instances for event in progress.recycling_events(instance)])
+
+
+@receiver(recycling_history_bulk_created)
+def update_summaries_on_bulk_create(sender, instances, **kwargs):
+    deltas_by_user = {}
+    for instance in instances:
+        deltas_by_user[instance.user_id] = _merge(
+            deltas_by_user.get(instance.user_id, {}), recycling_contribution(instance)
+        )
+    UserImpactSummary.objects.apply_batch_deltas(deltas_by_user)
+    for user_id in deltas_by_user:
+        invalidate('individual', user_id)
+
+
+@receiver(post_save, sender=Pickup)
+@receiver(post_save, sender=Challenge)
+@receiver(post_save, sender=Reward)
+@receiver(post_save, sender=RecyclingHistory)
+@receiver(post_delete, sender=Pickup)
+@receiver(post_delete, sender=Challenge)
+@receiver(post_delete, sender=Reward)
+@receiver(post_delete, sender=RecyclingHistory)
+def invalidate_individual_dashboard(sender, instance, **kwargs):
+    invalidate('individual', instance.user_id)
+
+
+@receiver(post_save, sender=Pickup)
+@receiver(post_delete, sender=Pickup)
+def invalidate_pickup_breakdown(sender, instance, **kwargs):
+    invalidate('pickups')
+
+
+@receiver(post_save, sender=User)
+def invalidate_dashboard_profile(sender, instance, **kwargs):
+    invalidate('individual', instance.pk)
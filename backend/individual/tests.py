@@ -1,3 +1,1001 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+import gzip
+import json
+from io import BytesIO, StringIO
+import random
+import threading
+from types import SimpleNamespace
+import unittest
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from core import concurrent
+from core.pagination import ListPagination
+from core.streaming import buffered, iter_serialized, json_array
+from core.testing import QueryBudgetMixin, QueryPlanMixin, response_rows
+from . import leaderboard, search
+from .emissions import FactorTable, factors_changed
+from .ingest import RecyclingHistoryIngest
+from .search import search_marketplace
+from .serializers import MarketplaceItemSerializer
+from users.models import User
+from .views import IndividualDashboardView
+from .models import (
+    Challenge, EmissionFactor, LeaderboardEntry, MarketplaceItem, Pickup, PickupMaterial, RecyclingHistory,
+    Reward, UserImpactSummary, UserImpactSummaryManager,
+)
+
+
+class MarketplaceQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer@example.com', 'password')
+        self.client.force_authenticate(self.user)
+
+    def seed_items(self, size):
+        for i in range(size):
+            seller = User.objects.create_user(f'seller{i}@example.com', 'password')
+            MarketplaceItem.objects.create(
+                user=seller, name=f'Item {i}', description='Reclaimed wood',
+                price=10, category='furniture',
+            )
+
+    def test_list_uses_constant_queries(self):
+        self.assertQueryBudget('/api/individual/marketplace/', self.seed_items, max_queries=2)
+
+    def test_paginated_list_uses_constant_queries(self):
+        self.assertQueryBudget(
+            '/api/individual/marketplace/', self.seed_items, max_queries=3, data={'page': 1},
+        )
+
+    def test_streamed_list_uses_constant_queries(self):
+        self.assertQueryBudget(
+            '/api/individual/marketplace/', self.seed_items, max_queries=2, data={'stream': 'ndjson'},
+        )
+
+
+class MarketplaceSearchTests(APITestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user('seller@example.com', 'password')
+        self.client.force_authenticate(self.seller)
+
+    def list_item(self, name, description, **kwargs):
+        return MarketplaceItem.objects.create(
+            user=self.seller, name=name, description=description, price=10, category='furniture', **kwargs,
+        )
+
+    def search(self, query):
+        return [item.name for item in search_marketplace(MarketplaceItem.objects.all(), query)]
+
+    def test_search_follows_inserts_updates_and_deletes(self):
+        chair = self.list_item('Oak chair', 'Reclaimed wood')
+        self.list_item('Glass vase', 'Blown by hand')
+        self.list_item('Sold chair', 'Reclaimed wood', is_available=False)
+        self.assertEqual(self.search('chair'), ['Oak chair'])
+
+        chair.name = 'Oak stool'
+        chair.save()
+        self.assertEqual(self.search('chair'), [])
+        self.assertEqual(self.search('stool'), ['Oak stool'])
+
+        chair.is_available = False
+        chair.save()
+        self.assertEqual(self.search('stool'), [])
+        chair.is_available = True
+        chair.save()
+        self.assertEqual(self.search('stool'), ['Oak stool'])
+
+        chair.delete()
+        self.assertEqual(self.search('oak'), [])
+
+    def test_terms_match_as_prefixes_and_must_all_match(self):
+        self.list_item('Oak chair', 'Reclaimed wood')
+        self.list_item('Pine chair', 'Painted white')
+        self.assertEqual(self.search('chai'), ['Pine chair', 'Oak chair'])
+        self.assertEqual(self.search('reclaim CHAIR'), ['Oak chair'])
+        self.assertEqual(self.search('chair metal'), [])
+        self.assertEqual(self.search('!!'), ['Pine chair', 'Oak chair'])
+
+    def test_results_are_ranked_by_relevance_before_recency(self):
+        self.list_item('Oak table', 'Solid oak with an oiled oak top')
+        self.list_item(
+            'Lamp', 'Brass lamp with a glass shade, a steel stem, a marble foot and a small oak knob on the cord',
+        )
+        self.assertEqual(self.search('oak'), ['Oak table', 'Lamp'])
+
+        response = self.client.get('/api/individual/marketplace/', {'search': 'oak'})
+        self.assertEqual([row['name'] for row in response_rows(response)], ['Oak table', 'Lamp'])
+
+    def test_other_databases_fall_back_to_substring_matching(self):
+        self.list_item('Oak chair', 'Reclaimed wood')
+        self.list_item('Pine chair', 'Painted white')
+        other_database = {MarketplaceItem.objects.db: SimpleNamespace(vendor='mysql')}
+        with mock.patch.object(search, 'connections', other_database):
+            self.assertEqual(self.search('CHAIR'), ['Pine chair', 'Oak chair'])
+            self.assertEqual(self.search('chair white'), ['Pine chair'])
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'only the SQLite index is stored separately')
+    def test_rebuild_restores_the_index(self):
+        self.list_item('Oak chair', 'Reclaimed wood')
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.FTS_TABLE}')
+        self.assertEqual(self.search('chair'), [])
+
+        call_command('rebuild_marketplace_search', stdout=StringIO())
+        self.assertEqual(self.search('chair'), ['Oak chair'])
+
+
+class ListResponseTests(APITestCase):
+    url = '/api/individual/marketplace/'
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer@example.com', 'password', first_name='Sam', last_name='Lee')
+        self.client.force_authenticate(self.user)
+        for i in range(5):
+            MarketplaceItem.objects.create(
+                user=self.user, name=f'Item {i}', description='Reclaimed wood', price=10, category='furniture',
+            )
+        self.names = [f'Item {i}' for i in reversed(range(5))]
+
+    def test_plain_list_is_streamed(self):
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        rows = response_rows(response)
+        self.assertEqual([row['name'] for row in rows], self.names)
+        self.assertEqual(rows[0]['seller_name'], 'Sam Lee')
+
+    def test_pages_are_limited(self):
+        response = self.client.get(self.url, {'page': 2, 'page_size': 2})
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual([row['name'] for row in response.data['results']], self.names[2:4])
+        self.assertIn('page=3', response.data['next'])
+        self.assertIsNotNone(response.data['previous'])
+
+        # page_size alone pages too, clamped to max_page_size
+        with mock.patch.object(ListPagination, 'max_page_size', 3):
+            response = self.client.get(self.url, {'page_size': 1000})
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(self.client.get(self.url, {'page': 9}).status_code, 404)
+
+    def test_streamed_rows_match_the_plain_list(self):
+        expected = response_rows(self.client.get(self.url))
+
+        response = self.client.get(self.url, {'stream': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual([json.loads(line) for line in body.splitlines()], expected)
+
+        for stream in ('json', 'xml'):
+            response = self.client.get(self.url, {'stream': stream})
+            self.assertEqual(response['Content-Type'], 'application/json')
+            self.assertEqual(response_rows(response), expected)
+
+    def test_rows_are_serialized_in_chunks(self):
+        items = MarketplaceItem.objects.select_related('user').order_by('-created_at')
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(iter_serialized(items, MarketplaceItemSerializer, chunk_size=2))
+        self.assertEqual([row['name'] for row in rows], self.names)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(list(json_array([])), ['[', ']'])
+
+
+class IndividualQueryPlanTests(QueryPlanMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        users = [
+            User.objects.create_user(f'user{i}@example.com', 'password', region=['north', ''][i % 2])
+            for i in range(5)
+        ]
+        cls.user = users[0]
+        for i, user in enumerate(users * 6):
+            when = now + timedelta(days=i - 15)
+            Pickup.objects.create(
+                user=user, date=when, address='1 Green Street',
+                status=['scheduled', 'completed', 'cancelled'][i % 3], materials={'paper': 2},
+            )
+            Challenge.objects.create(
+                user=user, title='Recycle', description='Recycle more', target=5, progress=i % 7,
+                points_reward=10, start_date=when, end_date=when + timedelta(days=7),
+                is_active=bool(i % 2),
+            )
+            Reward.objects.create(
+                user=user, name='Voucher', points_required=50, description='Shop voucher',
+                is_claimed=bool(i % 2), claimed_at=when if i % 2 else None,
+            )
+            RecyclingHistory.objects.create(
+                user=user, material_type='plastic', weight_kg=2, co2_saved_kg=1, date=when,
+            )
+            MarketplaceItem.objects.create(
+                user=user, name='Chair', description='Reclaimed wood', price=10,
+                category=['furniture', 'clothing'][i % 2], is_available=bool(i % 4),
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def test_dashboard_is_indexed(self):
+        self.assertIndexedQueries('/api/individual/dashboard/')
+
+    def test_pickups_are_indexed(self):
+        for pickup_type in ('all', 'upcoming', 'past'):
+            self.assertIndexedQueries('/api/individual/pickups/', {'type': pickup_type})
+
+    def test_challenges_are_indexed(self):
+        for challenge_type in ('all', 'active', 'completed'):
+            self.assertIndexedQueries('/api/individual/challenges/', {'type': challenge_type})
+
+    def test_rewards_are_indexed(self):
+        for reward_type in ('all', 'available', 'claimed'):
+            self.assertIndexedQueries('/api/individual/rewards/', {'type': reward_type})
+
+    def test_leaderboard_is_indexed(self):
+        for period in ('all', 'month', 'week'):
+            self.assertIndexedQueries('/api/individual/leaderboard/', {'period': period})
+            self.assertIndexedQueries('/api/individual/leaderboard/', {'period': period, 'region': 'mine'})
+        self.assertIndexedQueries('/api/individual/leaderboard/', {'page': 1})
+
+    def test_marketplace_is_indexed(self):
+        self.assertIndexedQueries('/api/individual/marketplace/')
+        self.assertIndexedQueries('/api/individual/marketplace/', {'category': 'furniture'})
+
+    # Matches are ranked by relevance, so only their final order is sorted
+    def test_marketplace_search_is_indexed(self):
+        self.assertIndexedQueries('/api/individual/marketplace/', {'search': 'reclaimed'}, sorted_results=True)
+        self.assertIndexedQueries(
+            '/api/individual/marketplace/', {'search': 'reclaimed wood', 'category': 'furniture'},
+            sorted_results=True,
+        )
+
+
+@override_settings(RECYCLING_INGEST_BATCH_SIZE=2)
+class RecyclingHistoryUploadTests(APITestCase):
+    url = '/api/individual/recycling-history/upload/'
+
+    def setUp(self):
+        self.center = User.objects.create_user(
+            'center@example.com', 'password', user_type='recycling_center'
+        )
+        self.alice = User.objects.create_user('alice@example.com', 'password')
+        self.bob = User.objects.create_user('bob@example.com', 'password')
+        UserImpactSummary.objects.rebuild(user_ids=[self.alice.pk, self.bob.pk])
+        self.client.force_authenticate(self.center)
+
+    def upload(self, body, content_type):
+        return self.client.generic('POST', self.url, body.encode(), content_type=content_type)
+
+    def test_csv_upload_reports_bad_rows_and_keeps_the_rest(self):
+        body = (
+            'user,material_type,weight_kg,date,co2_saved_kg\n'
+            'alice@example.com,plastic,2.50,2026-01-05T10:00:00Z,1.00\n'
+            'bob@example.com,paper,-1,2026-01-05T10:00:00Z,\n'
+            'alice@example.com,metal,1.25,2026-01-06T10:00:00Z,0.50\n'
+            'nobody@example.com,glass,3,2026-01-06T10:00:00Z,\n'
+            'bob@example.com,glass,4,2026-01-07T10:00:00Z,\n'
+        )
+        response = self.upload(body, 'text/csv')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(response.data['failed'], 2)
+        self.assertEqual([error['line'] for error in response.data['errors']], [3, 5])
+        self.assertIn('weight_kg', response.data['errors'][0]['errors'])
+        self.assertIn('user', response.data['errors'][1]['errors'])
+
+        alice = UserImpactSummary.objects.get(user=self.alice)
+        self.assertEqual(alice.total_recycled_kg, Decimal('3.75'))
+        self.assertEqual(alice.co2_saved_kg, Decimal('1.50'))
+        self.assertEqual(UserImpactSummary.objects.get(user=self.bob).total_recycled_kg, Decimal('4.00'))
+
+    def test_summaries_are_updated_once_per_batch(self):
+        lines = [
+            f'{{"user": "{email}", "material_type": "paper", "weight_kg": "1", "date": "2026-01-05T10:00:00Z"}}'
+            for email in ['alice@example.com', 'bob@example.com'] * 3
+        ]
+        with CaptureQueriesContext(connection) as context:
+            response = self.upload('\n'.join(lines), 'application/x-ndjson')
+
+        self.assertEqual(response.data['created'], 6)
+        summary_updates = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('UPDATE "individual_userimpactsummary"')
+        ]
+        self.assertEqual(len(summary_updates), 3)
+        self.assertEqual(UserImpactSummary.objects.get(user=self.bob).total_recycled_kg, Decimal('3.00'))
+
+    def test_individuals_can_only_upload_their_own_history(self):
+        self.client.force_authenticate(self.alice)
+        body = (
+            '{"material_type": "paper", "weight_kg": "1", "date": "2026-01-05T10:00:00Z"}\n'
+            'not json\n'
+            '{"user": "bob@example.com", "material_type": "paper", "weight_kg": "1", "date": "2026-01-05T10:00:00Z"}\n'
+        )
+        response = self.upload(body, 'application/x-ndjson')
+
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['line'] for error in response.data['errors']], [2, 3])
+        self.assertEqual(RecyclingHistory.objects.get().user, self.alice)
+
+    def test_unsupported_format_is_rejected(self):
+        response = self.upload('<rows/>', 'application/xml')
+        self.assertEqual(response.status_code, 400)
+
+
+class UserImpactSummaryTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice@example.com', 'password')
+        self.bob = User.objects.create_user('bob@example.com', 'password')
+        UserImpactSummary.objects.rebuild(user_ids=[self.alice.pk, self.bob.pk])
+
+    def write(self, action, *args, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return action(*args, **kwargs)
+
+    def assertSummariesMatchRawTables(self):
+        expected = UserImpactSummary.objects.compute([self.alice.pk, self.bob.pk])
+        for user in (self.alice, self.bob):
+            summary = UserImpactSummary.objects.get(user=user)
+            self.assertEqual(
+                {field: getattr(summary, field) for field in UserImpactSummary.COUNTER_FIELDS},
+                {field: expected[user.pk].get(field, 0) for field in UserImpactSummary.COUNTER_FIELDS},
+            )
+
+    def verify(self):
+        out = StringIO()
+        call_command('rebuild_impact_summary', '--verify', stdout=out)
+        return out.getvalue()
+
+    def test_recycling_writes_keep_summaries_current(self):
+        record = self.write(
+            RecyclingHistory.objects.create,
+            user=self.alice, material_type='plastic', weight_kg=Decimal('4.00'),
+            co2_saved_kg=Decimal('2.00'), date=timezone.now(),
+        )
+        self.assertEqual(UserImpactSummary.objects.get(user=self.alice).total_recycled_kg, Decimal('4.00'))
+        self.assertSummariesMatchRawTables()
+
+        record.weight_kg = Decimal('6.50')
+        self.write(record.save)
+        self.assertEqual(UserImpactSummary.objects.get(user=self.alice).total_recycled_kg, Decimal('6.50'))
+        self.assertSummariesMatchRawTables()
+
+        record.user = self.bob
+        self.write(record.save)
+        self.assertEqual(UserImpactSummary.objects.get(user=self.alice).total_recycled_kg, 0)
+        self.assertEqual(UserImpactSummary.objects.get(user=self.bob).co2_saved_kg, Decimal('2.00'))
+        self.assertSummariesMatchRawTables()
+
+        self.write(record.delete)
+        self.assertEqual(UserImpactSummary.objects.get(user=self.bob).total_recycled_kg, 0)
+        self.assertSummariesMatchRawTables()
+
+    def test_pickup_and_challenge_writes_keep_summaries_current(self):
+        pickup = self.write(
+            Pickup.objects.create, user=self.alice, date=timezone.now(), address='1 Green Street', materials={},
+        )
+        pickup.status = 'completed'
+        self.write(pickup.save)
+        self.assertEqual(UserImpactSummary.objects.get(user=self.alice).pickup_counts['completed'], 1)
+        pickup.user = self.bob
+        self.write(pickup.save)
+        self.assertSummariesMatchRawTables()
+
+        challenge = self.write(
+            Challenge.objects.create,
+            user=self.alice, title='Recycle', description='Recycle more', target=1, progress=1,
+            points_reward=10, start_date=timezone.now(), end_date=timezone.now() + timedelta(days=1),
+        )
+        self.assertEqual(UserImpactSummary.objects.get(user=self.alice).challenges_completed, 1)
+        challenge.user = self.bob
+        self.write(challenge.save)
+        self.assertSummariesMatchRawTables()
+
+        self.write(pickup.delete)
+        self.write(challenge.delete)
+        self.assertSummariesMatchRawTables()
+
+    def test_verify_reports_drift_and_rebuild_repairs_it(self):
+        RecyclingHistory.objects.create(
+            user=self.alice, material_type='paper', weight_kg=Decimal('3.00'),
+            co2_saved_kg=Decimal('1.00'), date=timezone.now(),
+        )
+        self.assertIn('2 summaries verified.', self.verify())
+
+        UserImpactSummary.objects.filter(user=self.alice).update(total_recycled_kg=Decimal('9.00'), points_earned=5)
+        with self.assertRaisesMessage(CommandError, '2 summary values are out of date.'):
+            self.verify()
+
+        out = StringIO()
+        call_command('rebuild_impact_summary', '--user', str(self.bob.pk), stdout=out)
+        self.assertIn('Rebuilt 1 summaries.', out.getvalue())
+        with self.assertRaises(CommandError):
+            self.verify()
+
+        call_command('rebuild_impact_summary', stdout=StringIO())
+        self.assertIn('2 summaries verified.', self.verify())
+        self.assertSummariesMatchRawTables()
+
+    def test_rebuild_upserts_rows_created_concurrently(self):
+        carol = User.objects.create_user('carol@example.com', 'password')
+        RecyclingHistory.objects.create(
+            user=carol, material_type='paper', weight_kg=Decimal('2.00'), co2_saved_kg=Decimal('1.00'),
+            date=timezone.now(),
+        )
+        UserImpactSummary.objects.filter(user=carol).delete()
+        compute = UserImpactSummaryManager.compute
+
+        def compute_then_race(manager, user_ids=None):
+            values = compute(manager, user_ids)
+            # Another writer creates the row between the read and the write
+            UserImpactSummary.objects.create(user=carol, total_recycled_kg=Decimal('7.00'))
+            return values
+
+        with mock.patch.object(UserImpactSummaryManager, 'compute', autospec=True, side_effect=compute_then_race):
+            summary, = UserImpactSummary.objects.rebuild(user_ids=[carol.pk])
+
+        stored = UserImpactSummary.objects.get(user=carol)
+        self.assertEqual(summary.pk, stored.pk)
+        self.assertEqual((stored.total_recycled_kg, stored.co2_saved_kg), (Decimal('2.00'), Decimal('1.00')))
+
+
+class ChallengeProgressTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('runner@example.com', 'password')
+        self.start = timezone.now() - timedelta(days=1)
+        self.end = timezone.now() + timedelta(days=6)
+
+    def create_challenge(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Challenge.objects.create(
+                user=self.user, title='Recycle', description='Recycle more', points_reward=25,
+                start_date=self.start, end_date=self.end, **kwargs,
+            )
+
+    def recycle(self, weight, material='plastic', when=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return RecyclingHistory.objects.create(
+                user=self.user, material_type=material, weight_kg=weight,
+                date=when or timezone.now(), co2_saved_kg=weight / 2,
+            )
+
+    def test_progress_counts_matching_rows_inside_the_window(self):
+        challenge = self.create_challenge(target=10, metric='recycled_kg', material_type='plastic')
+        self.recycle(Decimal('2.5'))
+        self.recycle(Decimal('4'), material='paper')
+        self.recycle(Decimal('3'), when=self.start - timedelta(days=1))
+        self.recycle(Decimal('1'))
+
+        challenge.refresh_from_db()
+        self.assertEqual(challenge.metric_total, Decimal('3.50'))
+        self.assertEqual(challenge.progress, 3)
+        self.assertTrue(challenge.is_active)
+
+    def test_edits_and_deletes_are_reflected(self):
+        challenge = self.create_challenge(target=10, metric='pickups_completed')
+        with self.captureOnCommitCallbacks(execute=True):
+            pickup = Pickup.objects.create(
+                user=self.user, date=timezone.now(), address='1 Green Street', status='scheduled',
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            pickup.status = 'completed'
+            pickup.save()
+        challenge.refresh_from_db()
+        self.assertEqual(challenge.progress, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pickup.delete()
+        challenge.refresh_from_db()
+        self.assertEqual(challenge.progress, 0)
+
+    def test_new_challenges_start_from_existing_rows(self):
+        self.recycle(Decimal('6'))
+        challenge = self.create_challenge(target=20, metric='co2_saved_kg')
+
+        challenge.refresh_from_db()
+        self.assertEqual(challenge.metric_total, Decimal('3.00'))
+
+    def test_completion_deactivates_and_grants_points_once(self):
+        challenge = self.create_challenge(target=5, metric='recycled_kg')
+        self.recycle(Decimal('5'))
+        self.recycle(Decimal('5'))
+
+        challenge.refresh_from_db()
+        self.assertFalse(challenge.is_active)
+        self.assertIsNotNone(challenge.completed_at)
+        self.assertEqual(challenge.progress, 5)
+        summary = UserImpactSummary.objects.get(user=self.user)
+        self.assertEqual(summary.points_earned, 25)
+        self.assertEqual(summary.challenges_completed, 1)
+        self.assertEqual(
+            UserImpactSummary.objects.compute([self.user.pk])[self.user.pk]['points_earned'], 25
+        )
+
+    def test_rolled_back_savepoints_drop_only_their_events(self):
+        challenge = self.create_challenge(target=100, metric='recycled_kg')
+
+        def recycle(weight):
+            RecyclingHistory.objects.create(
+                user=self.user, material_type='plastic', weight_kg=Decimal(weight), date=timezone.now(),
+            )
+
+        with CaptureQueriesContext(connection) as context:
+            with self.captureOnCommitCallbacks(execute=True):
+                recycle('2')
+                with self.assertRaises(RuntimeError), transaction.atomic():
+                    recycle('3')
+                    raise RuntimeError
+                with transaction.atomic():
+                    recycle('5')
+                recycle('7')
+
+        challenge.refresh_from_db()
+        self.assertEqual(challenge.progress, 14)
+        # One batch for the transaction and one for the kept savepoint
+        challenge_updates = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('UPDATE "individual_challenge"')
+        ]
+        self.assertEqual(len(challenge_updates), 2)
+
+    def test_bulk_import_updates_progress_once_per_batch(self):
+        challenges = [
+            self.create_challenge(target=1000, metric='recycled_kg'),
+            self.create_challenge(target=1000, metric='co2_saved_kg'),
+        ]
+        rows = '\n'.join(
+            f'{{"material_type": "glass", "weight_kg": "2", "co2_saved_kg": "1", "date": "{timezone.now().isoformat()}"}}'
+            for _ in range(6)
+        )
+        with CaptureQueriesContext(connection) as context:
+            with self.captureOnCommitCallbacks(execute=True):
+                RecyclingHistoryIngest(self.user, batch_size=3).run(BytesIO(rows.encode()), 'ndjson')
+
+        challenge_updates = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('UPDATE "individual_challenge"')
+        ]
+        self.assertEqual(len(challenge_updates), 2)
+        for challenge in challenges:
+            challenge.refresh_from_db()
+        self.assertEqual([c.progress for c in challenges], [12, 6])
+
+
+class AutocommitChallengeProgressTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('autocommit@example.com', 'password')
+        self.now = timezone.now()
+
+    def create_challenge(self, metric):
+        return Challenge.objects.create(
+            user=self.user, title='Recycle', description='Recycle more', points_reward=25, target=10,
+            metric=metric, start_date=self.now - timedelta(days=1), end_date=self.now + timedelta(days=6),
+        )
+
+    def recycle(self, weight):
+        return RecyclingHistory.objects.create(
+            user=self.user, material_type='paper', weight_kg=Decimal(weight), co2_saved_kg=1, date=self.now,
+        )
+
+    def test_writes_outside_a_transaction_apply_progress_immediately(self):
+        kg = self.create_challenge('recycled_kg')
+        pickups = self.create_challenge('pickups_completed')
+
+        history = self.recycle('4')
+        pickup = Pickup.objects.create(user=self.user, date=self.now, address='1 Green Street', status='scheduled')
+        pickup.status = 'completed'
+        pickup.save()
+        kg.refresh_from_db()
+        pickups.refresh_from_db()
+        self.assertEqual((kg.progress, pickups.progress), (4, 1))
+
+        history.delete()
+        kg.refresh_from_db()
+        self.assertEqual(kg.progress, 0)
+
+    def test_rolled_back_transactions_do_not_swallow_later_events(self):
+        challenge = self.create_challenge('recycled_kg')
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.recycle('3')
+            raise RuntimeError
+        with transaction.atomic():
+            self.recycle('2')
+        challenge.refresh_from_db()
+        self.assertEqual(challenge.progress, 2)
+
+
+class PickupMaterialLineTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('recycler@example.com', 'password')
+
+    def lines(self, pickup):
+        return {
+            material: (quantity, date)
+            for material, quantity, date in PickupMaterial.objects.filter(pickup=pickup)
+            .values_list('material', 'quantity_kg', 'date')
+        }
+
+    def test_lines_follow_the_materials_json(self):
+        when = timezone.now()
+        pickup = Pickup.objects.create(
+            user=self.user, date=when, address='1 Green Street', materials={'Plastic': 2, 'paper': '1.5'},
+        )
+        self.assertEqual(self.lines(pickup), {
+            'plastic': (Decimal('2.00'), when), 'paper': (Decimal('1.50'), when),
+        })
+
+        later = when + timedelta(days=2)
+        pickup.date = later
+        pickup.materials = ['glass', {'name': 'metal', 'weight_kg': 4}]
+        pickup.save()
+        self.assertEqual(self.lines(pickup), {'glass': (Decimal('0.00'), later), 'metal': (Decimal('4.00'), later)})
+
+        pickup.date = when
+        pickup.save()
+        self.assertEqual(self.lines(pickup), {'glass': (Decimal('0.00'), when), 'metal': (Decimal('4.00'), when)})
+
+        pickup.delete()
+        self.assertFalse(PickupMaterial.objects.exists())
+
+
+class EmissionFactorTests(APITestCase):
+    def setUp(self):
+        # The factor table is cached per process across test transactions
+        factors_changed()
+        self.addCleanup(factors_changed)
+        self.user = User.objects.create_user('recycler@example.com', 'password')
+        self.plastic = EmissionFactor.objects.create(
+            material_type='Plastic', kg_co2_per_kg=Decimal('1.5000'), valid_from=datetime(2026, 1, 1).date(),
+        )
+        EmissionFactor.objects.create(
+            material_type='paper', kg_co2_per_kg=Decimal('0.9000'), valid_from=datetime(2026, 1, 1).date(),
+        )
+
+    def recycle(self, material, weight, day, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return RecyclingHistory.objects.create(
+                user=self.user, material_type=material, weight_kg=Decimal(weight),
+                date=timezone.make_aware(datetime(*day, 12)), **kwargs,
+            )
+
+    def test_records_are_scored_with_the_factor_in_force(self):
+        scored = self.recycle('plastic', '2.25', (2026, 3, 1))
+        self.assertEqual(scored.co2_saved_kg, Decimal('3.38'))
+        self.assertEqual(scored.emission_factor, self.plastic)
+
+        self.assertEqual(self.recycle('plastic', '2', (2026, 1, 1)).co2_saved_kg, Decimal('3.00'))
+        self.assertIsNone(self.recycle('plastic', '2', (2025, 12, 31)).emission_factor)
+        self.assertEqual(self.recycle('glass', '2', (2026, 3, 1)).co2_saved_kg, 0)
+
+        manual = self.recycle('plastic', '2', (2026, 3, 1), co2_saved_kg=Decimal('7'))
+        self.assertEqual(manual.co2_saved_kg, Decimal('7'))
+        self.assertIsNone(manual.emission_factor)
+
+        scored.weight_kg = Decimal('4')
+        scored.save()
+        scored.refresh_from_db()
+        self.assertEqual(scored.co2_saved_kg, Decimal('6.00'))
+
+    def test_hand_corrections_are_kept(self):
+        record = self.recycle('plastic', '2', (2026, 3, 1))
+        self.assertEqual((record.co2_saved_kg, record.emission_factor), (Decimal('3.00'), self.plastic))
+
+        # Saves that leave the scored inputs alone keep the score
+        self.plastic.kg_co2_per_kg = Decimal('2.0000')
+        self.plastic.save()
+        record.refresh_from_db()
+        record.save()
+        record.refresh_from_db()
+        self.assertEqual(record.co2_saved_kg, Decimal('3.00'))
+
+        record.co2_saved_kg = Decimal('2.50')
+        record.save()
+        record.refresh_from_db()
+        self.assertEqual((record.co2_saved_kg, record.emission_factor), (Decimal('2.50'), None))
+
+        record.weight_kg = Decimal('3')
+        record.save()
+        call_command('recompute_co2', stdout=StringIO())
+        record.refresh_from_db()
+        self.assertEqual(record.co2_saved_kg, Decimal('2.50'))
+
+    def test_uploads_without_co2_are_scored(self):
+        self.client.force_authenticate(self.user)
+        body = (
+            'material_type,weight_kg,date,co2_saved_kg\n'
+            'paper,10,2026-02-01T10:00:00Z,\n'
+            'paper,10,2026-02-01T10:00:00Z,4\n'
+        )
+        response = self.client.generic(
+            'POST', '/api/individual/recycling-history/upload/', body.encode(), content_type='text/csv',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            sorted(RecyclingHistory.objects.values_list('co2_saved_kg', 'emission_factor__material_type')),
+            [(Decimal('4.00'), None), (Decimal('9.00'), 'paper')],
+        )
+
+    def test_recompute_applies_new_factor_versions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            challenge = Challenge.objects.create(
+                user=self.user, title='Save CO2', description='', points_reward=10, target=1000,
+                metric='co2_saved_kg', start_date=timezone.make_aware(datetime(2026, 1, 1)),
+                end_date=timezone.make_aware(datetime(2026, 12, 31)),
+            )
+        early = self.recycle('plastic', '10', (2026, 2, 1))
+        late = self.recycle('plastic', '10', (2026, 5, 1))
+        paper = self.recycle('paper', '10', (2026, 5, 1))
+        manual = self.recycle('plastic', '10', (2026, 5, 1), co2_saved_kg=Decimal('1'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            EmissionFactor.objects.create(
+                material_type='plastic', kg_co2_per_kg=Decimal('2.0000'), valid_from=datetime(2026, 4, 1).date(),
+            )
+            call_command('recompute_co2', material_types=['PLASTIC'], chunk_size=2, stdout=StringIO())
+
+        co2 = dict(RecyclingHistory.objects.values_list('pk', 'co2_saved_kg'))
+        self.assertEqual(
+            [co2[early.pk], co2[late.pk], co2[paper.pk], co2[manual.pk]],
+            [Decimal('15.00'), Decimal('20.00'), Decimal('9.00'), Decimal('1.00')],
+        )
+        self.assertEqual(UserImpactSummary.objects.get(user=self.user).co2_saved_kg, Decimal('45.00'))
+        challenge.refresh_from_db()
+        self.assertEqual(challenge.metric_total, Decimal('45.00'))
+
+    @override_settings(EMISSION_FACTOR_CHECK_INTERVAL=0)
+    def test_factor_changes_made_by_other_processes_are_picked_up(self):
+        self.assertEqual(self.recycle('plastic', '2', (2026, 3, 1)).co2_saved_kg, Decimal('3.00'))
+        # Written without this process's signal handler, as another worker would
+        EmissionFactor.objects.filter(pk=self.plastic.pk).update(
+            kg_co2_per_kg=Decimal('2.0000'), updated_at=timezone.now(),
+        )
+        self.assertEqual(self.recycle('plastic', '2', (2026, 3, 1)).co2_saved_kg, Decimal('4.00'))
+
+        EmissionFactor.objects.bulk_create([EmissionFactor(
+            material_type='plastic', kg_co2_per_kg=Decimal('2.5000'), valid_from=datetime(2026, 2, 1).date(),
+        )])
+        self.assertEqual(self.recycle('plastic', '2', (2026, 3, 1)).co2_saved_kg, Decimal('5.00'))
+
+    def test_vectorized_scores_round_like_decimals(self):
+        rng = random.Random(7)
+        factors = [
+            (i + 1, f'm{i}', datetime(2026, 1, i + 1).date(), Decimal(rng.randint(0, 99999)) / 10000)
+            for i in range(4)
+        ]
+        table = FactorTable(factors)
+        weights = [Decimal(rng.randint(0, 10 ** 7)) / 100 for _ in range(500)]
+        materials = [f'm{rng.randint(0, 3)}' for _ in weights]
+        timestamps = [timezone.make_aware(datetime(2026, 1, 10)).timestamp()] * len(weights)
+
+        co2, factor_ids = table.score(
+            materials, np.array([int(weight * 100) for weight in weights]), np.array(timestamps),
+        )
+        factor = {material: (pk, value) for pk, material, _, value in factors}
+        self.assertEqual(co2.tolist(), [
+            int((weight * factor[material][1]).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP) * 100)
+            for weight, material in zip(weights, materials)
+        ])
+        self.assertEqual(factor_ids.tolist(), [factor[material][0] for material in materials])
+
+
+class LeaderboardTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        self.alice = User.objects.create_user('alice@example.com', 'password', first_name='Alice', region='north')
+        self.bob = User.objects.create_user('bob@example.com', 'password', region='south')
+        self.carol = User.objects.create_user('carol@example.com', 'password', region='north')
+        self.client.force_authenticate(self.alice)
+
+    def recycle(self, user, weight, when=None):
+        return RecyclingHistory.objects.create(
+            user=user, material_type='paper', weight_kg=Decimal(weight), co2_saved_kg=1, date=when or self.now,
+        )
+
+    def entries(self):
+        return set(LeaderboardEntry.objects.values_list('period', 'period_start', 'region', 'user', 'total_kg'))
+
+    def test_ranks_follow_recycling_writes(self):
+        self.recycle(self.alice, '5')
+        self.recycle(self.bob, '8')
+        carol = self.recycle(self.carol, '5')
+        self.recycle(self.alice, '40', when=self.now - timedelta(days=400))
+
+        standing = leaderboard.standing(self.alice)
+        self.assertEqual(standing['all'], {'rank': 1, 'total_kg': 45.0, 'participants': 3})
+        self.assertEqual(standing['week'], {'rank': 2, 'total_kg': 5.0, 'participants': 3})
+        self.assertEqual(standing['regional']['week'], {'rank': 1, 'total_kg': 5.0, 'participants': 2})
+        self.assertEqual(leaderboard.standing(self.carol)['week']['rank'], 2)
+
+        carol.weight_kg = Decimal('9')
+        carol.save()
+        self.assertEqual(leaderboard.standing(self.alice)['week']['rank'], 3)
+        carol.delete()
+        self.assertEqual(leaderboard.standing(self.alice)['week']['rank'], 2)
+        self.assertEqual(leaderboard.standing(self.carol)['week']['rank'], None)
+
+    def test_standing_is_read_in_two_queries(self):
+        self.recycle(self.alice, '5')
+        self.recycle(self.bob, '3')
+        with self.assertNumQueries(2):
+            self.assertEqual(
+                leaderboard.standing(self.bob)['week'], {'rank': 2, 'total_kg': 3.0, 'participants': 2},
+            )
+
+        # Ranks come from the table, so other processes' writes show at once
+        LeaderboardEntry.objects.filter(user=self.bob).update(total_kg=7)
+        self.assertEqual(leaderboard.standing(self.bob)['week'], {'rank': 1, 'total_kg': 7.0, 'participants': 2})
+
+    def test_uploads_and_region_changes_update_the_boards(self):
+        self.client.force_authenticate(self.bob)
+        body = 'material_type,weight_kg,date\n' + f'paper,3,{self.now.isoformat()}\n' * 2
+        response = self.client.generic(
+            'POST', '/api/individual/recycling-history/upload/', body.encode(), content_type='text/csv',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(leaderboard.standing(self.bob)['regional']['month']['total_kg'], 6.0)
+
+        self.bob.region = 'north'
+        self.bob.save()
+        self.assertEqual(leaderboard.standing(self.bob)['regional']['month']['total_kg'], 6.0)
+        self.assertFalse(LeaderboardEntry.objects.filter(region='south').exists())
+
+    def test_rebuild_matches_incremental_updates(self):
+        for i, user in enumerate([self.alice, self.bob, self.carol] * 4):
+            self.recycle(user, str(i + 1), when=self.now - timedelta(days=9 * i))
+        RecyclingHistory.objects.filter(user=self.bob).first().delete()
+        incremental = {entry for entry in self.entries() if entry[-1]}
+
+        call_command('rebuild_leaderboards', stdout=StringIO())
+        self.assertEqual(self.entries(), incremental)
+
+    def test_leaderboard_pages_are_ranked(self):
+        self.recycle(self.alice, '5')
+        self.recycle(self.bob, '8')
+        self.recycle(self.carol, '5')
+
+        rows = response_rows(self.client.get('/api/individual/leaderboard/', {'period': 'week'}))
+        self.assertEqual(
+            [(row['rank'], row['user'], row['total_kg']) for row in rows],
+            [(1, self.bob.pk, '8.00'), (2, self.alice.pk, '5.00'), (2, self.carol.pk, '5.00')],
+        )
+        self.assertEqual(rows[1]['name'], 'Alice')
+
+        # Pages after the first are ranked against the whole board, ties included
+        response = self.client.get('/api/individual/leaderboard/', {'period': 'week', 'page_size': 1, 'page': 3})
+        self.assertEqual([(row['rank'], row['user']) for row in response.data['results']], [(2, self.carol.pk)])
+        dave = User.objects.create_user('dave@example.com', 'password')
+        self.recycle(dave, '1')
+        # Validators, count, rows and one rank count
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/individual/leaderboard/', {'period': 'week', 'page_size': 2, 'page': 2})
+        self.assertEqual([(row['rank'], row['user']) for row in response.data['results']], [(2, self.carol.pk), (4, dave.pk)])
+
+        response = self.client.get('/api/individual/leaderboard/', {'region': 'mine', 'page_size': 1, 'page': 2})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([row['user'] for row in response.data['results']], [self.carol.pk])
+
+        self.assertEqual(self.client.get('/api/individual/leaderboard/', {'period': 'day'}).status_code, 400)
+
+    def test_dashboard_shows_the_users_standing(self):
+        self.recycle(self.alice, '5')
+        response = self.client.get('/api/individual/dashboard/')
+        self.assertEqual(response.data['leaderboard']['region'], 'north')
+        self.assertEqual(response.data['leaderboard']['all']['rank'], 1)
+        self.assertEqual(response.data['leaderboard']['regional']['month']['participants'], 1)
+
+
+@override_settings(DASHBOARD_QUERY_WORKERS=4)
+class ConcurrentDashboardTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('concurrent@example.com', 'password')
+        now = timezone.now()
+        for i in range(3):
+            Pickup.objects.create(
+                user=self.user, date=now + timedelta(days=i + 1), address=f'{i} Oak Road',
+            )
+            RecyclingHistory.objects.create(
+                user=self.user, material_type='paper', weight_kg=Decimal('2.00'), date=now,
+            )
+        Reward.objects.create(user=self.user, name='Tote bag', points_required=50, description='')
+
+    def test_tasks_run_on_worker_threads(self):
+        threads = concurrent.run_concurrently(
+            first=threading.get_ident, second=threading.get_ident,
+        )
+        self.assertNotIn(threading.get_ident(), threads.values())
+
+    def test_workers_close_their_connections(self):
+        def query():
+            User.objects.count()
+            return connections['default']
+
+        with mock.patch.object(type(connections['default']), 'close', autospec=True) as close:
+            used = concurrent.run_concurrently(first=query, second=query, third=query)
+        self.assertNotIn(connections['default'], used.values())
+        closed = [call.args[0] for call in close.call_args_list]
+        self.assertEqual(len(closed), 3)
+        self.assertEqual(set(map(id, closed)), set(map(id, used.values())))
+
+    @override_settings(DASHBOARD_QUERY_WORKERS=1)
+    def test_one_worker_runs_tasks_inline(self):
+        threads = concurrent.run_concurrently(first=threading.get_ident, second=threading.get_ident)
+        self.assertEqual(set(threads.values()), {threading.get_ident()})
+
+    def test_tasks_run_inline_inside_a_transaction(self):
+        with transaction.atomic():
+            threads = concurrent.run_concurrently(
+                first=threading.get_ident, second=threading.get_ident,
+            )
+        self.assertEqual(set(threads.values()), {threading.get_ident()})
+
+    def test_concurrent_dashboard_matches_serial(self):
+        view = IndividualDashboardView()
+        with concurrent.serial():
+            expected = view.get_dashboard_data(self.user)
+        self.assertEqual(view.get_dashboard_data(self.user), expected)
+        self.assertEqual(len(expected['upcoming_pickups']), 3)
+        self.assertEqual(expected['total_recycled_kg'], '6.00')
+
+
+class RecyclingHistoryExportTests(QueryBudgetMixin, APITestCase):
+    url = '/api/individual/recycling-history/export/'
+
+    def setUp(self):
+        self.user = User.objects.create_user('exporter@example.com', 'password')
+        self.client.force_authenticate(self.user)
+
+    def seed_history(self, size, user=None):
+        for i in range(size):
+            RecyclingHistory.objects.create(
+                user=user or self.user, material_type='glass', weight_kg=Decimal('1.00'),
+                date=timezone.make_aware(datetime(2024, 1 + i % 12, 15)),
+            )
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_csv_export_contains_only_own_rows(self):
+        self.seed_history(3)
+        self.seed_history(2, user=User.objects.create_user('other@example.com', 'password'))
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = self.body(response).decode().splitlines()
+        self.assertEqual(lines[0], 'id,user_email,material_type,weight_kg,co2_saved_kg,pickup_id,date,created_at')
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(all(',exporter@example.com,glass,1.00,' in line for line in lines[1:]))
+
+    def test_gzipped_ndjson_export_with_date_range(self):
+        self.seed_history(12)
+        response = self.client.get(self.url, {'fmt': 'ndjson', 'gzip': '1', 'start': '2024-03-01', 'end': '2024-05-31'})
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="recycling-history.ndjson.gz"')
+        records = [json.loads(line) for line in gzip.decompress(self.body(response)).splitlines()]
+        self.assertEqual([record['date'][:7] for record in records], ['2024-03', '2024-04', '2024-05'])
+
+    def test_unknown_format_is_rejected(self):
+        self.assertEqual(self.client.get(self.url, {'fmt': 'xlsx'}).status_code, 400)
+
+    def test_bad_dates_are_rejected(self):
+        self.assertEqual(self.client.get(self.url, {'start': '2024-02-30'}).status_code, 400)
+
+    def test_large_exports_are_sent_in_buffered_chunks(self):
+        pieces = [f'{i:09}\n' for i in range(20000)]
+        chunks = list(buffered(pieces, size=4096))
+        self.assertEqual(chunks[0], pieces[0])
+        self.assertEqual(''.join(chunks), ''.join(pieces))
+        self.assertTrue(all(len(chunk) >= 4096 for chunk in chunks[1:-1]))
+        self.assertLess(len(chunks), 60)
+
+    def test_export_uses_constant_queries(self):
+        self.assertQueryBudget(self.url, self.seed_history, max_queries=1)
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import IndividualDashboardView, PickupListView, ChallengeListView, RewardListView, MarketplaceListView, MarketplaceCreateView
+from .views import IndividualDashboardView, PickupListView, ChallengeListView, RewardListView, MarketplaceListView, MarketplaceCreateView, RecyclingHistoryUploadView, RecyclingHistoryExportView, LeaderboardView
 
 app_name = 'individual'
 
@@ -10,4 +10,7 @@ urlpatterns = [
     path('rewards/', RewardListView.as_view(), name='rewards'),
     path('marketplace/', MarketplaceListView.as_view(), name='marketplace'),
     path('marketplace/create/', MarketplaceCreateView.as_view(), name='marketplace_create'),
+    path('recycling-history/upload/', RecyclingHistoryUploadView.as_view(), name='recycling_history_upload'),
+    path('recycling-history/export/', RecyclingHistoryExportView.as_view(), name='recycling_history_export'),
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
 ]
\ No newline at end of file
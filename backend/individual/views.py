@@ -3,74 +3,79 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
 from django.db.models import Sum
-from .models import Pickup, Challenge, Reward, RecyclingHistory, MarketplaceItem
-from .serializers import IndividualDashboardSerializer, PickupSerializer, ChallengeSerializer, RewardSerializer, MarketplaceItemSerializer
+from .models import Pickup, Challenge, Reward, RecyclingHistory, MarketplaceItem, UserImpactSummary
+from .serializers import IndividualDashboardSerializer, PickupSerializer, ChallengeSerializer, RewardSerializer, MarketplaceItemSerializer, LeaderboardEntrySerializer
 from users.models import User
 from django.db import models
+from django.utils import timezone
+from core.concurrent import run_concurrently
+from core.conditional import conditional_dashboard, conditional_list
+from core.pagination import list_response
+from core.streaming import export_queryset
+from . import leaderboard
+from .ingest import INGEST_ANY_USER_TYPES, RecyclingHistoryIngest, detect_format
+from .search import search_marketplace
 
 class IndividualDashboardView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        
-        # Get user's pickups
-        upcoming_pickups = Pickup.objects.filter(
-            user=user, 
-            status__in=['scheduled', 'pending']
-        ).order_by('date')[:5]  # Limit to 5 upcoming pickups
-        
-        past_pickups = Pickup.objects.filter(
-            user=user, 
-            status='completed'
-        ).order_by('-date')[:10]  # Limit to 10 past pickups
-        
-        # Get user's challenges
-        active_challenges = Challenge.objects.filter(
-            user=user, 
-            is_active=True
-        ).order_by('-start_date')
-        
-        completed_challenges = Challenge.objects.filter(
-            user=user, 
-            progress__gte=models.F('target')
-        ).order_by('-end_date')
-        
-        # Get user's rewards
-        rewards = Reward.objects.filter(user=user).order_by('-created_at')
-        
-        # Get recycling history
-        recycling_history = RecyclingHistory.objects.filter(
-            user=user
-        ).order_by('-date')[:10]  # Last 10 recycling entries
-        
-        # Calculate stats
-        total_recycled = RecyclingHistory.objects.filter(user=user).aggregate(
-            total=Sum('weight_kg')
-        )['total'] or 0
-        
-        co2_saved = RecyclingHistory.objects.filter(user=user).aggregate(
-            total=Sum('co2_saved_kg')
-        )['total'] or 0
-        
-        challenges_completed = completed_challenges.count()
+        return conditional_dashboard(
+            request, 'individual', request.user.pk, lambda: self.get_dashboard_data(request.user)
+        )
+
+    def get_dashboard_data(self, user):
+        # The queries are independent, so they are issued concurrently
+        results = run_concurrently(
+            # Get user's pickups
+            upcoming_pickups=Pickup.objects.filter(
+                user=user, 
+                status='scheduled'
+            ).order_by('date')[:5],  # Limit to 5 upcoming pickups
+            past_pickups=Pickup.objects.filter(
+                user=user, 
+                status='completed'
+            ).order_by('-date')[:10],  # Limit to 10 past pickups
+            # Get user's challenges
+            active_challenges=Challenge.objects.filter(
+                user=user, 
+                is_active=True
+            ).order_by('-start_date'),
+            completed_challenges=Challenge.objects.filter(
+                user=user, 
+                progress__gte=models.F('target')
+            ).order_by('-end_date'),
+            # Get user's rewards
+            rewards=Reward.objects.filter(user=user).order_by('-created_at'),
+            # Get recycling history
+            recycling_history=RecyclingHistory.objects.filter(
+                user=user
+            ).order_by('-date')[:10],  # Last 10 recycling entries
+            # Totals come from the incrementally maintained summary row
+            summary=lambda: UserImpactSummary.objects.for_user(user),
+            # Ranks may lag other users' writes by the dashboard cache timeout
+            leaderboard=lambda: leaderboard.standing(user),
+        )
+        summary = results['summary']
         
         # Prepare data for serializer
         data = {
             'user': user,
-            'upcoming_pickups': upcoming_pickups,
-            'past_pickups': past_pickups,
-            'active_challenges': active_challenges,
-            'completed_challenges': completed_challenges,
-            'rewards': rewards,
-            'recycling_history': recycling_history,
-            'total_recycled_kg': total_recycled,
-            'co2_saved_total': co2_saved,
-            'challenges_completed_count': challenges_completed,
+            'upcoming_pickups': results['upcoming_pickups'],
+            'past_pickups': results['past_pickups'],
+            'active_challenges': results['active_challenges'],
+            'completed_challenges': results['completed_challenges'],
+            'rewards': results['rewards'],
+            'recycling_history': results['recycling_history'],
+            'total_recycled_kg': summary.total_recycled_kg,
+            'co2_saved_total': summary.co2_saved_kg,
+            'challenges_completed_count': summary.challenges_completed,
+            'pickup_counts': summary.pickup_counts,
+            'leaderboard': results['leaderboard'],
         }
         
         serializer = IndividualDashboardSerializer(data)
-        return Response(serializer.data)
+        return serializer.data
 
 class PickupListView(APIView):
     permission_classes = [IsAuthenticated]
@@ -82,7 +87,7 @@ class PickupListView(APIView):
         if pickup_type == 'upcoming':
             pickups = Pickup.objects.filter(
                 user=user, 
-                status__in=['scheduled', 'pending']
+                status='scheduled'
             ).order_by('date')
         elif pickup_type == 'past':
             pickups = Pickup.objects.filter(
@@ -92,8 +97,10 @@ class PickupListView(APIView):
         else:
             pickups = Pickup.objects.filter(user=user).order_by('-date')
         
-        serializer = PickupSerializer(pickups, many=True)
-        return Response(serializer.data)
+        return conditional_list(
+            request, pickups, 'updated_at',
+            lambda: list_response(request, pickups, PickupSerializer, view=self),
+        )
 
 class ChallengeListView(APIView):
     permission_classes = [IsAuthenticated]
@@ -116,8 +123,10 @@ class ChallengeListView(APIView):
         else:
             challenges = Challenge.objects.filter(user=user).order_by('-start_date')
         
-        serializer = ChallengeSerializer(challenges, many=True)
-        return Response(serializer.data)
+        return conditional_list(
+            request, challenges, 'updated_at',
+            lambda: Response(ChallengeSerializer(challenges, many=True).data),
+        )
 
 class RewardListView(APIView):
     permission_classes = [IsAuthenticated]
@@ -139,8 +148,10 @@ class RewardListView(APIView):
         else:
             rewards = Reward.objects.filter(user=user).order_by('-created_at')
         
-        serializer = RewardSerializer(rewards, many=True)
-        return Response(serializer.data)
+        return conditional_list(
+            request, rewards, 'updated_at',
+            lambda: Response(RewardSerializer(rewards, many=True).data),
+        )
 
 class MarketplaceListView(APIView):
     permission_classes = [IsAuthenticated]
@@ -149,20 +160,19 @@ class MarketplaceListView(APIView):
         category = request.query_params.get('category', 'all')
         search = request.query_params.get('search', '')
         
-        items = MarketplaceItem.objects.filter(is_available=True)
+        items = MarketplaceItem.objects.filter(is_available=True).select_related('user')
         
         if category != 'all':
             items = items.filter(category=category)
             
         if search:
-            items = items.filter(
-                models.Q(name__icontains=search) | 
-                models.Q(description__icontains=search)
-            )
-        
-        items = items.order_by('-created_at')
-        serializer = MarketplaceItemSerializer(items, many=True)
-        return Response(serializer.data)
+            items = search_marketplace(items, search)
+        else:
+            items = items.order_by('-created_at')
+        return conditional_list(
+            request, items, 'updated_at',
+            lambda: list_response(request, items, MarketplaceItemSerializer, view=self),
+        )
 
 class MarketplaceCreateView(APIView):
     permission_classes = [IsAuthenticated]
@@ -172,4 +182,81 @@ class MarketplaceCreateView(APIView):
         if serializer.is_valid():
             serializer.save(user=request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+class RecyclingHistoryUploadView(APIView):
+    """Bulk upload of recycling weights as CSV or NDJSON.
+
+    The file is sent either as the raw request body (``Content-Type:
+    text/csv`` or ``application/x-ndjson``) or as the ``file`` field of a
+    multipart form; ``?fmt=csv|ndjson`` overrides format detection. Invalid
+    rows are reported by line number and do not stop the rest of the file.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if request.content_type.startswith('multipart/form-data'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({'error': 'No file uploaded.'}, status=status.HTTP_400_BAD_REQUEST)
+            stream, filename, content_type = upload, upload.name, upload.content_type
+        else:
+            stream, filename, content_type = request.stream, None, request.content_type
+            if stream is None:
+                return Response({'error': 'Request body is empty.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        ingest_format = detect_format(content_type, filename, request.query_params.get('fmt'))
+        if ingest_format is None:
+            return Response(
+                {'error': 'Unsupported format. Upload CSV or NDJSON.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        report = RecyclingHistoryIngest(request.user).run(stream, ingest_format)
+        response_status = status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK
+        return Response(report, status=response_status)
+
+class RecyclingHistoryExportView(APIView):
+    """Stream recycling history as CSV or NDJSON (see ``export_queryset``).
+
+    Users export their own entries; centers and staff, who may record
+    weights for anyone, export every user's.
+    """
+    permission_classes = [IsAuthenticated]
+
+    COLUMNS = ['id', 'user__email', 'material_type', 'weight_kg', 'co2_saved_kg', 'pickup_id', 'date', 'created_at']
+
+    def get(self, request):
+        history = RecyclingHistory.objects.order_by('date', 'id')
+        if request.user.user_type not in INGEST_ANY_USER_TYPES:
+            history = history.filter(user=request.user)
+        return export_queryset(request, history, self.COLUMNS, 'recycling-history', date_field='date')
+
+class LeaderboardView(APIView):
+    """Top of a leaderboard, largest total first.
+
+    ``?period=all|month|week`` picks the current board of that period and
+    ``?region=`` a regional one (``?region=mine`` for the user's own).
+    Supports the usual ``?page=``/``?page_size=`` paging.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        period = request.query_params.get('period', 'all')
+        if period not in leaderboard.PERIODS:
+            return Response(
+                {'error': 'Unknown period. Use all, month or week.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        region = request.query_params.get('region', '')
+        if region == 'mine':
+            region = request.user.region
+
+        board = (period, leaderboard.period_start(period, timezone.localdate()), region)
+        entries = leaderboard.entries(board).select_related('user')
+        return conditional_list(
+            request, entries, 'updated_at',
+            lambda: list_response(
+                request, entries, LeaderboardEntrySerializer, view=self,
+                context={'ranks': leaderboard.PageRanks(board)},
+            ),
+        )
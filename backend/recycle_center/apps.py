@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RecycleCenterConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "recycle_center"
+
+    def ready(self):
+        from . import signals  # noqa: F401
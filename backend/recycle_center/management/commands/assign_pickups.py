@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.dashboard_cache import invalidate
+from recycle_center.models import GeocodedAddress, PickupRequest, PickupRequestItem
+from recycle_center.spatial import nearest_center
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Assign pickups without a center to the nearest recycling center."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reassign', action='store_true',
+            help="Also reassign pickups that already have a center.",
+        )
+
+    def handle(self, *args, reassign=False, **options):
+        pickups = PickupRequest.objects.only('id', 'address', 'latitude', 'longitude', 'center')
+        if not reassign:
+            pickups = pickups.filter(center__isnull=True)
+
+        assigned = 0
+        batch = []
+        for pickup in pickups.order_by('pk').iterator(chunk_size=BATCH_SIZE):
+            batch.append(pickup)
+            if len(batch) >= BATCH_SIZE:
+                assigned += self.assign(batch)
+                batch = []
+        if batch:
+            assigned += self.assign(batch)
+        self.stdout.write(self.style.SUCCESS(f"Assigned {assigned} pickups."))
+
+    def assign(self, batch):
+        coordinates = GeocodedAddress.objects.lookup(
+            {pickup.address for pickup in batch if pickup.latitude is None or pickup.longitude is None}
+        )
+        changed = []
+        for pickup in batch:
+            if (pickup.latitude is None or pickup.longitude is None) and pickup.address in coordinates:
+                pickup.latitude, pickup.longitude = coordinates[pickup.address]
+            center_id = nearest_center(pickup.latitude, pickup.longitude)
+            if center_id is not None and center_id != pickup.center_id:
+                pickup.center_id = center_id
+                changed.append(pickup)
+        by_center = {}
+        for pickup in changed:
+            by_center.setdefault(pickup.center_id, []).append(pickup.pk)
+        with transaction.atomic():
+            PickupRequest.objects.bulk_update(changed, ['center', 'latitude', 'longitude'])
+            for center_id, pickup_ids in by_center.items():
+                PickupRequestItem.objects.filter(request_id__in=pickup_ids).update(center_id=center_id)
+        if changed:
+            # bulk_update skips the post_save handlers
+            invalidate('pickup_requests')
+        return len(changed)
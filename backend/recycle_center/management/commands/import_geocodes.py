@@ -0,0 +1,59 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.dashboard_cache import invalidate
+from recycle_center.models import GeocodedAddress
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Load address coordinates for route planning from a CSV with address,latitude,longitude columns."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+
+    def handle(self, *args, path, **options):
+        try:
+            handle = open(path, newline='', encoding='utf-8-sig')
+        except OSError as exc:
+            raise CommandError(exc)
+
+        loaded = skipped = 0
+        with handle, transaction.atomic():
+            batch = []
+            for row in csv.DictReader(handle):
+                try:
+                    address = row['address'].strip()
+                    geocode = GeocodedAddress(
+                        address_key=GeocodedAddress.normalize(address),
+                        address=address,
+                        latitude=float(row['latitude']),
+                        longitude=float(row['longitude']),
+                    )
+                except (KeyError, TypeError, ValueError, AttributeError):
+                    skipped += 1
+                    continue
+                if not geocode.address_key:
+                    skipped += 1
+                    continue
+                batch.append(geocode)
+                if len(batch) >= BATCH_SIZE:
+                    loaded += self.store(batch)
+                    batch = []
+            if batch:
+                loaded += self.store(batch)
+        # bulk_create skips the post_save handlers that retire cached plans
+        invalidate('geocodes')
+        self.stdout.write(self.style.SUCCESS(f"Loaded {loaded} geocodes, skipped {skipped} rows."))
+
+    def store(self, batch):
+        # Later rows win when an export lists the same address twice
+        batch = list({geocode.address_key: geocode for geocode in batch}.values())
+        GeocodedAddress.objects.bulk_create(
+            batch, update_conflicts=True, unique_fields=['address_key'],
+            update_fields=['address', 'latitude', 'longitude', 'updated_at'],
+        )
+        return len(batch)
@@ -0,0 +1,20 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from recycle_center.rollup import refresh_week
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute every center's CenterWeeklyRollup for the current week, which "
+        "the center dashboard reads. Schedule it to run every few minutes; "
+        "--week recomputes the week containing another day."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--week', type=date.fromisoformat, help="Any day of the week to compute (YYYY-MM-DD).")
+
+    def handle(self, *args, week=None, **options):
+        written = refresh_week(week)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} weekly rollups."))
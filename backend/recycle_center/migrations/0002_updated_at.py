@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recycle_center", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="centerperformancemetrics",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="recyclingcenterstats",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
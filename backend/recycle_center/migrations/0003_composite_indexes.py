@@ -0,0 +1,66 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recycle_center", "0002_updated_at"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="centerperformancemetrics",
+            index=models.Index(
+                fields=["-week_start_date"], name="centermetrics_week_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="centerperformancemetrics",
+            index=models.Index(fields=["updated_at"], name="centermetrics_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="marketplacepurchase",
+            index=models.Index(
+                fields=["-transaction_date", "-id"], name="purchase_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="marketplacepurchase",
+            index=models.Index(
+                fields=["material", "-transaction_date", "-id"],
+                name="purchase_material_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="marketplacepurchase",
+            index=models.Index(
+                fields=["seller", "-transaction_date"], name="purchase_seller_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pickuprequest",
+            index=models.Index(
+                fields=["status", "-scheduled_date"], name="pickupreq_status_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pickuprequest",
+            index=models.Index(fields=["-scheduled_date"], name="pickupreq_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="pickuprequest",
+            index=models.Index(fields=["updated_at"], name="pickupreq_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="recyclingcenterstats",
+            index=models.Index(fields=["-date"], name="centerstats_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="recyclingcenterstats",
+            index=models.Index(fields=["updated_at"], name="centerstats_updated_idx"),
+        ),
+    ]
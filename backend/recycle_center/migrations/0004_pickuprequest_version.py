@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recycle_center", "0003_composite_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pickuprequest",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recycle_center", "0004_pickuprequest_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GeocodedAddress",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("address_key", models.CharField(max_length=255, unique=True)),
+                ("address", models.TextField()),
+                ("latitude", models.FloatField()),
+                ("longitude", models.FloatField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name_plural": "Geocoded Addresses",
+            },
+        ),
+    ]
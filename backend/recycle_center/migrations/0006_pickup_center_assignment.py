@@ -0,0 +1,50 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recycle_center", "0005_geocodedaddress"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pickuprequest",
+            name="center",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="assigned_pickups",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="pickuprequest",
+            name="latitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="pickuprequest",
+            name="longitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="pickuprequest",
+            index=models.Index(
+                fields=["center", "status", "-scheduled_date"],
+                name="pickupreq_center_status_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pickuprequest",
+            index=models.Index(
+                fields=["center", "-scheduled_date"], name="pickupreq_center_date_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from core.materials import material_quantities
+
+BATCH_SIZE = 1000
+
+
+def create_lines(apps, schema_editor):
+    PickupRequest = apps.get_model("recycle_center", "PickupRequest")
+    PickupRequestItem = apps.get_model("recycle_center", "PickupRequestItem")
+    lines = []
+    rows = PickupRequest.objects.values_list(
+        "pk", "items", "center_id", "scheduled_date"
+    )
+    for pk, items, center_id, scheduled_date in rows.iterator(chunk_size=BATCH_SIZE):
+        for material, quantity in material_quantities(items).items():
+            lines.append(
+                PickupRequestItem(
+                    request_id=pk,
+                    material=material,
+                    quantity_kg=quantity,
+                    center_id=center_id,
+                    scheduled_date=scheduled_date,
+                )
+            )
+        if len(lines) >= BATCH_SIZE:
+            PickupRequestItem.objects.bulk_create(lines)
+            lines = []
+    PickupRequestItem.objects.bulk_create(lines)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recycle_center", "0006_pickup_center_assignment"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PickupRequestItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("material", models.CharField(max_length=50)),
+                (
+                    "quantity_kg",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=10),
+                ),
+                ("scheduled_date", models.DateTimeField()),
+                (
+                    "center",
+                    models.ForeignKey(
+                        blank=True,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "request",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="item_lines",
+                        to="recycle_center.pickuprequest",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["material", "scheduled_date"],
+                        name="pickupreqitem_material_idx",
+                    ),
+                    models.Index(
+                        fields=["center", "material", "scheduled_date"],
+                        name="pickupreqitem_center_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="pickuprequestitem",
+            constraint=models.UniqueConstraint(
+                fields=("request", "material"), name="pickupreqitem_unique"
+            ),
+        ),
+        migrations.RunPython(create_lines, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,76 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.utils import timezone
+
+from core.dashboard_cache import invalidate
+from core.materials import MaterialLineQuerySet
+
+# Values per IN (...) list, below SQLite's default limit on bound parameters
+IN_CHUNK_SIZE = 900
+
+
+class PickupRequestQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Recycling centers work their own service area; other users keep
+        seeing every pickup."""
+        if user.user_type == 'recycling_center':
+            return self.filter(center=user)
+        return self
+
+    def transition(self, pk, action, expected_version=None):
+        """Apply ``action`` to one pickup with a compare-and-set UPDATE.
+
+        The row only changes if its status still allows the action and, when
+        ``expected_version`` is given, nobody has changed it since that
+        version was read. Returns ``(changed, current)`` where ``current`` is
+        the row's ``status``/``version`` afterwards, or None if it does not
+        exist.
+        """
+        target, from_states = self.model.TRANSITIONS[action]
+        matching = self.filter(pk=pk, status__in=from_states)
+        if expected_version is not None:
+            matching = matching.filter(version=expected_version)
+        changed = bool(matching.update(
+            status=target, version=models.F('version') + 1, updated_at=timezone.now()
+        ))
+        if changed:
+            # Queryset updates skip the post_save handlers
+            invalidate('pickup_requests')
+        current = self.filter(pk=pk).values('status', 'version').first()
+        return changed, current
+
+    def bulk_transition(self, ids, action):
+        """Apply ``action`` to every pickup in ``ids``.
+
+        Each chunk of ids is moved with one conditional UPDATE that only
+        matches rows in a state the action is allowed from. Returns
+        ``(updated_ids, skipped, not_found_ids)`` where ``skipped`` maps ids
+        of rows left untouched to their current status.
+        """
+        target, from_states = self.model.TRANSITIONS[action]
+        ids = list(dict.fromkeys(ids))
+        stamp = timezone.now()
+        updated, skipped, found = [], {}, set()
+
+        with transaction.atomic():
+            for start in range(0, len(ids), IN_CHUNK_SIZE):
+                chunk = ids[start:start + IN_CHUNK_SIZE]
+                changed = self.filter(pk__in=chunk, status__in=from_states).update(
+                    status=target, version=models.F('version') + 1, updated_at=stamp
+                )
+                rows = self.filter(pk__in=chunk).values_list('pk', 'status', 'updated_at')
+                for pk, status, updated_at in rows:
+                    found.add(pk)
+                    if changed and status == target and updated_at == stamp:
+                        updated.append(pk)
+                    else:
+                        skipped[pk] = status
+            if updated:
+                invalidate('pickup_requests')
+
+        not_found = [pk for pk in ids if pk not in found]
+        return sorted(updated), skipped, not_found
+
 
 class PickupRequest(models.Model):
     STATUS_CHOICES = [
@@ -10,19 +81,82 @@ class PickupRequest(models.Model):
     ]
     
     customer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Nearest center, assigned from the coordinates when the pickup is created
+    center = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='assigned_pickups',
+    )
     scheduled_date = models.DateTimeField()
     address = models.TextField()
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
     items = models.JSONField()  # Store items as JSON
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Incremented by every status transition, for optimistic concurrency
+    version = models.PositiveIntegerField(default=1)
+
+    # action: (new status, statuses it may be applied to).
+    # pending -> approved -> completed; open pickups can always be cancelled.
+    TRANSITIONS = {
+        'approve': ('approved', ['pending']),
+        'complete': ('completed', ['approved']),
+        'cancel': ('cancelled', ['pending', 'approved']),
+    }
+
+    objects = PickupRequestQuerySet.as_manager()
     
     class Meta:
         ordering = ['-scheduled_date']
+        indexes = [
+            models.Index(fields=['status', '-scheduled_date'], name='pickupreq_status_date_idx'),
+            models.Index(fields=['center', 'status', '-scheduled_date'], name='pickupreq_center_status_idx'),
+            models.Index(fields=['center', '-scheduled_date'], name='pickupreq_center_date_idx'),
+            models.Index(fields=['-scheduled_date'], name='pickupreq_date_idx'),
+            models.Index(fields=['updated_at'], name='pickupreq_updated_idx'),
+        ]
     
     def __str__(self):
         return f"Pickup for {self.customer.email} on {self.scheduled_date}"
 
+class PickupRequestItemQuerySet(MaterialLineQuerySet):
+    def visible_to(self, user):
+        """Lines of the pickups ``PickupRequest.objects.visible_to`` shows."""
+        if user.user_type == 'recycling_center':
+            return self.filter(center=user)
+        return self
+
+class PickupRequestItem(models.Model):
+    """One material of a pickup request, kept in sync with
+    ``PickupRequest.items``."""
+    PARENT_FIELD = 'request'
+    
+    request = models.ForeignKey(PickupRequest, on_delete=models.CASCADE, related_name='item_lines')
+    material = models.CharField(max_length=50)
+    quantity_kg = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Copies of the request's center and date, so a center's totals over a
+    # date range are read from this table's index alone
+    center = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='+', db_index=False,
+    )
+    scheduled_date = models.DateTimeField()
+    
+    objects = PickupRequestItemQuerySet.as_manager()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['request', 'material'], name='pickupreqitem_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['material', 'scheduled_date'], name='pickupreqitem_material_idx'),
+            models.Index(fields=['center', 'material', 'scheduled_date'], name='pickupreqitem_center_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.quantity_kg}kg {self.material} for pickup request {self.request_id}"
+
 class RecyclingCenterStats(models.Model):
     center = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     date = models.DateField()
@@ -33,10 +167,15 @@ class RecyclingCenterStats(models.Model):
     electronics_kg = models.FloatField(default=0)
     co2_saved_kg = models.FloatField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ['center', 'date']
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['-date'], name='centerstats_date_idx'),
+            models.Index(fields=['updated_at'], name='centerstats_updated_idx'),
+        ]
     
     def __str__(self):
         return f"Stats for {self.center.email} on {self.date}"
@@ -57,6 +196,13 @@ class MarketplacePurchase(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     transaction_date = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['-transaction_date', '-id'], name='purchase_date_idx'),
+            models.Index(fields=['material', '-transaction_date', '-id'], name='purchase_material_date_idx'),
+            models.Index(fields=['seller', '-transaction_date'], name='purchase_seller_date_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.buyer.email} purchased {self.quantity_kg}kg {self.material}"
 
@@ -68,10 +214,78 @@ class CenterPerformanceMetrics(models.Model):
     pickups_completed = models.IntegerField(default=0)
     customer_satisfaction = models.FloatField(default=0)  # 0-5 rating
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['center', 'week_start_date']
+        ordering = ['-week_start_date']
+        indexes = [
+            models.Index(fields=['-week_start_date'], name='centermetrics_week_idx'),
+            models.Index(fields=['updated_at'], name='centermetrics_updated_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Performance for {self.center.email} week of {self.week_start_date}"
+
+class CenterWeeklyRollup(models.Model):
+    """Dashboard figures for one center and week, computed by the
+    ``rollup_center_weeks`` job."""
+    center = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    week_start_date = models.DateField()
+    satisfaction = models.FloatField(default=0)  # 0-5 rating
+    efficiency = models.FloatField(default=0)  # % of the week's pickups completed
+    purchases = models.JSONField(default=list)  # The week's latest sales, newest first
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ['center', 'week_start_date']
         ordering = ['-week_start_date']
     
     def __str__(self):
-        return f"Performance for {self.center.email} week of {self.week_start_date}"
\ No newline at end of file
+        return f"Weekly rollup for {self.center.email} week of {self.week_start_date}"
+class GeocodedAddressManager(models.Manager):
+    def lookup(self, addresses):
+        """Map each address in ``addresses`` to ``(latitude, longitude)``,
+        omitting addresses that are not in the table."""
+        keys = {address: GeocodedAddress.normalize(address) for address in addresses}
+        coordinates = {}
+        unique_keys = list(set(keys.values()))
+        for start in range(0, len(unique_keys), IN_CHUNK_SIZE):
+            rows = self.filter(address_key__in=unique_keys[start:start + IN_CHUNK_SIZE])
+            for key, latitude, longitude in rows.values_list('address_key', 'latitude', 'longitude'):
+                coordinates[key] = (latitude, longitude)
+        return {
+            address: coordinates[key] for address, key in keys.items() if key in coordinates
+        }
+
+
+class GeocodedAddress(models.Model):
+    """Local address -> coordinate cache used for route planning.
+
+    Filled from geocoder exports with ``manage.py import_geocodes``; no
+    external service is called at request time.
+    """
+    address_key = models.CharField(max_length=255, unique=True)
+    address = models.TextField()
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = GeocodedAddressManager()
+
+    class Meta:
+        verbose_name_plural = "Geocoded Addresses"
+
+    def __str__(self):
+        return f"{self.address} ({self.latitude}, {self.longitude})"
+
+    @staticmethod
+    def normalize(address):
+        """Lookup key for an address: case, punctuation and spacing removed."""
+        words = ''.join(c if c.isalnum() else ' ' for c in (address or '').lower()).split()
+        return ' '.join(words)[:255]
+
+    def save(self, *args, **kwargs):
+        self.address_key = self.normalize(self.address)
+        super().save(*args, **kwargs)
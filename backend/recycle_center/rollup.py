@@ -0,0 +1,112 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Avg, Count, Q
+from django.utils import timezone
+
+from core.dashboard_cache import invalidate
+from users.models import User
+from .models import (
+    IN_CHUNK_SIZE, CenterPerformanceMetrics, CenterWeeklyRollup, MarketplacePurchase, PickupRequest,
+)
+
+# Purchases listed on the dashboard per center and week
+WEEKLY_PURCHASES_LIMIT = 20
+
+ROLLUP_FIELDS = ['satisfaction', 'efficiency', 'purchases']
+
+
+def week_start(day):
+    """Monday of ``day``'s week."""
+    return day - timedelta(days=day.weekday())
+
+
+def _moment(day):
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_default_timezone())
+
+
+def _purchase(purchase):
+    return {
+        'id': purchase.id,
+        'customer': purchase.buyer.get_full_name() or purchase.buyer.email,
+        'material': purchase.get_material_display(),
+        'quantity': purchase.quantity_kg,
+        'date': timezone.localdate(purchase.transaction_date).isoformat(),
+        'amount': float(purchase.price),
+    }
+
+
+def compute_week(start, center_ids):
+    """``{center_id: {field: value}}`` for the week starting on ``start``.
+
+    Each source is read with one query for all centers: the week's
+    satisfaction ratings, its pickups by status and its sales. Efficiency
+    is the share of the week's scheduled (not cancelled) pickups that were
+    completed.
+    """
+    end = start + timedelta(days=7)
+    week = Q(scheduled_date__gte=_moment(start), scheduled_date__lt=_moment(end))
+
+    satisfaction = dict(
+        CenterPerformanceMetrics.objects.filter(
+            center_id__in=center_ids, week_start_date__gte=start, week_start_date__lt=end,
+        ).order_by().values_list('center_id').annotate(rating=Avg('customer_satisfaction'))
+    )
+    pickups = {
+        row.pop('center_id'): row
+        for row in PickupRequest.objects.filter(week, center_id__in=center_ids).exclude(status='cancelled')
+        .order_by().values('center_id')
+        .annotate(scheduled=Count('id'), completed=Count('id', filter=Q(status='completed')))
+    }
+    purchases = defaultdict(list)
+    sales = (
+        MarketplacePurchase.objects.filter(
+            seller_id__in=center_ids, transaction_date__gte=_moment(start), transaction_date__lt=_moment(end),
+        )
+        .select_related('buyer')
+        .order_by('seller_id', '-transaction_date', '-id')
+    )
+    for purchase in sales.iterator(chunk_size=1000):
+        if len(purchases[purchase.seller_id]) < WEEKLY_PURCHASES_LIMIT:
+            purchases[purchase.seller_id].append(_purchase(purchase))
+
+    rollups = {}
+    for center_id in center_ids:
+        counts = pickups.get(center_id)
+        rollups[center_id] = {
+            'satisfaction': round(satisfaction.get(center_id) or 0, 1),
+            'efficiency': round(100 * counts['completed'] / counts['scheduled'], 1) if counts else 0,
+            'purchases': purchases.get(center_id, []),
+        }
+    return rollups
+
+
+def store_week(start, rollups):
+    rows = [
+        CenterWeeklyRollup(center_id=center_id, week_start_date=start, **values)
+        for center_id, values in rollups.items()
+    ]
+    CenterWeeklyRollup.objects.bulk_create(
+        rows, batch_size=500, update_conflicts=True,
+        unique_fields=['center', 'week_start_date'], update_fields=[*ROLLUP_FIELDS, 'updated_at'],
+    )
+    # bulk_create skips the post_save handlers that retire cached dashboards
+    for center_id in rollups:
+        invalidate('center', center_id)
+    return len(rows)
+
+
+def refresh_week(day=None):
+    """Recompute every center's rollup for the week containing ``day``
+    (today by default). Returns the number of rows written."""
+    start = week_start(day or timezone.localdate())
+    center_ids = list(
+        User.objects.filter(user_type='recycling_center').order_by('pk').values_list('pk', flat=True)
+    )
+    written = 0
+    for offset in range(0, len(center_ids), IN_CHUNK_SIZE):
+        chunk = center_ids[offset:offset + IN_CHUNK_SIZE]
+        with transaction.atomic():
+            written += store_week(start, compute_week(start, chunk))
+    return written
@@ -0,0 +1,187 @@
+import math
+
+from .models import GeocodedAddress
+
+# Route plans group a day's stops into vehicle runs in three steps: stops
+# are swept around the depot by bearing and cut into runs of at most
+# ``stops_per_run`` (neighbouring bearings end up in the same run), each run
+# is ordered by nearest neighbour from the depot, and the order is then
+# improved with 2-opt. Every step is local to a run, so planning thousands of
+# stops stays well within a request.
+#
+# 2-opt only tries to join a stop to its TWO_OPT_NEIGHBOURS nearest stops,
+# and a whole plan evaluates at most TWO_OPT_MAX_CHECKS moves, shared
+# between its runs by size. Runs past their share keep the best order found
+# so far, so a request's 2-opt work is bounded however large the runs are.
+
+EARTH_RADIUS_KM = 6371.0
+DEFAULT_STOPS_PER_RUN = 25
+MAX_STOPS_PER_RUN = 200
+TWO_OPT_MAX_PASSES = 20
+TWO_OPT_NEIGHBOURS = 10
+TWO_OPT_MAX_CHECKS = 400_000
+
+
+def distance_km(a, b):
+    """Equirectangular approximation, accurate to well under a percent at
+    city scale and much cheaper than haversine."""
+    lat1, lng1 = map(math.radians, a)
+    lat2, lng2 = map(math.radians, b)
+    x = (lng2 - lng1) * math.cos((lat1 + lat2) / 2)
+    y = lat2 - lat1
+    return EARTH_RADIUS_KM * math.hypot(x, y)
+
+
+def sweep_clusters(points, depot, stops_per_run):
+    """Split ``points`` (index -> coordinate) into runs by bearing from the
+    depot, starting at the widest gap so no run straddles two directions."""
+    if not points:
+        return []
+    bearings = sorted(
+        (math.atan2(lat - depot[0], lng - depot[1]), index)
+        for index, (lat, lng) in points.items()
+    )
+    gaps = [
+        (bearings[(i + 1) % len(bearings)][0] - bearings[i][0]) % (2 * math.pi)
+        for i in range(len(bearings))
+    ]
+    start = (gaps.index(max(gaps)) + 1) % len(bearings)
+    ordered = [index for _, index in bearings[start:] + bearings[:start]]
+
+    # Equal-sized runs rather than full runs plus a short remainder
+    run_count = math.ceil(len(ordered) / stops_per_run)
+    size = math.ceil(len(ordered) / run_count)
+    return [ordered[i:i + size] for i in range(0, len(ordered), size)]
+
+
+def nearest_neighbour(run, points, depot):
+    remaining = set(run)
+    position, route = depot, []
+    while remaining:
+        nearest = min(remaining, key=lambda index: distance_km(position, points[index]))
+        remaining.remove(nearest)
+        route.append(nearest)
+        position = points[nearest]
+    return route
+
+
+def two_opt(route, points, depot, max_checks=TWO_OPT_MAX_CHECKS):
+    """Reverse route segments while that shortens the depot-to-depot tour,
+    evaluating at most ``max_checks`` moves."""
+    # Nodes are 0 for the depot the tour starts at, 1..n for the route's
+    # stops and n + 1 for the depot it ends at
+    coordinates = [depot] + [points[index] for index in route] + [depot]
+    size = len(coordinates)
+    distance = [[distance_km(a, b) for b in coordinates] for a in coordinates]
+    neighbours = [
+        sorted((other for other in range(size) if other != node), key=distance[node].__getitem__)
+        [:TWO_OPT_NEIGHBOURS]
+        for node in range(size)
+    ]
+    tour = list(range(size))
+    position = list(range(size))
+
+    def reverse(start, end):
+        tour[start:end + 1] = tour[start:end + 1][::-1]
+        for k in range(start, end + 1):
+            position[tour[k]] = k
+
+    checks = 0
+    for _ in range(TWO_OPT_MAX_PASSES):
+        improved = False
+        for i in range(1, size):
+            # Replace edge a-b and another edge by an edge from a or b to one
+            # of its neighbours c; neighbours are nearest first, so none
+            # after the first that is no closer than b can shorten the tour
+            for from_a in (True, False):
+                a, b = tour[i - 1], tour[i]
+                near = a if from_a else b
+                for c in neighbours[near]:
+                    if distance[near][c] >= distance[a][b] or checks >= max_checks:
+                        break
+                    checks += 1
+                    j = position[c]
+                    if from_a:
+                        # a-c and b-d for a-b and c-d, with d after c
+                        if j == size - 1:
+                            continue
+                        d = tour[j + 1]
+                        if c == b or d == a:
+                            continue
+                        gain = distance[a][b] + distance[c][d] - distance[a][c] - distance[b][d]
+                        start, end = (i, j) if j > i else (j + 1, i - 1)
+                    else:
+                        # b-c and a-e for a-b and e-c, with e before c
+                        if j == 0:
+                            continue
+                        e = tour[j - 1]
+                        if c == a or e == b:
+                            continue
+                        gain = distance[a][b] + distance[e][c] - distance[b][c] - distance[a][e]
+                        start, end = (i, j - 1) if j > i else (j, i - 1)
+                    if gain > 1e-9:
+                        reverse(start, end)
+                        improved = True
+                        break
+        if not improved or checks >= max_checks:
+            break
+    return [route[node - 1] for node in tour[1:-1]]
+
+
+def tour_km(route, points, depot):
+    path = [depot] + [points[index] for index in route] + [depot]
+    return sum(distance_km(a, b) for a, b in zip(path, path[1:]))
+
+
+def plan_routes(pickups, depot=None, stops_per_run=DEFAULT_STOPS_PER_RUN):
+    """Plan vehicle runs for ``pickups``.
+
+    ``depot`` is the ``(latitude, longitude)`` runs start and end at; the
+    centroid of the stops is used when it is unknown. Stops are placed at
+    the pickup's stored coordinates, else at its address in the geocode
+    table; pickups with neither are returned under ``unlocated``.
+    """
+    pickups = list(pickups)
+    coordinates = GeocodedAddress.objects.lookup(
+        {pickup.address for pickup in pickups if pickup.latitude is None or pickup.longitude is None}
+    )
+    points = {}
+    for index, pickup in enumerate(pickups):
+        if pickup.latitude is not None and pickup.longitude is not None:
+            points[index] = (pickup.latitude, pickup.longitude)
+        elif pickup.address in coordinates:
+            points[index] = coordinates[pickup.address]
+    unlocated = [pickup.pk for index, pickup in enumerate(pickups) if index not in points]
+
+    if depot is None and points:
+        depot = (
+            sum(lat for lat, _ in points.values()) / len(points),
+            sum(lng for _, lng in points.values()) / len(points),
+        )
+
+    runs = []
+    for number, cluster in enumerate(sweep_clusters(points, depot, stops_per_run), start=1):
+        max_checks = TWO_OPT_MAX_CHECKS * len(cluster) // len(points)
+        route = two_opt(nearest_neighbour(cluster, points, depot), points, depot, max_checks)
+        runs.append({
+            'run': number,
+            'distance_km': round(tour_km(route, points, depot), 2),
+            'stops': [
+                {
+                    'sequence': sequence,
+                    'pickup_id': pickups[index].pk,
+                    'address': pickups[index].address,
+                    'scheduled_date': pickups[index].scheduled_date,
+                    'latitude': points[index][0],
+                    'longitude': points[index][1],
+                }
+                for sequence, index in enumerate(route, start=1)
+            ],
+        })
+
+    return {
+        'depot': {'latitude': depot[0], 'longitude': depot[1]} if depot else None,
+        'stop_count': len(points),
+        'runs': runs,
+        'unlocated': unlocated,
+    }
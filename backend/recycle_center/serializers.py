@@ -7,11 +7,17 @@ class PickupRequestSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = PickupRequest
-        fields = ['id', 'customer', 'customer_name', 'scheduled_date', 'address', 'items', 'status', 'created_at']
+        fields = ['id', 'customer', 'customer_name', 'scheduled_date', 'address', 'items', 'status', 'version', 'created_at']
     
     def get_customer_name(self, obj):
         return f"{obj.customer.first_name} {obj.customer.last_name}"
 
+class PickupBatchActionSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=10000
+    )
+    action = serializers.ChoiceField(choices=list(PickupRequest.TRANSITIONS))
+
 class RecyclingCenterStatsSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecyclingCenterStats
@@ -43,5 +49,6 @@ class CenterDashboardSerializer(serializers.Serializer):
     pending_pickups = serializers.IntegerField()
     completed_pickups = serializers.IntegerField()
     monthly_stats = serializers.DictField()
+    material_breakdown = serializers.DictField()
     performance_data = serializers.DictField()
     weekly_purchases = serializers.ListField()
\ No newline at end of file
@@ -0,0 +1,73 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.dashboard_cache import invalidate
+from core.materials import material_quantities
+from users.models import User
+from .models import CenterWeeklyRollup, GeocodedAddress, PickupRequest, PickupRequestItem, RecyclingCenterStats
+from .spatial import center_index, centers_changed, nearest_center
+
+
+@receiver(post_save, sender=RecyclingCenterStats)
+@receiver(post_save, sender=CenterWeeklyRollup)
+@receiver(post_delete, sender=RecyclingCenterStats)
+@receiver(post_delete, sender=CenterWeeklyRollup)
+def invalidate_center_dashboard(sender, instance, **kwargs):
+    invalidate('center', instance.center_id)
+
+
+@receiver(post_save, sender=PickupRequest)
+@receiver(post_delete, sender=PickupRequest)
+def invalidate_pickup_counts(sender, instance, **kwargs):
+    invalidate('pickup_requests')
+
+
+@receiver(post_save, sender=PickupRequest)
+def sync_pickup_items(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not {'items', 'center', 'scheduled_date'} & set(update_fields)):
+        return
+    PickupRequestItem.objects.replace_for(
+        instance, material_quantities(instance.items), existing=not created,
+        center_id=instance.center_id, scheduled_date=instance.scheduled_date,
+    )
+
+
+@receiver(post_save, sender=GeocodedAddress)
+@receiver(post_delete, sender=GeocodedAddress)
+def invalidate_route_plans(sender, instance, **kwargs):
+    invalidate('geocodes')
+
+
+@receiver(post_save, sender=User)
+def invalidate_center_depot(sender, instance, **kwargs):
+    # A center's address is the depot its routes start from
+    invalidate('routes', instance.pk)
+
+
+def _geocode(instance):
+    if instance.latitude is None or instance.longitude is None:
+        found = GeocodedAddress.objects.lookup([instance.address]) if instance.address else {}
+        if instance.address in found:
+            instance.latitude, instance.longitude = found[instance.address]
+
+
+@receiver(pre_save, sender=PickupRequest)
+def assign_pickup_to_center(sender, instance, raw=False, **kwargs):
+    if raw or not instance._state.adding:
+        return
+    _geocode(instance)
+    if instance.center_id is None:
+        instance.center_id = nearest_center(instance.latitude, instance.longitude)
+
+
+@receiver(pre_save, sender=User)
+def locate_center(sender, instance, raw=False, **kwargs):
+    if not raw and instance.user_type == 'recycling_center':
+        _geocode(instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def rebuild_center_index(sender, instance, **kwargs):
+    if instance.user_type == 'recycling_center' or instance.pk in center_index():
+        centers_changed()
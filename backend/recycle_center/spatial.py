@@ -0,0 +1,140 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from users.models import User
+from .routing import distance_km
+
+# Recycling centers are held in an in-process grid of fixed-size lat/lng
+# cells. A nearest-center query scans rings of cells around the pickup's
+# cell and stops as soon as no unscanned ring can hold anything closer, so
+# it touches a handful of cells however many centers there are.
+#
+# Each process rebuilds its index when the centers changed, checking at
+# most once per CENTER_INDEX_CHECK_INTERVAL seconds. Changes are detected
+# from the user table: the count, highest id and latest ``updated_at`` of
+# recycling centers, all read from the (user_type, updated_at) index.
+
+KM_PER_DEGREE = 111.32
+
+
+def _cell_degrees():
+    return getattr(settings, 'CENTER_INDEX_CELL_DEGREES', 0.25)
+
+
+def _check_interval():
+    return getattr(settings, 'CENTER_INDEX_CHECK_INTERVAL', 1.0)
+
+
+class CenterGridIndex:
+    def __init__(self, centers, cell_degrees):
+        """``centers`` is an iterable of ``(center_id, latitude, longitude)``."""
+        self.cell_degrees = cell_degrees
+        self.cells = {}
+        self.center_ids = set()
+        for center_id, latitude, longitude in centers:
+            self.cells.setdefault(self.cell(latitude, longitude), []).append(
+                (center_id, (latitude, longitude))
+            )
+            self.center_ids.add(center_id)
+        rows = [row for row, _ in self.cells] or [0]
+        columns = [column for _, column in self.cells] or [0]
+        self.bounds = (min(rows), max(rows), min(columns), max(columns))
+
+    def __len__(self):
+        return len(self.center_ids)
+
+    def __contains__(self, center_id):
+        return center_id in self.center_ids
+
+    def cell(self, latitude, longitude):
+        return (
+            math.floor(latitude / self.cell_degrees),
+            math.floor(longitude / self.cell_degrees),
+        )
+
+    def ring(self, row, column, radius):
+        if radius == 0:
+            yield row, column
+            return
+        for r in range(row - radius, row + radius + 1):
+            yield r, column - radius
+            yield r, column + radius
+        for c in range(column - radius + 1, column + radius):
+            yield row - radius, c
+            yield row + radius, c
+
+    def nearest(self, latitude, longitude):
+        """Return ``(center_id, distance_km)`` of the closest center, or None."""
+        if not self.cells:
+            return None
+        point = (latitude, longitude)
+        row, column = self.cell(latitude, longitude)
+        min_row, max_row, min_column, max_column = self.bounds
+        max_radius = max(row - min_row, max_row - row, column - min_column, max_column - column)
+
+        best, best_distance = None, math.inf
+        for radius in range(max_radius + 1):
+            # Anything beyond this ring is at least ``radius`` whole cells
+            # away along one axis; longitude degrees shrink towards the poles.
+            shrink = math.cos(math.radians(min(89.0, abs(latitude) + (radius + 1) * self.cell_degrees)))
+            if (radius - 1) * self.cell_degrees * KM_PER_DEGREE * shrink > best_distance:
+                break
+            for key in self.ring(row, column, radius):
+                for center_id, location in self.cells.get(key, ()):
+                    distance = distance_km(point, location)
+                    if distance < best_distance:
+                        best, best_distance = center_id, distance
+        return best, best_distance
+
+
+_lock = threading.Lock()
+_shared = {'index': None, 'state': None, 'checked_at': 0.0}
+
+
+def build_index():
+    centers = User.objects.filter(
+        user_type='recycling_center', is_active=True,
+        latitude__isnull=False, longitude__isnull=False,
+    ).values_list('pk', 'latitude', 'longitude')
+    return CenterGridIndex(centers, _cell_degrees())
+
+
+def _centers_state():
+    state = User.objects.filter(user_type='recycling_center').aggregate(
+        rows=Count('pk'), last_id=Max('pk'), updated_at=Max('updated_at'),
+    )
+    return state['rows'], state['last_id'], state['updated_at']
+
+
+def center_index():
+    """The current process's center index, rebuilt when centers change."""
+    now = time.monotonic()
+    index = _shared['index']
+    if index is not None and now - _shared['checked_at'] < _check_interval():
+        return index
+    with _lock:
+        # Read the state first, so a write during the build triggers another
+        state = _centers_state()
+        if _shared['index'] is None or _shared['state'] != state:
+            _shared['index'] = build_index()
+            _shared['state'] = state
+        _shared['checked_at'] = now
+        return _shared['index']
+
+
+def centers_changed():
+    """Rebuild this process's index on its next use; other processes
+    notice within the check interval."""
+    _shared['index'] = None
+
+
+def nearest_center(latitude, longitude):
+    """Id of the center closest to the coordinates, or None."""
+    if latitude is None or longitude is None:
+        return None
+    found = center_index().nearest(latitude, longitude)
+    return found[0] if found else None
@@ -1,3 +1,716 @@
-from django.test import TestCase
+import random
+import threading
+import time
+import unittest
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+
+from core.testing import QueryBudgetMixin, QueryPlanMixin, response_rows
+from users.models import User
+from .models import (
+    CenterPerformanceMetrics, CenterWeeklyRollup, GeocodedAddress, MarketplacePurchase, PickupRequest,
+    PickupRequestItem, PickupRequestQuerySet, RecyclingCenterStats,
+)
+from .rollup import refresh_week, week_start
+from .routing import MAX_STOPS_PER_RUN, distance_km, nearest_neighbour, plan_routes, tour_km, two_opt
+from .spatial import CenterGridIndex, centers_changed
+
+
+class CenterListQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.center = User.objects.create_user(
+            'center@example.com', 'password', user_type='recycling_center'
+        )
+        self.client.force_authenticate(self.center)
+
+    def create_customer(self, i):
+        return User.objects.create_user(f'customer{i}@example.com', 'password')
+
+    def seed_pickups(self, size):
+        for i in range(size):
+            PickupRequest.objects.create(
+                customer=self.create_customer(i), scheduled_date=timezone.now(),
+                address='1 Green Street', items={'plastic': 2},
+            )
+
+    def seed_purchases(self, size):
+        for i in range(size):
+            MarketplacePurchase.objects.create(
+                buyer=self.create_customer(i), seller=self.center,
+                material='paper', quantity_kg=5, price=12,
+            )
+
+    def test_pickup_queue_uses_constant_queries(self):
+        self.assertQueryBudget('/api/center/pickups/', self.seed_pickups, max_queries=2)
+
+    def test_purchases_use_constant_queries(self):
+        self.assertQueryBudget('/api/center/purchases/', self.seed_purchases, max_queries=2)
+
+    def test_purchase_export_uses_constant_queries(self):
+        self.assertQueryBudget('/api/center/purchases/export/', self.seed_purchases, max_queries=1)
+
+
+class CenterExportTests(APITestCase):
+    def test_stats_export_is_limited_to_the_center(self):
+        center, other = (
+            User.objects.create_user(f'{name}@example.com', 'password', user_type='recycling_center')
+            for name in ('center', 'other')
+        )
+        today = timezone.now().date()
+        for owner in (center, other):
+            RecyclingCenterStats.objects.create(center=owner, date=today, plastic_kg=4, co2_saved_kg=2)
+        RecyclingCenterStats.objects.create(center=center, date=today - timedelta(days=400), paper_kg=1)
+
+        self.client.force_authenticate(center)
+        response = self.client.get('/api/center/stats/export/', {'start': str(today - timedelta(days=30))})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            lines[0], 'id,center_email,date,plastic_kg,paper_kg,metal_kg,glass_kg,electronics_kg,co2_saved_kg',
+        )
+        self.assertEqual(len(lines), 2)
+        self.assertIn(f'center@example.com,{today.isoformat()},4.0,', lines[1])
+
+
+class CenterQueryPlanTests(QueryPlanMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.now().date()
+        centers = [
+            User.objects.create_user(f'center{i}@example.com', 'password', user_type='recycling_center')
+            for i in range(3)
+        ]
+        cls.center = centers[0]
+        customer = User.objects.create_user('customer@example.com', 'password')
+        for i in range(60):
+            PickupRequest.objects.create(
+                customer=customer, scheduled_date=timezone.now() + timedelta(days=i - 30),
+                address='1 Green Street', items={'metal': 1},
+                status=['pending', 'approved', 'completed', 'cancelled'][i % 4],
+            )
+            MarketplacePurchase.objects.create(
+                buyer=customer, seller=centers[i % 3], quantity_kg=3, price=9,
+                material=['plastic', 'paper', 'metal'][i % 3],
+            )
+            for center in centers:
+                RecyclingCenterStats.objects.create(
+                    center=center, date=today - timedelta(days=i), plastic_kg=4, co2_saved_kg=2,
+                )
+                if i % 7 == 0:
+                    CenterPerformanceMetrics.objects.create(
+                        center=center, week_start_date=today - timedelta(days=i),
+                    )
+        refresh_week()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.center)
+
+    def test_dashboard_is_indexed(self):
+        self.assertIndexedQueries('/api/center/dashboard/', {'weeks': 12})
+
+    def test_pickup_queue_is_indexed(self):
+        self.assertIndexedQueries('/api/center/pickups/')
+        self.assertIndexedQueries('/api/center/pickups/', {'status': 'pending'})
+
+    def test_stats_are_indexed(self):
+        for time_range in ('monthly', 'weekly', 'all'):
+            self.assertIndexedQueries('/api/center/stats/', {'range': time_range})
+
+    def test_purchases_are_indexed(self):
+        self.assertIndexedQueries('/api/center/purchases/')
+        self.assertIndexedQueries('/api/center/purchases/', {'category': 'paper'})
+
+    def test_performance_is_indexed(self):
+        for time_range in ('monthly', 'all'):
+            self.assertIndexedQueries('/api/center/performance/', {'range': time_range})
+
+
+class CenterDashboardTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.center = User.objects.create_user(
+            'center@example.com', 'password', user_type='recycling_center'
+        )
+        self.other = User.objects.create_user(
+            'other@example.com', 'password', user_type='recycling_center'
+        )
+        self.monday = week_start(timezone.localdate())
+        self.client.force_authenticate(self.center)
+
+    def test_weekly_series_cover_the_requested_weeks(self):
+        for center, date, kg in (
+            (self.center, self.monday, 2.0),
+            (self.center, self.monday - timedelta(days=7), 3.0),
+            (self.center, self.monday - timedelta(days=15), 4.0),
+            (self.center, self.monday - timedelta(weeks=6), 8.0),
+            (self.other, self.monday, 5.0),
+        ):
+            RecyclingCenterStats.objects.create(
+                center=center, date=date, plastic_kg=kg, paper_kg=kg, co2_saved_kg=kg,
+            )
+        RecyclingCenterStats.objects.create(
+            center=self.center, date=self.monday - timedelta(days=4), glass_kg=1.0, co2_saved_kg=1.0,
+        )
+
+        response = self.client.get('/api/center/dashboard/', {'weeks': 5})
+        self.assertEqual(response.data['weekly_volume'], [4.0, 7.0, 0, 8.0, 0])
+        self.assertEqual(response.data['weekly_co2_saved'], [2.0, 4.0, 0, 4.0, 0])
+        self.assertEqual(response.data['performance_data']['weeklyVolume'], [4.0, 7.0, 0, 8.0, 0])
+        self.assertEqual(response.data['total_processed'], 35.0)
+
+        self.assertEqual(len(self.client.get('/api/center/dashboard/').data['weekly_volume']), 4)
+        self.assertEqual(len(self.client.get('/api/center/dashboard/', {'weeks': 'all'}).data['weekly_volume']), 4)
+        self.assertEqual(len(self.client.get('/api/center/dashboard/', {'weeks': 1000}).data['weekly_volume']), 104)
+        self.assertEqual(self.client.get('/api/center/dashboard/', {'weeks': 0}).data['weekly_volume'], [4.0])
+
+
+class PickupBatchActionTests(APITestCase):
+    url = '/api/center/pickups/batch/'
+
+    def setUp(self):
+        self.center = User.objects.create_user(
+            'center@example.com', 'password', user_type='recycling_center'
+        )
+        self.customer = User.objects.create_user('customer@example.com', 'password')
+        self.client.force_authenticate(self.center)
+
+    def create_pickups(self, statuses):
+        return [
+            PickupRequest.objects.create(
+                customer=self.customer, center=self.center, scheduled_date=timezone.now(),
+                address='1 Green Street', items={'metal': 1}, status=status,
+            ).pk
+            for status in statuses
+        ]
+
+    def test_only_rows_in_allowed_states_change(self):
+        pending, approved, completed = self.create_pickups(['pending', 'approved', 'completed'])
+
+        response = self.client.post(
+            self.url, {'ids': [pending, approved, completed, 999999], 'action': 'approve'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], [pending])
+        self.assertEqual(
+            [(row['id'], row['status']) for row in response.data['skipped']],
+            [(approved, 'approved'), (completed, 'completed')],
+        )
+        self.assertEqual(response.data['not_found'], [999999])
+        statuses = dict(PickupRequest.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {pending: 'approved', approved: 'approved', completed: 'completed'})
+
+    def test_large_batches_use_one_update_per_chunk(self):
+        ids = self.create_pickups(['pending'] * 1000)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, {'ids': ids, 'action': 'cancel'}, format='json')
+
+        self.assertEqual(len(response.data['updated']), 1000)
+        updates = [query for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        self.assertFalse(PickupRequest.objects.exclude(status='cancelled').exists())
+
+    def test_unknown_action_is_rejected(self):
+        ids = self.create_pickups(['pending'])
+        response = self.client.post(self.url, {'ids': ids, 'action': 'archive'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(PickupRequest.objects.get().status, 'pending')
+
+
+class PickupTransitionTests(APITestCase):
+    def setUp(self):
+        self.center = User.objects.create_user(
+            'center@example.com', 'password', user_type='recycling_center'
+        )
+        self.pickup = PickupRequest.objects.create(
+            customer=self.center, center=self.center, scheduled_date=timezone.now(),
+            address='1 Green Street', items={'metal': 1},
+        )
+        self.url = f'/api/center/pickups/{self.pickup.pk}/'
+        self.client.force_authenticate(self.center)
+
+    def test_pickups_follow_the_transition_table(self):
+        response = self.client.post(self.url, {'action': 'complete'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['status'], 'pending')
+
+        response = self.client.post(self.url, {'action': 'approve'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['status'], response.data['version']), ('approved', 2))
+
+        response = self.client.post(self.url, {'action': 'complete'}, format='json')
+        self.assertEqual(response.data['status'], 'completed')
+        response = self.client.post(self.url, {'action': 'cancel'}, format='json')
+        self.assertEqual(response.status_code, 409)
+
+    def test_stale_version_is_a_conflict(self):
+        response = self.client.post(self.url, {'action': 'cancel', 'version': 7}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['version'], 1)
+
+        response = self.client.post(self.url, {'action': 'cancel', 'version': 1}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_interleaved_actions_on_one_version_apply_once(self):
+        # Both dispatchers loaded version 1. The cancel has built its
+        # conditional UPDATE when the approve commits, then runs it.
+        update = PickupRequestQuerySet.update
+        outcomes = []
+        interleaved = []
+
+        def approve_first(queryset, **values):
+            if not interleaved:
+                interleaved.append(True)
+                outcomes.append(PickupRequest.objects.transition(self.pickup.pk, 'approve', expected_version=1))
+            return update(queryset, **values)
+
+        with mock.patch.object(PickupRequestQuerySet, 'update', autospec=True, side_effect=approve_first):
+            outcomes.append(PickupRequest.objects.transition(self.pickup.pk, 'cancel', expected_version=1))
+
+        self.assertEqual(outcomes, [
+            (True, {'status': 'approved', 'version': 2}),
+            (False, {'status': 'approved', 'version': 2}),
+        ])
+        self.pickup.refresh_from_db()
+        self.assertEqual((self.pickup.status, self.pickup.version), ('approved', 2))
+
+    def test_unknown_action_is_rejected(self):
+        response = self.client.post(self.url, {'action': 'archive'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.pickup.refresh_from_db()
+        self.assertEqual((self.pickup.status, self.pickup.version), ('pending', 1))
+
+    def test_missing_pickup_is_not_found(self):
+        response = self.client.post('/api/center/pickups/999999/', {'action': 'approve'}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+@unittest.skipIf(
+    connection.vendor == 'sqlite',
+    "sqlite runs one writer at a time and its test database fails on lock "
+    "contention instead of waiting, so the transitions can't race there; "
+    "PickupTransitionTests interleaves them deterministically instead",
+)
+class PickupTransitionConcurrencyTests(TransactionTestCase):
+    threads = 12
+
+    def test_concurrent_actions_on_one_pickup_apply_exactly_once(self):
+        center = User.objects.create_user('center@example.com', 'password', user_type='recycling_center')
+        pickup = PickupRequest.objects.create(
+            customer=center, center=center, scheduled_date=timezone.now(),
+            address='1 Green Street', items={},
+        )
+        url = f'/api/center/pickups/{pickup.pk}/'
+        barrier = threading.Barrier(self.threads)
+        results = []
+
+        def dispatch(action):
+            client = APIClient()
+            client.force_authenticate(center)
+            try:
+                barrier.wait()
+                # Every dispatcher acts on the version they loaded the queue at
+                response = client.post(url, {'action': action, 'version': 1}, format='json')
+                results.append((action, response.status_code))
+            finally:
+                connection.close()
+
+        workers = [
+            threading.Thread(target=dispatch, args=(['approve', 'cancel'][i % 2],))
+            for i in range(self.threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        statuses = [status_code for _, status_code in results]
+        self.assertEqual(len(results), self.threads)
+        self.assertEqual(statuses.count(200), 1)
+        self.assertEqual(statuses.count(409), self.threads - 1)
+
+        pickup.refresh_from_db()
+        winner = next(action for action, status_code in results if status_code == 200)
+        self.assertEqual(pickup.status, PickupRequest.TRANSITIONS[winner][0])
+        self.assertEqual(pickup.version, 2)
+
+
+class RoutePlanningTests(TestCase):
+    def create_stops(self, count, seed=7):
+        rng = random.Random(seed)
+        geocodes, pickups = [], []
+        for i in range(count):
+            address = f'{i} Depot Road'
+            geocodes.append(GeocodedAddress(
+                address_key=GeocodedAddress.normalize(address), address=address,
+                latitude=9.9 + rng.uniform(-0.2, 0.2), longitude=76.3 + rng.uniform(-0.2, 0.2),
+            ))
+            pickups.append(PickupRequest(
+                customer=self.customer, scheduled_date=timezone.now(), address=address,
+                items={}, status='approved',
+            ))
+        GeocodedAddress.objects.bulk_create(geocodes)
+        return PickupRequest.objects.bulk_create(pickups)
+
+    def setUp(self):
+        self.customer = User.objects.create_user('customer@example.com', 'password')
+
+    def test_every_located_stop_is_planned_once(self):
+        pickups = self.create_stops(120)
+        pickups.append(PickupRequest.objects.create(
+            customer=self.customer, scheduled_date=timezone.now(), address='Unknown Lane', items={},
+        ))
+
+        plan = plan_routes(pickups, stops_per_run=25)
+
+        planned = [stop['pickup_id'] for run in plan['runs'] for stop in run['stops']]
+        self.assertEqual(sorted(planned), sorted(pickup.pk for pickup in pickups[:-1]))
+        self.assertEqual(plan['unlocated'], [pickups[-1].pk])
+        self.assertEqual(len(plan['runs']), 5)
+        self.assertTrue(all(len(run['stops']) <= 25 for run in plan['runs']))
+
+    def test_two_opt_never_lengthens_a_route(self):
+        rng = random.Random(3)
+        points = {i: (rng.uniform(0, 1), rng.uniform(0, 1)) for i in range(40)}
+        depot = (0.5, 0.5)
+        route = nearest_neighbour(list(points), points, depot)
+        improved = two_opt(route, points, depot)
+
+        self.assertEqual(sorted(improved), sorted(points))
+        self.assertLessEqual(tour_km(improved, points, depot), tour_km(route, points, depot) + 1e-9)
+
+    def test_thousands_of_stops_plan_in_seconds(self):
+        pickups = self.create_stops(3000)
+
+        started = time.monotonic()
+        plan = plan_routes(pickups, depot=(9.9, 76.3))
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(plan['stop_count'], 3000)
+        self.assertLess(elapsed, 10)
+
+    def test_largest_runs_plan_in_seconds(self):
+        pickups = self.create_stops(4000)
+
+        started = time.monotonic()
+        plan = plan_routes(pickups, depot=(9.9, 76.3), stops_per_run=MAX_STOPS_PER_RUN)
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(len(plan['runs']), 20)
+        self.assertEqual(plan['stop_count'], 4000)
+        self.assertLess(elapsed, 5)
+
+    def test_two_opt_stops_at_its_check_budget(self):
+        rng = random.Random(5)
+        points = {i: (rng.uniform(0, 1), rng.uniform(0, 1)) for i in range(MAX_STOPS_PER_RUN)}
+        depot = (0.5, 0.5)
+        route = list(points)
+
+        self.assertEqual(two_opt(route, points, depot, max_checks=0), route)
+        bounded = two_opt(route, points, depot, max_checks=500)
+        self.assertEqual(sorted(bounded), route)
+        self.assertLess(tour_km(bounded, points, depot), tour_km(route, points, depot))
+        self.assertLess(tour_km(two_opt(route, points, depot), points, depot), tour_km(bounded, points, depot))
+
+    def test_normalized_addresses_match(self):
+        GeocodedAddress.objects.create(address='12, MG Road  Kochi', latitude=9.97, longitude=76.28)
+        self.assertEqual(
+            GeocodedAddress.objects.lookup(['12 mg road, KOCHI']), {'12 mg road, KOCHI': (9.97, 76.28)}
+        )
+
+    def test_distance_is_close_to_great_circle(self):
+        # Kochi to Thrissur is about 66 km as the crow flies
+        self.assertAlmostEqual(distance_km((9.9312, 76.2673), (10.5276, 76.2144)), 66.5, delta=2)
+
+
+class RoutePlanViewTests(APITestCase):
+    def test_plan_covers_the_days_approved_pickups(self):
+        GeocodedAddress.objects.create(address='1 Depot Road', latitude=10.0, longitude=76.0)
+        GeocodedAddress.objects.create(address='2 Canal Road', latitude=10.1, longitude=76.1)
+        center = User.objects.create_user(
+            'center@example.com', 'password', user_type='recycling_center', address='1 Depot Road',
+        )
+        today = timezone.now()
+        approved = PickupRequest.objects.create(
+            customer=center, scheduled_date=today, address='2 Canal Road', items={}, status='approved',
+        )
+        PickupRequest.objects.create(
+            customer=center, scheduled_date=today, address='2 Canal Road', items={}, status='pending',
+        )
+        self.client.force_authenticate(center)
+
+        response = self.client.get('/api/center/routes/', {'date': timezone.localdate(today).isoformat()})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['depot'], {'latitude': 10.0, 'longitude': 76.0})
+        self.assertEqual(
+            [stop['pickup_id'] for stop in response.data['runs'][0]['stops']], [approved.pk]
+        )
+        self.assertEqual(self.client.get('/api/center/routes/', {'date': 'soon'}).status_code, 400)
+
+    def test_stored_coordinates_are_used_before_the_geocode_table(self):
+        center = User.objects.create_user(
+            'center@example.com', 'password', user_type='recycling_center', latitude=10.0, longitude=76.0,
+        )
+        GeocodedAddress.objects.create(address='2 Canal Road', latitude=12.0, longitude=78.0)
+        today = timezone.now()
+        pinned = PickupRequest.objects.create(
+            customer=center, scheduled_date=today, address='2 Canal Road', items={}, status='approved',
+            latitude=10.1, longitude=76.1,
+        )
+        unknown = PickupRequest.objects.create(
+            customer=center, scheduled_date=today, address='Unmapped Lane', items={}, status='approved',
+            latitude=10.2, longitude=76.2,
+        )
+        self.client.force_authenticate(center)
+
+        response = self.client.get('/api/center/routes/', {'date': timezone.localdate(today).isoformat()})
+
+        self.assertEqual(response.data['depot'], {'latitude': 10.0, 'longitude': 76.0})
+        self.assertEqual(response.data['unlocated'], [])
+        stops = {stop['pickup_id']: (stop['latitude'], stop['longitude']) for stop in response.data['runs'][0]['stops']}
+        self.assertEqual(stops, {pinned.pk: (10.1, 76.1), unknown.pk: (10.2, 76.2)})
+
+
+class CenterGridIndexTests(TestCase):
+    def test_nearest_matches_a_brute_force_search(self):
+        rng = random.Random(11)
+        centers = [(i, rng.uniform(8, 13), rng.uniform(74, 78)) for i in range(3000)]
+        index = CenterGridIndex(centers, cell_degrees=0.25)
+
+        queries = [(rng.uniform(7, 14), rng.uniform(73, 79)) for _ in range(1000)]
+        started = time.perf_counter()
+        found = [index.nearest(lat, lng)[0] for lat, lng in queries]
+        per_query = (time.perf_counter() - started) / len(queries)
+
+        expected = [
+            min(centers, key=lambda center: distance_km((lat, lng), center[1:]))[0]
+            for lat, lng in queries
+        ]
+        self.assertEqual(found, expected)
+        self.assertLess(per_query, 0.001)
+
+    def test_empty_index_has_no_nearest_center(self):
+        self.assertIsNone(CenterGridIndex([], cell_degrees=0.25).nearest(10, 76))
+
+
+class PickupAssignmentTests(APITestCase):
+    def setUp(self):
+        centers_changed()
+        self.north = User.objects.create_user(
+            'north@example.com', 'password', user_type='recycling_center', latitude=10.5, longitude=76.2,
+        )
+        self.south = User.objects.create_user(
+            'south@example.com', 'password', user_type='recycling_center', latitude=9.5, longitude=76.3,
+        )
+        self.customer = User.objects.create_user('customer@example.com', 'password')
+
+    def create_pickup(self, **kwargs):
+        return PickupRequest.objects.create(
+            customer=self.customer, scheduled_date=timezone.now(), items={}, **kwargs
+        )
+
+    def test_pickups_are_assigned_to_the_nearest_center(self):
+        GeocodedAddress.objects.create(address='4 Beach Road', latitude=9.6, longitude=76.3)
+
+        self.assertEqual(self.create_pickup(address='Hill View', latitude=10.4, longitude=76.1).center, self.north)
+        self.assertEqual(self.create_pickup(address='4 Beach Road').center, self.south)
+        self.assertIsNone(self.create_pickup(address='Nowhere').center)
+
+    def test_moving_a_center_rebuilds_the_index(self):
+        self.south.latitude = 10.45
+        self.south.save()
+        self.assertEqual(self.create_pickup(address='Hill View', latitude=10.45, longitude=76.3).center, self.south)
+
+    def test_centers_only_see_their_own_queue(self):
+        mine = self.create_pickup(address='Hill View', latitude=10.4, longitude=76.1)
+        other = self.create_pickup(address='Harbour', latitude=9.5, longitude=76.3)
+        self.client.force_authenticate(self.north)
+
+        response = self.client.get('/api/center/pickups/')
+        self.assertEqual([row['id'] for row in response_rows(response)], [mine.pk])
+
+        response = self.client.post(f'/api/center/pickups/{other.pk}/', {'action': 'approve'}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_addresses_are_located_through_the_geocode_table(self):
+        GeocodedAddress.objects.create(address='4 Beach Road', latitude=9.6, longitude=76.3)
+        pickup = self.create_pickup(address='4 Beach Road')
+        self.assertEqual((pickup.latitude, pickup.longitude, pickup.center), (9.6, 76.3, self.south))
+
+        self.client.force_authenticate(self.north)
+        self.assertEqual(response_rows(self.client.get('/api/center/pickups/')), [])
+        self.client.force_authenticate(self.south)
+        self.assertEqual([row['id'] for row in response_rows(self.client.get('/api/center/pickups/'))], [pickup.pk])
+
+    def test_unassigned_pickups_are_in_no_queue_until_assigned(self):
+        unlocated = self.create_pickup(address='Nowhere')
+        for center in (self.north, self.south):
+            self.client.force_authenticate(center)
+            self.assertEqual(response_rows(self.client.get('/api/center/pickups/')), [])
+            response = self.client.post(f'/api/center/pickups/{unlocated.pk}/', {'action': 'approve'}, format='json')
+            self.assertEqual(response.status_code, 404)
+
+        GeocodedAddress.objects.create(address='Nowhere', latitude=10.4, longitude=76.1)
+        call_command('assign_pickups', stdout=StringIO())
+        self.client.force_authenticate(self.north)
+        self.assertEqual([row['id'] for row in response_rows(self.client.get('/api/center/pickups/'))], [unlocated.pk])
+
+    @override_settings(CENTER_INDEX_CHECK_INTERVAL=0)
+    def test_centers_moved_by_other_processes_are_picked_up(self):
+        self.assertEqual(self.create_pickup(address='Hill View', latitude=10.45, longitude=76.3).center, self.north)
+        # Saved elsewhere: this process's signal handlers do not run
+        User.objects.filter(pk=self.south.pk).update(latitude=10.45, updated_at=timezone.now())
+        self.assertEqual(self.create_pickup(address='Hill View', latitude=10.45, longitude=76.3).center, self.south)
+
+
+class PickupMaterialBreakdownTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        centers_changed()
+        self.center = User.objects.create_user(
+            'center@example.com', 'password', user_type='recycling_center', latitude=10.5, longitude=76.2,
+        )
+        self.customer = User.objects.create_user('customer@example.com', 'password')
+
+    def create_pickup(self, items, status='pending', **kwargs):
+        return PickupRequest.objects.create(
+            customer=self.customer, scheduled_date=timezone.now(), address='1 Green Street',
+            latitude=10.4, longitude=76.1, items=items, status=status, **kwargs,
+        )
+
+    def lines(self, pickup):
+        return dict(pickup.item_lines.values_list('material', 'quantity_kg'))
+
+    def test_item_lines_follow_the_items_json(self):
+        pickup = self.create_pickup([{'material': 'Plastic', 'quantity': 2.5}, {'type': 'paper', 'kg': '1'}])
+        self.assertEqual(self.lines(pickup), {'plastic': Decimal('2.50'), 'paper': Decimal('1.00')})
+        self.assertEqual(set(pickup.item_lines.values_list('center', flat=True)), {self.center.pk})
+
+        pickup.items = {'metal': 4, 'plastic': 1}
+        pickup.save()
+        self.assertEqual(self.lines(pickup), {'metal': Decimal('4.00'), 'plastic': Decimal('1.00')})
+
+        pickup.status = 'approved'
+        pickup.save(update_fields=['status'])
+        self.assertEqual(self.lines(pickup), {'metal': Decimal('4.00'), 'plastic': Decimal('1.00')})
+
+    def test_reassigned_pickups_move_their_lines(self):
+        pickup = self.create_pickup({'glass': 3})
+        PickupRequest.objects.filter(pk=pickup.pk).update(center=None)
+        PickupRequestItem.objects.filter(request=pickup).update(center=None)
+        call_command('assign_pickups', stdout=StringIO())
+
+        self.assertEqual(list(pickup.item_lines.values_list('center', flat=True)), [self.center.pk])
+
+    def test_dashboard_breaks_down_materials(self):
+        self.create_pickup({'plastic': 2, 'paper': 1})
+        self.create_pickup({'plastic': 3}, status='completed')
+        self.create_pickup({'plastic': 10}, status='cancelled')
+        self.client.force_authenticate(self.center)
+
+        response = self.client.get('/api/center/dashboard/')
+        self.assertEqual(response.data['material_breakdown'], {
+            'paper': {'total_kg': 1.0, 'open_kg': 1.0, 'completed_kg': 0.0},
+            'plastic': {'total_kg': 5.0, 'open_kg': 2.0, 'completed_kg': 3.0},
+        })
+
+
+class CenterWeeklyRollupTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.center = User.objects.create_user(
+            'center@example.com', 'password', user_type='recycling_center'
+        )
+        self.other = User.objects.create_user(
+            'other@example.com', 'password', user_type='recycling_center'
+        )
+        self.buyer = User.objects.create_user(
+            'buyer@example.com', 'password', first_name='Alex', last_name='Johnson',
+        )
+        self.monday = week_start(timezone.localdate())
+        self.client.force_authenticate(self.center)
+
+    def schedule(self, status, days=0, center=None):
+        return PickupRequest.objects.create(
+            customer=self.buyer, center=center or self.center, address='1 Green Street', items={},
+            scheduled_date=timezone.now().replace(hour=12) + timedelta(days=days), status=status,
+        )
+
+    def sell(self, material, seller=None, days_ago=0):
+        purchase = MarketplacePurchase.objects.create(
+            buyer=self.buyer, seller=seller or self.center, material=material, quantity_kg=15.5, price='46.50',
+        )
+        MarketplacePurchase.objects.filter(pk=purchase.pk).update(
+            transaction_date=timezone.now() - timedelta(days=days_ago),
+        )
+        return purchase
+
+    def test_dashboard_reads_the_weekly_rollup(self):
+        response = self.client.get('/api/center/dashboard/')
+        self.assertEqual(response.data['performance_data']['satisfaction'], 0)
+        self.assertEqual(response.data['weekly_purchases'], [])
+
+        CenterPerformanceMetrics.objects.create(
+            center=self.center, week_start_date=self.monday, customer_satisfaction=4.2,
+        )
+        CenterPerformanceMetrics.objects.create(
+            center=self.center, week_start_date=self.monday - timedelta(days=7), customer_satisfaction=1,
+        )
+        today = timezone.localdate().weekday()
+        for status in ('completed', 'completed', 'completed', 'pending', 'cancelled'):
+            self.schedule(status, days=-today)
+        self.schedule('completed', days=-today - 7)
+        self.schedule('pending', center=self.other, days=-today)
+        purchase = self.sell('plastic')
+        self.sell('paper', days_ago=today + 1)
+        self.sell('metal', seller=self.other)
+        call_command('rollup_center_weeks', stdout=StringIO())
+
+        self.assertEqual(CenterWeeklyRollup.objects.count(), 2)
+        response = self.client.get('/api/center/dashboard/')
+        self.assertEqual(response.data['performance_data']['satisfaction'], 4.2)
+        self.assertEqual(response.data['performance_data']['efficiency'], 75.0)
+        self.assertEqual(response.data['weekly_purchases'], [{
+            'id': purchase.pk, 'customer': 'Alex Johnson', 'material': 'Plastic', 'quantity': 15.5,
+            'date': timezone.localdate().isoformat(), 'amount': 46.5,
+        }])
+
+    def test_dashboard_shows_the_last_rollup_until_this_weeks_runs(self):
+        CenterWeeklyRollup.objects.create(
+            center=self.center, week_start_date=self.monday - timedelta(days=14), satisfaction=3.0,
+        )
+        CenterWeeklyRollup.objects.create(
+            center=self.center, week_start_date=self.monday - timedelta(days=7), satisfaction=4.5, efficiency=80,
+        )
+        CenterWeeklyRollup.objects.create(center=self.other, week_start_date=self.monday, satisfaction=1.0)
+
+        response = self.client.get('/api/center/dashboard/')
+        self.assertEqual(response.data['performance_data']['satisfaction'], 4.5)
+        self.assertEqual(response.data['performance_data']['efficiency'], 80.0)
+
+        CenterWeeklyRollup.objects.create(center=self.center, week_start_date=self.monday, satisfaction=2.0)
+        response = self.client.get('/api/center/dashboard/')
+        self.assertEqual(response.data['performance_data']['satisfaction'], 2.0)
+
+    def test_rollups_are_recomputed_in_place(self):
+        call_command('rollup_center_weeks', stdout=StringIO())
+        self.sell('glass')
+        call_command('rollup_center_weeks', stdout=StringIO())
+
+        rollup = CenterWeeklyRollup.objects.get(center=self.center)
+        self.assertEqual(rollup.week_start_date, self.monday)
+        self.assertEqual([row['material'] for row in rollup.purchases], ['Glass'])
+        response = self.client.get('/api/center/dashboard/')
+        self.assertEqual(len(response.data['weekly_purchases']), 1)
@@ -6,8 +6,12 @@ app_name = 'recycle_center'
 urlpatterns = [
     path('dashboard/', views.CenterDashboardView.as_view(), name='dashboard'),
     path('pickups/', views.PickupQueueView.as_view(), name='pickups'),
+    path('pickups/batch/', views.PickupBatchActionView.as_view(), name='pickup_batch_action'),
     path('pickups/<int:pk>/', views.PickupQueueView.as_view(), name='pickup_action'),
     path('stats/', views.RecyclingStatsView.as_view(), name='stats'),
+    path('stats/export/', views.RecyclingStatsExportView.as_view(), name='stats_export'),
     path('purchases/', views.MarketplacePurchasesView.as_view(), name='purchases'),
+    path('purchases/export/', views.MarketplacePurchasesExportView.as_view(), name='purchases_export'),
     path('performance/', views.PerformanceMetricsView.as_view(), name='performance'),
+    path('routes/', views.RoutePlanView.as_view(), name='routes'),
 ]
\ No newline at end of file
@@ -1,111 +1,124 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import PickupRequest, RecyclingCenterStats, MarketplacePurchase, CenterPerformanceMetrics
+from .models import PickupRequest, PickupRequestItem, RecyclingCenterStats, MarketplacePurchase, CenterPerformanceMetrics, CenterWeeklyRollup, GeocodedAddress
 from .serializers import (
     CenterDashboardSerializer, 
     PickupRequestSerializer, 
+    PickupBatchActionSerializer,
     RecyclingCenterStatsSerializer, 
     MarketplacePurchaseSerializer, 
     CenterPerformanceMetricsSerializer
 )
-from django.db.models import Sum
+from django.db.models import Count, Q, Sum
 from datetime import datetime, timedelta
 from django.utils import timezone
+from core.concurrent import run_concurrently
+from core.conditional import conditional_dashboard, conditional_list
+from core.materials import breakdown
+from core.pagination import list_response
+from core.streaming import export_queryset
+from .rollup import week_start
+from .routing import DEFAULT_STOPS_PER_RUN, MAX_STOPS_PER_RUN, plan_routes
+
+MATERIAL_FIELDS = ['plastic_kg', 'paper_kg', 'metal_kg', 'glass_kg', 'electronics_kg']
+MAX_DASHBOARD_WEEKS = 104
+
+
+def total_volume(filter=None):
+    """Sum of every material column, optionally restricted by ``filter``."""
+    volume = Sum(MATERIAL_FIELDS[0], filter=filter)
+    for field in MATERIAL_FIELDS[1:]:
+        volume += Sum(field, filter=filter)
+    return volume
+
 
 class CenterDashboardView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        # Get the center (current user)
-        center = request.user
+        try:
+            weeks = int(request.GET.get('weeks', 4))
+        except ValueError:
+            weeks = 4
+        weeks = max(1, min(weeks, MAX_DASHBOARD_WEEKS))
         
-        # Calculate total processed materials
-        total_processed = RecyclingCenterStats.objects.filter(
-            center=center
-        ).aggregate(
-            total=Sum('plastic_kg') + Sum('paper_kg') + Sum('metal_kg') + Sum('glass_kg') + Sum('electronics_kg')
-        )['total'] or 0
+        return conditional_dashboard(
+            request, 'center', request.user.pk,
+            lambda: self.get_dashboard_data(request.user, weeks),
+            shared_scopes=['pickup_requests'],
+            variant=f'weeks={weeks}',
+        )
+    
+    def get_dashboard_data(self, center, weeks):
+        now = timezone.now()
+        today = now.date()
+        first_day_month = today.replace(day=1)
         
-        # Get weekly volume data (last 4 weeks)
-        weekly_volume = []
-        weekly_co2_saved = []
-        today = timezone.now().date()
+        # Weekly series are calendar weeks, the newest first and the current
+        # week included. Stats are one row per center and day, so the window's
+        # days are read in (center, date) index order and summed per week
+        # here rather than grouped by a computed week, which needs a sort
+        this_week = week_start(timezone.localdate())
+        first_week = this_week - timedelta(weeks=weeks - 1)
+        aggregates = {'total': total_volume()}
         
-        for i in range(4):
-            start_date = today - timedelta(weeks=i+1)
-            end_date = today - timedelta(weeks=i)
-            
-            week_stats = RecyclingCenterStats.objects.filter(
-                center=center,
-                date__gte=start_date,
-                date__lt=end_date
-            ).aggregate(
-                volume=Sum('plastic_kg') + Sum('paper_kg') + Sum('metal_kg') + Sum('glass_kg') + Sum('electronics_kg'),
-                co2=Sum('co2_saved_kg')
-            )
-            
-            weekly_volume.append(week_stats['volume'] or 0)
-            weekly_co2_saved.append(week_stats['co2'] or 0)
+        month = Q(date__gte=first_day_month)
+        monthly_fields = {field[:-len('_kg')]: field for field in MATERIAL_FIELDS}
+        monthly_fields['co2_saved'] = 'co2_saved_kg'
+        for key, field in monthly_fields.items():
+            aggregates[f'month_{key}'] = Sum(field, filter=month)
         
-        # Get pending and completed pickups
-        pending_pickups = PickupRequest.objects.filter(
-            status='pending'
-        ).count()
+        results = run_concurrently(
+            stats=lambda: RecyclingCenterStats.objects.filter(center=center).aggregate(**aggregates),
+            weekly=lambda: list(
+                RecyclingCenterStats.objects.filter(
+                    center=center, date__gte=first_week, date__lt=this_week + timedelta(weeks=1),
+                ).order_by().values_list('date', 'co2_saved_kg', *MATERIAL_FIELDS)
+            ),
+            # Get pending and completed pickups
+            pickup_counts=lambda: dict(
+                PickupRequest.objects.visible_to(center).filter(status__in=['pending', 'completed'])
+                .order_by().values_list('status').annotate(count=Count('id'))
+            ),
+            # Material kg of pickups scheduled in the window and the coming week
+            materials=lambda: PickupRequestItem.objects.visible_to(center).filter(
+                scheduled_date__gte=now - timedelta(weeks=weeks),
+                scheduled_date__lt=now + timedelta(weeks=1),
+            ).exclude(request__status='cancelled').totals_by_material(
+                open=Q(request__status__in=['pending', 'approved']),
+                completed=Q(request__status='completed'),
+            ),
+            # This week's rollup, or the latest one until the job first runs
+            # in a new week
+            rollup=lambda: CenterWeeklyRollup.objects.filter(
+                center=center, week_start_date__lte=this_week,
+            ).order_by('-week_start_date').first(),
+        )
+        stats = results['stats']
         
-        completed_pickups = PickupRequest.objects.filter(
-            status='completed'
-            ).count()
+        total_processed = stats['total'] or 0
+        weekly_volume = [0] * weeks
+        weekly_co2_saved = [0] * weeks
+        for day, co2, *materials in results['weekly']:
+            i = (this_week - week_start(day)).days // 7
+            weekly_volume[i] += sum(materials)
+            weekly_co2_saved[i] += co2
+        monthly_stats = {key: stats[f'month_{key}'] or 0 for key in monthly_fields}
         
-        # Monthly stats
-        first_day_month = today.replace(day=1)
-        monthly_stats = RecyclingCenterStats.objects.filter(
-            center=center,
-            date__gte=first_day_month
-        ).aggregate(
-            plastic=Sum('plastic_kg') or 0,
-            paper=Sum('paper_kg') or 0,
-            metal=Sum('metal_kg') or 0,
-            glass=Sum('glass_kg') or 0,
-            electronics=Sum('electronics_kg') or 0,
-            co2_saved=Sum('co2_saved_kg') or 0
-        )
+        pickup_counts = results['pickup_counts']
+        pending_pickups = pickup_counts.get('pending', 0)
+        completed_pickups = pickup_counts.get('completed', 0)
         
-        # Performance data
+        # Satisfaction, efficiency and sales come from the weekly rollup job
+        rollup = results['rollup']
         performance_data = {
             'weeklyVolume': weekly_volume,
             'weeklyCO2': weekly_co2_saved,
-            'satisfaction': 4.5,  # Mock data
-            'efficiency': 92  # Mock data
+            'satisfaction': rollup.satisfaction if rollup else 0,
+            'efficiency': rollup.efficiency if rollup else 0,
         }
-        
-        # Weekly purchases (mock data for now)
-        weekly_purchases = [
-            {
-                'id': 1,
-                'customer': 'Alex Johnson',
-                'material': 'Plastic',
-                'quantity': 15.5,
-                'date': '2023-06-15',
-                'amount': 46.50
-            },
-            {
-                'id': 2,
-                'customer': 'Maria Garcia',
-                'material': 'Paper',
-                'quantity': 22.0,
-                'date': '2023-06-14',
-                'amount': 33.00
-            },
-            {
-                'id': 3,
-                'customer': 'James Wilson',
-                'material': 'Metal',
-                'quantity': 8.2,
-                'date': '2023-06-14',
-                'amount': 41.00
-            }
-        ]
+        weekly_purchases = rollup.purchases if rollup else []
         
         data = {
             'total_processed': total_processed,
@@ -114,12 +127,13 @@ class CenterDashboardView(APIView):
             'pending_pickups': pending_pickups,
             'completed_pickups': completed_pickups,
             'monthly_stats': monthly_stats,
+            'material_breakdown': breakdown(results['materials']),
             'performance_data': performance_data,
             'weekly_purchases': weekly_purchases
         }
         
         serializer = CenterDashboardSerializer(data)
-        return Response(serializer.data)
+        return serializer.data
 
 class PickupQueueView(APIView):
     permission_classes = [IsAuthenticated]
@@ -127,28 +141,78 @@ class PickupQueueView(APIView):
     def get(self, request):
         status = request.GET.get('status', 'all')
         
+        pickups = PickupRequest.objects.visible_to(request.user).select_related('customer')
         if status != 'all':
-            pickups = PickupRequest.objects.filter(status=status)
-        else:
-            pickups = PickupRequest.objects.all()
+            pickups = pickups.filter(status=status)
             
-        serializer = PickupRequestSerializer(pickups, many=True)
-        return Response(serializer.data)
+        return conditional_list(
+            request, pickups, 'updated_at',
+            lambda: list_response(request, pickups, PickupRequestSerializer, view=self),
+        )
     
     def post(self, request, pk):
         action = request.data.get('action')
-        try:
-            pickup = PickupRequest.objects.get(pk=pk)
-            if action == 'approve':
-                pickup.status = 'approved'
-            elif action == 'complete':
-                pickup.status = 'completed'
-            elif action == 'cancel':
-                pickup.status = 'cancelled'
-            pickup.save()
-            return Response({'message': f'Pickup {action}d successfully'})
-        except PickupRequest.DoesNotExist:
+        if action not in PickupRequest.TRANSITIONS:
+            return Response(
+                {'error': f"Unknown action. Use one of: {', '.join(PickupRequest.TRANSITIONS)}."},
+                status=400,
+            )
+        # Clients may send the version they last read to avoid acting on a
+        # pickup someone else has changed since
+        expected_version = request.data.get('version')
+        if expected_version is not None:
+            try:
+                expected_version = int(expected_version)
+            except (TypeError, ValueError):
+                return Response({'error': 'version must be an integer.'}, status=400)
+
+        changed, current = PickupRequest.objects.visible_to(request.user).transition(
+            pk, action, expected_version
+        )
+        if current is None:
             return Response({'error': 'Pickup not found'}, status=404)
+        if not changed:
+            return Response(
+                {
+                    'error': f"Cannot {action} this pickup: it is {current['status']} "
+                             f"(version {current['version']}).",
+                    **current,
+                },
+                status=409,
+            )
+        return Response({'message': f"Pickup {current['status']} successfully", **current})
+
+class PickupBatchActionView(APIView):
+    """Approve, complete or cancel many pickups in one request.
+
+    Rows whose current status does not allow the action are left unchanged
+    and reported under ``skipped``.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = PickupBatchActionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+
+        action = serializer.validated_data['action']
+        updated, skipped, not_found = PickupRequest.objects.visible_to(request.user).bulk_transition(
+            serializer.validated_data['ids'], action
+        )
+        allowed_from = PickupRequest.TRANSITIONS[action][1]
+        return Response({
+            'action': action,
+            'updated': updated,
+            'skipped': [
+                {
+                    'id': pk,
+                    'status': current,
+                    'reason': f"Cannot {action} a pickup that is {current}; allowed from {', '.join(allowed_from)}.",
+                }
+                for pk, current in sorted(skipped.items())
+            ],
+            'not_found': not_found,
+        })
 
 class RecyclingStatsView(APIView):
     permission_classes = [IsAuthenticated]
@@ -170,8 +234,10 @@ class RecyclingStatsView(APIView):
             # Get all stats
             stats = RecyclingCenterStats.objects.all()
             
-        serializer = RecyclingCenterStatsSerializer(stats, many=True)
-        return Response(serializer.data)
+        return conditional_list(
+            request, stats, 'updated_at',
+            lambda: list_response(request, stats, RecyclingCenterStatsSerializer, view=self),
+        )
 
 class MarketplacePurchasesView(APIView):
     permission_classes = [IsAuthenticated]
@@ -180,20 +246,55 @@ class MarketplacePurchasesView(APIView):
         category = request.GET.get('category', 'all')
         search = request.GET.get('search', '')
         
-        purchases = MarketplacePurchase.objects.all()
+        purchases = MarketplacePurchase.objects.select_related('buyer', 'seller').order_by('-transaction_date', '-id')
         
         if category != 'all':
             purchases = purchases.filter(material=category)
             
         if search:
             purchases = purchases.filter(
-                models.Q(buyer__first_name__icontains=search) |
-                models.Q(buyer__last_name__icontains=search) |
-                models.Q(material__icontains=search)
+                Q(buyer__first_name__icontains=search) |
+                Q(buyer__last_name__icontains=search) |
+                Q(material__icontains=search)
             )
             
-        serializer = MarketplacePurchaseSerializer(purchases, many=True)
-        return Response(serializer.data)
+        return conditional_list(
+            request, purchases, 'transaction_date',
+            lambda: list_response(request, purchases, MarketplacePurchaseSerializer, view=self),
+        )
+
+class RecyclingStatsExportView(APIView):
+    """Stream daily center stats as CSV or NDJSON (see ``export_queryset``).
+
+    Centers export their own days, staff every center's.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    COLUMNS = ['id', 'center__email', 'date', *MATERIAL_FIELDS, 'co2_saved_kg']
+    
+    def get(self, request):
+        stats = RecyclingCenterStats.objects.order_by('date', 'id')
+        if request.user.user_type != 'staff':
+            stats = stats.filter(center=request.user)
+        return export_queryset(request, stats, self.COLUMNS, 'center-stats', date_field='date')
+
+class MarketplacePurchasesExportView(APIView):
+    """Stream marketplace purchases as CSV or NDJSON (see
+    ``export_queryset``).
+
+    Users export purchases they bought or sold, staff all of them.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    COLUMNS = ['id', 'transaction_date', 'buyer__email', 'seller__email', 'material', 'quantity_kg', 'price']
+    
+    def get(self, request):
+        purchases = MarketplacePurchase.objects.order_by('transaction_date', 'id')
+        if request.user.user_type != 'staff':
+            purchases = purchases.filter(Q(buyer=request.user) | Q(seller=request.user))
+        return export_queryset(
+            request, purchases, self.COLUMNS, 'marketplace-purchases', date_field='transaction_date',
+        )
 
 class PerformanceMetricsView(APIView):
     permission_classes = [IsAuthenticated]
@@ -211,5 +312,51 @@ class PerformanceMetricsView(APIView):
             # Get all metrics
             metrics = CenterPerformanceMetrics.objects.all()
             
-        serializer = CenterPerformanceMetricsSerializer(metrics, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return conditional_list(
+            request, metrics, 'updated_at',
+            lambda: list_response(request, metrics, CenterPerformanceMetricsSerializer, view=self),
+        )
+class RoutePlanView(APIView):
+    """Vehicle runs for a day's approved pickups.
+
+    ``?date=YYYY-MM-DD`` picks the day (today by default) and
+    ``?stops_per_run=`` caps the stops per vehicle. Plans are cached until
+    a pickup or geocode changes.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        day = timezone.localdate()
+        if 'date' in request.GET:
+            try:
+                day = datetime.strptime(request.GET['date'], '%Y-%m-%d').date()
+            except ValueError:
+                return Response({'error': 'date must be YYYY-MM-DD.'}, status=400)
+        try:
+            stops_per_run = int(request.GET.get('stops_per_run', DEFAULT_STOPS_PER_RUN))
+        except ValueError:
+            stops_per_run = DEFAULT_STOPS_PER_RUN
+        stops_per_run = max(1, min(stops_per_run, MAX_STOPS_PER_RUN))
+
+        return conditional_dashboard(
+            request, 'routes', request.user.pk,
+            lambda: self.get_plan(request.user, day, stops_per_run),
+            shared_scopes=['pickup_requests', 'geocodes'],
+            variant=f'{day.isoformat()}:{stops_per_run}',
+        )
+
+    def get_plan(self, center, day, stops_per_run):
+        start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        pickups = PickupRequest.objects.visible_to(center).filter(
+            status='approved', scheduled_date__gte=start, scheduled_date__lt=start + timedelta(days=1),
+        ).order_by('scheduled_date', 'id').only('id', 'address', 'latitude', 'longitude', 'scheduled_date')
+        if center.latitude is not None and center.longitude is not None:
+            depot = (center.latitude, center.longitude)
+        elif center.address:
+            depot = GeocodedAddress.objects.lookup([center.address]).get(center.address)
+        else:
+            depot = None
+
+        plan = plan_routes(pickups, depot=depot, stops_per_run=stops_per_run)
+        plan['date'] = day
+        return plan
@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from staff.rollup import backfill, run_incremental
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute daily SystemOverview rows. Without arguments only new days and "
+        "days touched by late-arriving rows are processed; --start/--end "
+        "recompute an arbitrary range."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help="First day to backfill (YYYY-MM-DD).")
+        parser.add_argument('--end', type=date.fromisoformat, help="Last day to backfill (YYYY-MM-DD).")
+
+    def handle(self, *args, start=None, end=None, **options):
+        if start is None and end is None:
+            written = run_incremental()
+        else:
+            if start is None or end is None:
+                raise CommandError("--start and --end must be given together.")
+            if start > end:
+                raise CommandError("--start must not be after --end.")
+            written = backfill(start, end)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} overview rows."))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from staff.reports import run_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate queued system reports. Runs until stopped, polling for new "
+        "reports; --once drains the queue and exits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty.")
+        parser.add_argument(
+            '--poll-interval', type=float, default=5.0,
+            help="Seconds to wait between polls when the queue is empty.",
+        )
+
+    def handle(self, *args, once=False, poll_interval=5.0, **options):
+        while True:
+            count = run_pending()
+            if count:
+                self.stdout.write(self.style.SUCCESS(f"Generated {count} reports."))
+            if once:
+                return
+            time.sleep(poll_interval)
@@ -0,0 +1,47 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("staff", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="staffactivitylog",
+            index=models.Index(
+                fields=["-timestamp", "-id"], name="activity_timestamp_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="staffactivitylog",
+            index=models.Index(
+                fields=["action", "-timestamp", "-id"], name="activity_action_ts_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="staffactivitylog",
+            index=models.Index(
+                fields=["staff_member", "-timestamp", "-id"],
+                name="activity_member_ts_id_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="systemreport",
+            index=models.Index(
+                fields=["-generated_at", "-id"], name="report_generated_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="systemreport",
+            index=models.Index(
+                fields=["report_type", "-generated_at", "-id"],
+                name="report_type_generated_id_idx",
+            ),
+        ),
+    ]
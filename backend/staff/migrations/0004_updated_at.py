@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("staff", "0003_rollupcheckpoint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="staffnotification",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="systemoverview",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
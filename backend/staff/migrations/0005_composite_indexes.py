@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("staff", "0004_updated_at"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="staffnotification",
+            index=models.Index(
+                fields=["staff_member", "is_read", "-created_at"],
+                name="notification_member_read_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="staffnotification",
+            index=models.Index(
+                fields=["staff_member", "-created_at"], name="notification_member_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="systemoverview",
+            index=models.Index(fields=["updated_at"], name="overview_updated_idx"),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("staff", "0005_composite_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="systemreport",
+            name="error",
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name="systemreport",
+            name="finished_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="systemreport",
+            name="processed_until",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="systemreport",
+            name="started_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        # Reports stored before generation moved server-side are complete
+        migrations.AddField(
+            model_name="systemreport",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("queued", "Queued"),
+                    ("running", "Running"),
+                    ("done", "Done"),
+                    ("failed", "Failed"),
+                ],
+                default="done",
+                max_length=20,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="systemreport",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("queued", "Queued"),
+                    ("running", "Running"),
+                    ("done", "Done"),
+                    ("failed", "Failed"),
+                ],
+                default="queued",
+                max_length=20,
+            ),
+        ),
+        migrations.AddField(
+            model_name="systemreport",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name="systemreport",
+            name="data",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddIndex(
+            model_name="systemreport",
+            index=models.Index(
+                fields=["status", "updated_at"], name="report_status_updated_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("staff", "0006_report_jobs"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RollupDirtyDay",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50)),
+                ("date", models.DateField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["name", "date"], name="rollupdirty_name_date_idx"
+                    )
+                ],
+            },
+        ),
+    ]
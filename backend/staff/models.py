@@ -11,13 +11,41 @@ class SystemOverview(models.Model):
     active_challenges = models.IntegerField(default=0)
     completed_challenges = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['updated_at'], name='overview_updated_idx'),
+        ]
     
     def __str__(self):
         return f"System Overview for {self.date}"
 
+class RollupCheckpoint(models.Model):
+    """High-water mark of source rows already folded into a rollup."""
+    name = models.CharField(max_length=50, unique=True)
+    high_water_mark = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} processed up to {self.high_water_mark}"
+
+class RollupDirtyDay(models.Model):
+    """A day a rollup must recompute because rows counted in it were
+    deleted, which leaves no ``updated_at`` behind to find them by."""
+    name = models.CharField(max_length=50)
+    date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', 'date'], name='rollupdirty_name_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} dirty on {self.date}"
+
 class StaffActivityLog(models.Model):
     ACTION_CHOICES = [
         ('user_management', 'User Management'),
@@ -34,6 +62,11 @@ class StaffActivityLog(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['-timestamp', '-id'], name='activity_timestamp_id_idx'),
+            models.Index(fields=['action', '-timestamp', '-id'], name='activity_action_ts_id_idx'),
+            models.Index(fields=['staff_member', '-timestamp', '-id'], name='activity_member_ts_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.staff_member.email} - {self.action} at {self.timestamp}"
@@ -45,16 +78,35 @@ class SystemReport(models.Model):
         ('user', 'User Activity'),
         ('financial', 'Financial Summary'),
     ]
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
     
     generated_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     report_type = models.CharField(max_length=20, choices=REPORT_TYPES)
     start_date = models.DateField()
     end_date = models.DateField()
-    data = models.JSONField()
+    data = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    # Last day folded into ``data``; generation resumes after it
+    processed_until = models.DateField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
     generated_at = models.DateTimeField(auto_now_add=True)
+    # Doubles as the heartbeat of a running generation
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-generated_at']
+        indexes = [
+            models.Index(fields=['-generated_at', '-id'], name='report_generated_id_idx'),
+            models.Index(fields=['report_type', '-generated_at', '-id'], name='report_type_generated_id_idx'),
+            models.Index(fields=['status', 'updated_at'], name='report_status_updated_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_report_type_display()} Report ({self.start_date} to {self.end_date})"
@@ -65,9 +117,14 @@ class StaffNotification(models.Model):
     message = models.TextField()
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['staff_member', 'is_read', '-created_at'], name='notification_member_read_idx'),
+            models.Index(fields=['staff_member', '-created_at'], name='notification_member_idx'),
+        ]
     
     def __str__(self):
         return f"Notification for {self.staff_member.email}: {self.title}"
\ No newline at end of file
@@ -0,0 +1,294 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from core.dashboard_cache import invalidate
+from individual.models import MarketplaceItem, Pickup, RecyclingHistory
+from recycle_center.models import MarketplacePurchase, PickupRequest, RecyclingCenterStats
+from users.models import User
+from .models import SystemReport
+from .rollup import day_start
+
+logger = logging.getLogger(__name__)
+
+# Reports are generated outside the request that asks for them. The request
+# stores a queued SystemReport; a worker claims it and folds the range into
+# ``data`` one calendar month at a time. Every builder returns additive
+# totals, so chunk results are merged by summing them.
+#
+# After each month the running totals and ``processed_until`` are saved,
+# which doubles as the worker's heartbeat. A report whose heartbeat is older
+# than REPORT_STALE_AFTER seconds is claimed again and resumed after the
+# last saved month. Claims are compare-and-set updates that stamp
+# ``started_at``, so a worker that lost its claim stops at its next save.
+
+MATERIALS = [material for material, _ in MarketplacePurchase.MATERIAL_CHOICES]
+
+
+def _stale_after():
+    return getattr(settings, 'REPORT_STALE_AFTER', 300)
+
+
+def _background_threads():
+    return getattr(settings, 'REPORT_BACKGROUND_THREADS', 1)
+
+
+def _within(field, start, end):
+    return Q(**{f'{field}__gte': day_start(start), f'{field}__lt': day_start(end + timedelta(days=1))})
+
+
+def _counts(queryset, field):
+    return dict(queryset.order_by().values_list(field).annotate(n=Count('id')))
+
+
+def usage_report(start, end):
+    pickups = _counts(Pickup.objects.filter(_within('created_at', start, end)), 'status')
+    requests = _counts(PickupRequest.objects.filter(_within('created_at', start, end)), 'status')
+    return {
+        'pickups': pickups,
+        'pickup_requests': requests,
+        'marketplace_listings': MarketplaceItem.objects.filter(_within('created_at', start, end)).count(),
+        'marketplace_purchases': MarketplacePurchase.objects.filter(
+            _within('transaction_date', start, end)
+        ).count(),
+        'monthly': {
+            start.strftime('%Y-%m'): {
+                'pickups': sum(pickups.values()),
+                'pickup_requests': sum(requests.values()),
+            },
+        },
+    }
+
+
+def recycling_report(start, end):
+    rows = (
+        RecyclingHistory.objects.filter(_within('date', start, end))
+        .order_by().values('material_type')
+        .annotate(kg=Sum('weight_kg'), co2=Sum('co2_saved_kg'))
+    )
+    by_material = {
+        row['material_type']: {'kg': float(row['kg'] or 0), 'co2_saved_kg': float(row['co2'] or 0)}
+        for row in rows
+    }
+    processed = RecyclingCenterStats.objects.filter(date__gte=start, date__lte=end).aggregate(
+        co2_saved_kg=Sum('co2_saved_kg'),
+        **{material: Sum(f'{material}_kg') for material in MATERIALS},
+    )
+    total_kg = sum(values['kg'] for values in by_material.values())
+    total_co2 = sum(values['co2_saved_kg'] for values in by_material.values())
+    return {
+        'total_kg': total_kg,
+        'co2_saved_kg': total_co2,
+        'by_material': by_material,
+        'center_processed_kg': {
+            material: float(value or 0) for material, value in processed.items()
+            if material != 'co2_saved_kg'
+        },
+        'center_co2_saved_kg': float(processed['co2_saved_kg'] or 0),
+        'monthly': {start.strftime('%Y-%m'): {'kg': total_kg, 'co2_saved_kg': total_co2}},
+    }
+
+
+def user_report(start, end):
+    new_users = _counts(User.objects.filter(_within('date_joined', start, end)), 'user_type')
+    # Monthly active users are distinct within a month, which is why chunks
+    # never span two months
+    active = set()
+    for queryset, user_field, date_field in (
+        (Pickup.objects, 'user_id', 'created_at'),
+        (RecyclingHistory.objects, 'user_id', 'date'),
+        (PickupRequest.objects, 'customer_id', 'created_at'),
+        (MarketplacePurchase.objects, 'buyer_id', 'transaction_date'),
+    ):
+        active.update(
+            queryset.filter(_within(date_field, start, end))
+            .order_by().values_list(user_field, flat=True).distinct()
+        )
+    return {
+        'new_users': new_users,
+        'monthly': {
+            start.strftime('%Y-%m'): {'new_users': sum(new_users.values()), 'active_users': len(active)},
+        },
+    }
+
+
+def financial_report(start, end):
+    rows = (
+        MarketplacePurchase.objects.filter(_within('transaction_date', start, end))
+        .order_by().values('material')
+        .annotate(n=Count('id'), revenue=Sum('price'), kg=Sum('quantity_kg'))
+    )
+    by_material = {
+        row['material']: {'purchases': row['n'], 'revenue': float(row['revenue'] or 0), 'kg': float(row['kg'] or 0)}
+        for row in rows
+    }
+    listings = (
+        MarketplaceItem.objects.filter(_within('created_at', start, end))
+        .order_by().values('category')
+        .annotate(n=Count('id'), value=Sum('price'))
+    )
+    purchases = sum(values['purchases'] for values in by_material.values())
+    revenue = sum(values['revenue'] for values in by_material.values())
+    return {
+        'purchases': purchases,
+        'revenue': revenue,
+        'quantity_kg': sum(values['kg'] for values in by_material.values()),
+        'by_material': by_material,
+        'listings_by_category': {
+            row['category']: {'listings': row['n'], 'listed_value': float(row['value'] or 0)}
+            for row in listings
+        },
+        'monthly': {start.strftime('%Y-%m'): {'purchases': purchases, 'revenue': revenue}},
+    }
+
+
+REPORT_BUILDERS = {
+    'usage': usage_report,
+    'recycling': recycling_report,
+    'user': user_report,
+    'financial': financial_report,
+}
+
+
+def month_chunks(start, end):
+    """``(first, last)`` day pairs covering ``start``..``end``, split at
+    month boundaries."""
+    chunk_start = start
+    while chunk_start <= end:
+        next_month = (chunk_start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        chunk_end = min(end, next_month - timedelta(days=1))
+        yield chunk_start, chunk_end
+        chunk_start = chunk_end + timedelta(days=1)
+
+
+def merge(total, part):
+    for key, value in part.items():
+        if isinstance(value, dict):
+            merge(total.setdefault(key, {}), value)
+        else:
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+def finish(data):
+    return {
+        key: finish(value) if isinstance(value, dict) else round(value, 2) if isinstance(value, float) else value
+        for key, value in data.items()
+    }
+
+
+def flatten(value, path=''):
+    """``(dotted path, value)`` pairs for every leaf of report data."""
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = enumerate(value)
+    else:
+        yield path, value
+        return
+    for key, item in items:
+        yield from flatten(item, f'{path}.{key}' if path else str(key))
+
+
+def claim(report_id=None):
+    """Mark the oldest queued (or abandoned) report as running and return
+    it, or None when there is nothing to do."""
+    stale = timezone.now() - timedelta(seconds=_stale_after())
+    candidates = SystemReport.objects.filter(
+        Q(status='queued') | Q(status='running', updated_at__lt=stale)
+    )
+    if report_id is not None:
+        candidates = candidates.filter(pk=report_id)
+    for pk, status, updated_at in candidates.order_by('updated_at', 'pk').values_list('pk', 'status', 'updated_at')[:10]:
+        now = timezone.now()
+        claimed = SystemReport.objects.filter(pk=pk, status=status, updated_at=updated_at).update(
+            status='running', started_at=now, updated_at=now,
+        )
+        if claimed:
+            invalidate('staff_activity')
+            return SystemReport.objects.get(pk=pk)
+    return None
+
+
+def _save(report, **fields):
+    """Write ``fields`` while ``report`` is still this worker's claim."""
+    return bool(
+        SystemReport.objects.filter(pk=report.pk, status='running', started_at=report.started_at)
+        .update(updated_at=timezone.now(), **fields)
+    )
+
+
+def generate(report):
+    """Fold the rest of a claimed report's range into its data, month by
+    month. Returns False if the claim was lost to another worker."""
+    builder = REPORT_BUILDERS[report.report_type]
+    if report.processed_until is None:
+        data, start = {}, report.start_date
+    else:
+        data, start = report.data, report.processed_until + timedelta(days=1)
+
+    try:
+        for chunk_start, chunk_end in month_chunks(start, report.end_date):
+            merge(data, builder(chunk_start, chunk_end))
+            if not _save(report, data=data, processed_until=chunk_end):
+                return False
+    except Exception as exc:
+        logger.exception("Report %s failed", report.pk)
+        _save(report, status='failed', error=str(exc), finished_at=timezone.now())
+        invalidate('staff_activity')
+        return True
+
+    finished = _save(report, status='done', data=finish(data), error='', finished_at=timezone.now())
+    invalidate('staff_activity')
+    return finished
+
+
+def run_report(report_id=None):
+    """Claim and generate one report; returns it, or None if none was claimed."""
+    report = claim(report_id)
+    if report is not None:
+        generate(report)
+    return report
+
+
+def run_pending():
+    """Generate reports until the queue is empty; returns how many ran."""
+    count = 0
+    while run_report() is not None:
+        count += 1
+    return count
+
+
+_lock = threading.Lock()
+_pool = {'executor': None}
+
+
+def _run_in_background(report_id):
+    close_old_connections()
+    try:
+        run_report(report_id)
+    except Exception:
+        logger.exception("Background report %s failed", report_id)
+    finally:
+        close_old_connections()
+
+
+def enqueue(report):
+    """Start generating a queued report in this process's background
+    threads once the transaction commits. Without background threads the
+    run_report_worker command picks it up."""
+    if _background_threads() <= 0:
+        return
+    with _lock:
+        if _pool['executor'] is None:
+            _pool['executor'] = ThreadPoolExecutor(
+                max_workers=_background_threads(), thread_name_prefix='report',
+            )
+        executor = _pool['executor']
+    transaction.on_commit(lambda: executor.submit(_run_in_background, report.pk))
@@ -0,0 +1,203 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.dashboard_cache import invalidate
+from individual.models import Challenge, Pickup, RecyclingHistory
+from recycle_center.models import PickupRequest
+from users.models import User
+from .models import RollupCheckpoint, RollupDirtyDay, SystemOverview
+
+CHECKPOINT_NAME = 'system_overview'
+
+# Rows committed while a run is in progress can carry timestamps just below
+# the new high-water mark, so each run re-reads a short window behind it.
+LATE_ARRIVAL_OVERLAP = timedelta(minutes=5)
+
+OVERVIEW_FIELDS = [
+    'total_users', 'total_pickups', 'total_recycled_kg', 'co2_saved_kg',
+    'active_challenges', 'completed_challenges',
+]
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_default_timezone())
+
+
+def _daily(queryset, date_field, **aggregates):
+    """``{date: {name: value}}`` for rows grouped by the day of ``date_field``."""
+    rows = (
+        queryset.order_by()
+        .annotate(day=TruncDate(date_field))
+        .values('day')
+        .annotate(**aggregates)
+    )
+    return {row.pop('day'): row for row in rows}
+
+
+def compute_overviews(start, end):
+    """Compute each day's overview for ``start``..``end`` (inclusive).
+
+    Totals are cumulative as of the end of each day. Every source table is
+    read with one aggregate for the days before ``start`` and one grouped
+    query for the range, independent of how many days are computed.
+    """
+    range_start, range_end = day_start(start), day_start(end + timedelta(days=1))
+
+    def before(field):
+        return Q(**{f'{field}__lt': range_start})
+
+    def within(field):
+        return Q(**{f'{field}__gte': range_start, f'{field}__lt': range_end})
+
+    pickups = Pickup.objects.exclude(status='cancelled')
+    requests = PickupRequest.objects.exclude(status='cancelled')
+    completed = Challenge.objects.filter(progress__gte=F('target'))
+    open_challenges = Challenge.objects.filter(progress__lt=F('target'))
+
+    totals = {
+        'total_users': User.objects.filter(before('date_joined')).count(),
+        'total_pickups': (
+            pickups.filter(before('created_at')).count()
+            + requests.filter(before('created_at')).count()
+        ),
+        'completed_challenges': completed.filter(before('end_date')).count(),
+        # Challenges that started before the range and were still running
+        'active_challenges': open_challenges.filter(
+            before('start_date'), end_date__gte=range_start
+        ).count(),
+    }
+    recycled = RecyclingHistory.objects.filter(before('date')).aggregate(
+        kg=Sum('weight_kg'), co2=Sum('co2_saved_kg')
+    )
+    totals['total_recycled_kg'] = float(recycled['kg'] or 0)
+    totals['co2_saved_kg'] = float(recycled['co2'] or 0)
+
+    deltas = defaultdict(lambda: defaultdict(float))
+    for day, row in _daily(User.objects.filter(within('date_joined')), 'date_joined', n=Count('id')).items():
+        deltas[day]['total_users'] += row['n']
+    for queryset in (pickups, requests):
+        for day, row in _daily(queryset.filter(within('created_at')), 'created_at', n=Count('id')).items():
+            deltas[day]['total_pickups'] += row['n']
+    for day, row in _daily(
+        RecyclingHistory.objects.filter(within('date')), 'date',
+        kg=Sum('weight_kg'), co2=Sum('co2_saved_kg'),
+    ).items():
+        deltas[day]['total_recycled_kg'] += float(row['kg'] or 0)
+        deltas[day]['co2_saved_kg'] += float(row['co2'] or 0)
+    for day, row in _daily(completed.filter(within('end_date')), 'end_date', n=Count('id')).items():
+        deltas[day]['completed_challenges'] += row['n']
+    for day, row in _daily(open_challenges.filter(within('start_date')), 'start_date', n=Count('id')).items():
+        deltas[day]['active_challenges'] += row['n']
+    # A challenge stops being active the day after it ends
+    for day, row in _daily(
+        open_challenges.filter(within('end_date'), start_date__lt=range_end), 'end_date', n=Count('id'),
+    ).items():
+        deltas[day + timedelta(days=1)]['active_challenges'] -= row['n']
+
+    overviews = {}
+    day = start
+    while day <= end:
+        for field, value in deltas.get(day, {}).items():
+            totals[field] += value
+        overviews[day] = dict(totals)
+        day += timedelta(days=1)
+    return overviews
+
+
+def store_overviews(overviews):
+    rows = [
+        SystemOverview(
+            date=day,
+            total_users=int(values['total_users']),
+            total_pickups=int(values['total_pickups']),
+            total_recycled_kg=values['total_recycled_kg'],
+            co2_saved_kg=values['co2_saved_kg'],
+            active_challenges=int(values['active_challenges']),
+            completed_challenges=int(values['completed_challenges']),
+        )
+        for day, values in overviews.items()
+    ]
+    SystemOverview.objects.bulk_create(
+        rows, batch_size=500, update_conflicts=True,
+        unique_fields=['date'], update_fields=[*OVERVIEW_FIELDS, 'updated_at'],
+    )
+    # bulk_create skips the post_save handlers that retire cached dashboards
+    invalidate('staff_activity')
+    return len(rows)
+
+
+def backfill(start, end):
+    """Recompute and store every overview in ``start``..``end``."""
+    with transaction.atomic():
+        return store_overviews(compute_overviews(start, end))
+
+
+def _earliest_change(since):
+    """Earliest day whose overview is affected by rows written after ``since``
+    (every day with data when ``since`` is None)."""
+    def changed(queryset, stamp_field, day_field):
+        if since is not None:
+            queryset = queryset.filter(**{f'{stamp_field}__gt': since})
+        return queryset.aggregate(first=Min(day_field))['first']
+
+    candidates = [
+        changed(User.objects.all(), 'date_joined', 'date_joined'),
+        changed(Pickup.objects.all(), 'updated_at', 'created_at'),
+        changed(PickupRequest.objects.all(), 'updated_at', 'created_at'),
+        changed(RecyclingHistory.objects.all(), 'updated_at', 'date'),
+        # Progress updates move challenges between active and completed
+        changed(Challenge.objects.all(), 'updated_at', 'start_date'),
+    ]
+    candidates = [timezone.localdate(value) for value in candidates if value is not None]
+    return min(candidates) if candidates else None
+
+
+def mark_deleted(day_value):
+    """Record that a row counted on ``day_value``'s day was deleted."""
+    RollupDirtyDay.objects.create(name=CHECKPOINT_NAME, date=timezone.localdate(day_value))
+
+
+def run_incremental(today=None):
+    """Bring overviews up to date using the stored high-water mark.
+
+    Days after the last stored overview are always computed, and earlier
+    days are recomputed only when rows written since the previous run, or
+    rows deleted since then, fall into them. Returns the number of overview
+    rows written.
+    """
+    today = today or timezone.localdate()
+    started_at = timezone.now()
+
+    with transaction.atomic():
+        checkpoint, _ = RollupCheckpoint.objects.select_for_update().get_or_create(name=CHECKPOINT_NAME)
+        since = checkpoint.high_water_mark
+        if since is not None:
+            since -= LATE_ARRIVAL_OVERLAP
+
+        dirty = RollupDirtyDay.objects.filter(name=CHECKPOINT_NAME).aggregate(
+            first=Min('date'), last_id=Max('pk'),
+        )
+        starts = [_earliest_change(since), dirty['first']]
+        latest = SystemOverview.objects.order_by('-date').values_list('date', flat=True).first()
+        if latest is not None:
+            # Today's totals are still moving, so its row is always refreshed
+            starts.append(min(latest + timedelta(days=1), today))
+        starts = [day for day in starts if day is not None]
+
+        written = 0
+        if starts:
+            start = min(starts)
+            if start <= today:
+                written = store_overviews(compute_overviews(start, today))
+
+        checkpoint.high_water_mark = started_at
+        checkpoint.save(update_fields=['high_water_mark', 'updated_at'])
+        if dirty['last_id'] is not None:
+            # Days marked during this run are kept for the next one
+            RollupDirtyDay.objects.filter(name=CHECKPOINT_NAME, pk__lte=dirty['last_id']).delete()
+    return written
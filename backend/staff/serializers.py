@@ -22,10 +22,20 @@ class SystemReportSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = SystemReport
-        fields = ['id', 'generated_by', 'generated_by_name', 'report_type', 'start_date', 'end_date', 'data', 'generated_at']
+        fields = [
+            'id', 'generated_by', 'generated_by_name', 'report_type', 'start_date', 'end_date', 'data',
+            'status', 'processed_until', 'error', 'started_at', 'finished_at', 'generated_at',
+        ]
+        # Filled in by the report worker
+        read_only_fields = ['data', 'status', 'processed_until', 'error', 'started_at', 'finished_at']
     
     def get_generated_by_name(self, obj):
         return f"{obj.generated_by.first_name} {obj.generated_by.last_name}"
+    
+    def validate(self, attrs):
+        if attrs['start_date'] > attrs['end_date']:
+            raise serializers.ValidationError({'end_date': "Must not be before start_date."})
+        return attrs
 
 class StaffNotificationSerializer(serializers.ModelSerializer):
     class Meta:
@@ -39,6 +49,7 @@ class StaffDashboardSerializer(serializers.Serializer):
     co2_saved_kg = serializers.FloatField()
     active_challenges = serializers.IntegerField()
     completed_challenges = serializers.IntegerField()
+    material_breakdown = serializers.DictField()
     recent_activity = serializers.ListField(child=StaffActivityLogSerializer())
     recent_reports = serializers.ListField(child=SystemReportSerializer())
     notifications = serializers.ListField(child=StaffNotificationSerializer())
\ No newline at end of file
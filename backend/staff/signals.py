@@ -0,0 +1,48 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.dashboard_cache import invalidate
+from individual.models import Challenge, Pickup, RecyclingHistory
+from recycle_center.models import PickupRequest
+from users.models import User
+from .models import StaffActivityLog, StaffNotification, SystemOverview, SystemReport
+from .rollup import mark_deleted
+
+
+@receiver(post_save, sender=StaffNotification)
+@receiver(post_delete, sender=StaffNotification)
+def invalidate_staff_dashboard(sender, instance, **kwargs):
+    invalidate('staff', instance.staff_member_id)
+
+
+@receiver(post_save, sender=StaffActivityLog)
+@receiver(post_save, sender=SystemReport)
+@receiver(post_save, sender=SystemOverview)
+@receiver(post_delete, sender=StaffActivityLog)
+@receiver(post_delete, sender=SystemReport)
+@receiver(post_delete, sender=SystemOverview)
+def invalidate_shared_staff_dashboard(sender, instance, **kwargs):
+    invalidate('staff_activity')
+
+
+# Deleted rows leave nothing for the next rollup run to find, so the
+# earliest day their overviews counted them on is recorded instead
+@receiver(post_delete, sender=User)
+def mark_user_day(sender, instance, **kwargs):
+    mark_deleted(instance.date_joined)
+
+
+@receiver(post_delete, sender=Pickup)
+@receiver(post_delete, sender=PickupRequest)
+def mark_pickup_day(sender, instance, **kwargs):
+    mark_deleted(instance.created_at)
+
+
+@receiver(post_delete, sender=RecyclingHistory)
+def mark_recycling_day(sender, instance, **kwargs):
+    mark_deleted(instance.date)
+
+
+@receiver(post_delete, sender=Challenge)
+def mark_challenge_day(sender, instance, **kwargs):
+    mark_deleted(instance.start_date)
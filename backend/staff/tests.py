@@ -1,3 +1,575 @@
-from django.test import TestCase
+import base64
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+import json
+import threading
+import time
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from core.dashboard_cache import cached_dashboard, invalidate
+from core.testing import QueryBudgetMixin, QueryPlanMixin
+from individual.models import Challenge, Pickup, RecyclingHistory
+from recycle_center.models import PickupRequest
+from users.models import User
+from .models import RollupCheckpoint, RollupDirtyDay, StaffActivityLog, StaffNotification, SystemOverview, SystemReport
+from .reports import claim, generate, run_pending
+from .rollup import day_start, run_incremental
+
+
+class StaffListQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user('staff@example.com', 'password', user_type='staff')
+        self.client.force_authenticate(self.staff)
+
+    def create_member(self, name):
+        return User.objects.create_user(f'{name}@example.com', 'password', user_type='staff')
+
+    def seed_logs(self, size):
+        for i in range(size):
+            StaffActivityLog.objects.create(
+                staff_member=self.create_member(f'logger{i}'), action='user_management',
+                description='Reviewed account',
+            )
+
+    def seed_reports(self, size):
+        for i in range(size):
+            SystemReport.objects.create(
+                generated_by=self.create_member(f'reporter{i}'), report_type='usage',
+                start_date=date(2025, 1, 1), end_date=date(2025, 1, 31), data={},
+            )
+
+    def test_activity_log_uses_constant_queries(self):
+        self.assertQueryBudget(
+            '/api/staff/activity/', self.seed_logs, max_queries=2, data={'per_page': 100},
+        )
+
+    def test_activity_export_uses_constant_queries(self):
+        self.assertQueryBudget('/api/staff/activity/export/', self.seed_logs, max_queries=1)
+
+    def test_activity_log_cursor_page_uses_constant_queries(self):
+        self.assertQueryBudget(
+            '/api/staff/activity/', self.seed_logs, max_queries=2, data={'cursor': '', 'per_page': 100},
+        )
+
+    def test_reports_use_constant_queries(self):
+        self.assertQueryBudget(
+            '/api/staff/reports/', self.seed_reports, max_queries=2, data={'per_page': 100},
+        )
+
+    def test_dashboard_uses_constant_queries(self):
+        def seed(size):
+            self.seed_logs(size)
+            self.seed_reports(size)
+
+        self.assertQueryBudget('/api/staff/dashboard/', seed, max_queries=6)
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user('staff@example.com', 'password', user_type='staff')
+        self.client.force_authenticate(self.staff)
+        # Seven rows over four timestamps, so most pages end inside a tie
+        moment = timezone.now()
+        for minutes in (0, 0, 0, 1, 1, 2, 3):
+            log = StaffActivityLog.objects.create(
+                staff_member=self.staff, action='user_management', description='Reviewed account',
+            )
+            StaffActivityLog.objects.filter(pk=log.pk).update(timestamp=moment - timedelta(minutes=minutes))
+        self.expected = list(
+            StaffActivityLog.objects.order_by('-timestamp', '-id').values_list('id', flat=True)
+        )
+
+    def page(self, cursor='', url='/api/staff/activity/', per_page=3):
+        response = self.client.get(url, {'cursor': cursor, 'per_page': per_page})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_next_and_previous_cursors_round_trip(self):
+        pages = [self.page()]
+        while pages[-1]['next']:
+            pages.append(self.page(pages[-1]['next']))
+        self.assertEqual([len(page['results']) for page in pages], [3, 3, 1])
+        self.assertEqual([row['id'] for page in pages for row in page['results']], self.expected)
+        self.assertIsNone(pages[0]['previous'])
+
+        # Walking back from the last page returns the same pages
+        page = pages[-1]
+        for earlier in reversed(pages[:-1]):
+            page = self.page(page['previous'])
+            self.assertEqual(page['results'], earlier['results'])
+        self.assertIsNone(page['previous'])
+        self.assertEqual(page['next'], pages[0]['next'])
+
+    def test_rows_written_while_paging_do_not_shift_later_pages(self):
+        first = self.page()
+        StaffActivityLog.objects.create(
+            staff_member=self.staff, action='system_maintenance', description='Restarted workers',
+        )
+        second = self.page(first['next'])
+        self.assertEqual([row['id'] for row in second['results']], self.expected[3:6])
+
+    def test_reports_page_by_generation_time(self):
+        for _ in range(3):
+            SystemReport.objects.create(
+                generated_by=self.staff, report_type='usage', start_date=date(2025, 1, 1), end_date=date(2025, 1, 31),
+            )
+        SystemReport.objects.update(generated_at=timezone.now())
+        expected = list(SystemReport.objects.order_by('-generated_at', '-id').values_list('id', flat=True))
+
+        first = self.page(url='/api/staff/reports/', per_page=2)
+        second = self.page(first['next'], url='/api/staff/reports/', per_page=2)
+        self.assertEqual([row['id'] for row in first['results'] + second['results']], expected)
+        self.assertIsNone(second['next'])
+        self.assertEqual(self.page(second['previous'], url='/api/staff/reports/', per_page=2), first)
+
+    def test_reports_are_searched_by_type_and_author(self):
+        analyst = User.objects.create_user('analyst@example.com', 'password', user_type='staff')
+        usage, impact, audit = [
+            SystemReport.objects.create(
+                generated_by=author, report_type=report_type, start_date=date(2025, 1, 1), end_date=date(2025, 1, 31),
+            )
+            for author, report_type in ((self.staff, 'usage'), (self.staff, 'recycling'), (analyst, 'user'))
+        ]
+
+        def search(term):
+            response = self.client.get('/api/staff/reports/', {'search': term})
+            self.assertEqual(response.status_code, 200)
+            return sorted(row['id'] for row in response.data)
+
+        self.assertEqual(search('impact'), [impact.pk])
+        self.assertEqual(search('USAGE'), [usage.pk])
+        self.assertEqual(search('analyst@'), [audit.pk])
+        self.assertEqual(search('nothing like it'), [])
+
+    def test_invalid_cursors_are_rejected(self):
+        def encode(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        valid = self.page()['next']
+        for cursor in (
+            'not-a-cursor',
+            valid[:-4],
+            encode({'v': timezone.now().isoformat(), 'id': 1, 'd': 'sideways'}),
+            encode({'v': 'yesterday', 'id': 1, 'd': 'next'}),
+            encode({'v': None, 'id': 1, 'd': 'next'}),
+            encode({'v': timezone.now().isoformat(), 'd': 'next'}),
+            encode(['next']),
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/staff/activity/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data, {'cursor': 'Invalid cursor.'})
+
+
+class DashboardCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return {'calls': self.calls}
+
+    def test_writes_retire_cached_dashboards(self):
+        self.assertEqual(cached_dashboard('individual', 1, self.compute, shared_scopes=['rewards']), {'calls': 1})
+        self.assertEqual(cached_dashboard('individual', 1, self.compute, shared_scopes=['rewards']), {'calls': 1})
+
+        invalidate('individual', 2)
+        self.assertEqual(cached_dashboard('individual', 1, self.compute, shared_scopes=['rewards']), {'calls': 1})
+        invalidate('individual', 1)
+        self.assertEqual(cached_dashboard('individual', 1, self.compute, shared_scopes=['rewards']), {'calls': 2})
+        invalidate('rewards')
+        self.assertEqual(cached_dashboard('individual', 1, self.compute, shared_scopes=['rewards']), {'calls': 3})
+
+    def test_invalidation_inside_a_transaction_is_repeated_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate('individual', 1)
+            # A response computed from pre-commit data in between
+            cached_dashboard('individual', 1, self.compute)
+        self.assertEqual(cached_dashboard('individual', 1, self.compute), {'calls': 2})
+
+    def test_concurrent_misses_compute_once(self):
+        def slow_compute():
+            time.sleep(0.2)
+            return self.compute()
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cached_dashboard('center', 1, slow_compute)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [{'calls': 1}] * 4)
+        self.assertEqual(self.calls, 1)
+
+        staff = User.objects.create_user('staff@example.com', 'password', user_type='staff')
+        self.client.force_authenticate(staff)
+        response = self.client.get('/api/staff/cache-stats/')
+        self.assertEqual(response.data, {'hits': 0, 'misses': 1, 'coalesced': 3})
+
+    def test_hits_and_misses_are_counted_for_staff_only(self):
+        cached_dashboard('staff', 1, self.compute)
+        cached_dashboard('staff', 1, self.compute)
+        cached_dashboard('staff', 2, self.compute)
+
+        self.client.force_authenticate(User.objects.create_user('user@example.com', 'password'))
+        self.assertEqual(self.client.get('/api/staff/cache-stats/').status_code, 403)
+        self.client.force_authenticate(User.objects.create_user('staff@example.com', 'password', user_type='staff'))
+        response = self.client.get('/api/staff/cache-stats/')
+        self.assertEqual(response.data, {'hits': 1, 'misses': 2, 'coalesced': 0})
+
+
+class ConditionalNotificationTests(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user('staff@example.com', 'password', user_type='staff')
+        self.client.force_authenticate(self.staff)
+        self.notification = StaffNotification.objects.create(
+            staff_member=self.staff, title='Queue', message='Pickups waiting',
+        )
+
+    def test_unchanged_list_returns_not_modified(self):
+        response = self.client.get('/api/staff/notifications/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(
+            '/api/staff/notifications/', HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_marking_read_changes_etag(self):
+        etag = self.client.get('/api/staff/notifications/')['ETag']
+        self.client.patch(f'/api/staff/notifications/{self.notification.pk}/')
+
+        response = self.client.get('/api/staff/notifications/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data[0]['is_read'])
+
+
+    def test_cursor_pages_are_validated_from_their_own_rows(self):
+        for _ in range(3):
+            StaffActivityLog.objects.create(staff_member=self.staff, action='user_management', description='Reviewed')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/staff/activity/', {'cursor': '', 'per_page': 2})
+        self.assertNotIn('Last-Modified', response)
+
+        url = f"/api/staff/activity/?cursor={response.data['next']}&per_page=2"
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        StaffActivityLog.objects.order_by('pk').update(description='Edited')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ConditionalDashboardTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user('staff@example.com', 'password', user_type='staff')
+        self.client.force_authenticate(self.staff)
+
+    def test_no_validators_without_a_shared_cache(self):
+        with self.settings(DASHBOARD_ETAGS=False):
+            response = self.client.get('/api/staff/dashboard/')
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+    @override_settings(DASHBOARD_ETAGS=True)
+    def test_unchanged_dashboard_returns_not_modified(self):
+        response = self.client.get('/api/staff/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        self.assertEqual(self.client.get('/api/staff/dashboard/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(
+            self.client.get('/api/staff/dashboard/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304,
+        )
+
+        StaffActivityLog.objects.create(staff_member=self.staff, action='user_management', description='Reviewed')
+        response = self.client.get('/api/staff/dashboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class StaffQueryPlanTests(QueryPlanMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.now().date()
+        members = [
+            User.objects.create_user(f'staff{i}@example.com', 'password', user_type='staff')
+            for i in range(3)
+        ]
+        cls.staff = members[0]
+        for i in range(40):
+            member = members[i % 3]
+            StaffActivityLog.objects.create(
+                staff_member=member, description='Reviewed account',
+                action=['user_management', 'report_generation'][i % 2],
+            )
+            SystemReport.objects.create(
+                generated_by=member, report_type=['usage', 'financial'][i % 2],
+                start_date=date(2025, 1, 1), end_date=date(2025, 1, 31), data={},
+            )
+            StaffNotification.objects.create(
+                staff_member=member, title='Queue', message='Pickups waiting', is_read=bool(i % 2),
+            )
+            SystemOverview.objects.create(date=today - timedelta(days=i))
+            Pickup.objects.create(
+                user=member, date=timezone.now() - timedelta(days=i), address='1 Green Street',
+                materials={'plastic': 1, 'paper': 2}, status=['scheduled', 'completed'][i % 2],
+            )
+            PickupRequest.objects.create(
+                customer=member, scheduled_date=timezone.now() - timedelta(days=i), address='1 Green Street',
+                items={'metal': 1}, status=['pending', 'completed'][i % 2],
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.staff)
+
+    def test_dashboard_is_indexed(self):
+        self.assertIndexedQueries('/api/staff/dashboard/')
+
+    def test_overview_is_indexed(self):
+        for time_range in ('monthly', 'weekly', 'all'):
+            self.assertIndexedQueries('/api/staff/overview/', {'range': time_range})
+
+    def test_activity_is_indexed(self):
+        self.assertIndexedQueries('/api/staff/activity/')
+        self.assertIndexedQueries('/api/staff/activity/', {'action': 'user_management'})
+        self.assertIndexedQueries('/api/staff/activity/', {'staff_member': self.staff.pk})
+        self.assertIndexedQueries('/api/staff/activity/', {'cursor': ''})
+
+    def test_reports_are_indexed(self):
+        self.assertIndexedQueries('/api/staff/reports/')
+        self.assertIndexedQueries('/api/staff/reports/', {'type': 'usage'})
+        self.assertIndexedQueries('/api/staff/reports/', {'cursor': ''})
+
+    def test_notifications_are_indexed(self):
+        self.assertIndexedQueries('/api/staff/notifications/')
+
+
+class ReportGenerationTests(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user('reports@example.com', 'password', user_type='staff')
+        self.client.force_authenticate(self.staff)
+        recycler = User.objects.create_user('recycler@example.com', 'password')
+        # One entry in each month from January to March, plus one outside the range
+        for month, material in ((1, 'plastic'), (2, 'paper'), (3, 'plastic'), (5, 'glass')):
+            RecyclingHistory.objects.create(
+                user=recycler, material_type=material, weight_kg=Decimal('2.50'),
+                co2_saved_kg=Decimal('1.25'), date=timezone.make_aware(datetime(2025, month, 10, 12)),
+            )
+
+    def request_report(self, report_type='recycling', start='2025-01-01', end='2025-03-31'):
+        return self.client.post(
+            '/api/staff/reports/', {'report_type': report_type, 'start_date': start, 'end_date': end},
+        )
+
+    def test_report_is_generated_by_the_worker(self):
+        response = self.request_report()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'queued')
+
+        self.assertEqual(run_pending(), 1)
+        report = self.client.get(f"/api/staff/reports/{response.data['id']}/").data
+        self.assertEqual(report['status'], 'done')
+        self.assertEqual(report['processed_until'], '2025-03-31')
+        self.assertEqual(report['data']['total_kg'], 7.5)
+        self.assertEqual(report['data']['by_material']['plastic'], {'kg': 5.0, 'co2_saved_kg': 2.5})
+        self.assertEqual(sorted(report['data']['monthly']), ['2025-01', '2025-02', '2025-03'])
+
+    def test_every_report_type_is_generated(self):
+        for report_type, _ in SystemReport.REPORT_TYPES:
+            self.request_report(report_type)
+        self.assertEqual(run_pending(), len(SystemReport.REPORT_TYPES))
+        self.assertFalse(SystemReport.objects.exclude(status='done').exists())
+        user_report = SystemReport.objects.get(report_type='user')
+        self.assertEqual(user_report.data['monthly']['2025-02']['active_users'], 1)
+
+    def test_abandoned_report_is_resumed_by_another_worker(self):
+        self.request_report()
+        stalled = claim()
+        SystemReport.objects.filter(pk=stalled.pk).update(
+            processed_until=date(2025, 1, 31),
+            data={'total_kg': 2.5, 'co2_saved_kg': 1.25, 'by_material': {'plastic': {'kg': 2.5, 'co2_saved_kg': 1.25}}},
+            updated_at=timezone.now() - timedelta(hours=1),
+        )
+
+        self.assertEqual(run_pending(), 1)
+        # The first worker lost its claim and stops without writing
+        self.assertFalse(generate(stalled))
+        report = SystemReport.objects.get(pk=stalled.pk)
+        self.assertEqual(report.status, 'done')
+        self.assertEqual(report.data['total_kg'], 7.5)
+        self.assertEqual(sorted(report.data['monthly']), ['2025-02', '2025-03'])
+
+    def test_generated_report_exports_as_key_value_rows(self):
+        report_id = self.request_report().data['id']
+        url = f'/api/staff/reports/{report_id}/export/'
+        self.assertEqual(self.client.get(url).status_code, 409)
+
+        run_pending()
+        lines = b''.join(self.client.get(url).streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'key,value')
+        self.assertIn('by_material.plastic.kg,5.0', lines)
+        self.assertIn('monthly.2025-03.kg,2.5', lines)
+
+    def test_exports_are_staff_only(self):
+        report_id = self.request_report().data['id']
+        self.client.force_authenticate(User.objects.get(email='recycler@example.com'))
+        self.assertEqual(self.client.get('/api/staff/activity/export/').status_code, 403)
+        self.assertEqual(self.client.get(f'/api/staff/reports/{report_id}/export/').status_code, 403)
+
+    def test_inverted_range_is_rejected(self):
+        response = self.request_report(start='2025-03-01', end='2025-01-01')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(SystemReport.objects.exists())
+
+
+class StaffDashboardMaterialTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user('staff@example.com', 'password', user_type='staff')
+        self.client.force_authenticate(self.staff)
+
+    def test_dashboard_breaks_down_this_months_materials(self):
+        now = timezone.now()
+        Pickup.objects.create(
+            user=self.staff, date=now, address='1 Green Street', materials={'plastic': 2}, status='completed',
+        )
+        Pickup.objects.create(user=self.staff, date=now, address='1 Green Street', materials={'plastic': 1})
+        Pickup.objects.create(
+            user=self.staff, date=now - timedelta(days=40), address='1 Green Street', materials={'plastic': 5},
+        )
+        PickupRequest.objects.create(
+            customer=self.staff, scheduled_date=now, address='1 Green Street',
+            items={'plastic': 4, 'metal': 1}, status='pending',
+        )
+
+        response = self.client.get('/api/staff/dashboard/')
+        self.assertEqual(response.data['material_breakdown'], {
+            'metal': {'total_kg': 1.0, 'completed_kg': 0.0},
+            'plastic': {'total_kg': 7.0, 'completed_kg': 2.0},
+        })
+
+        # New pickups invalidate the cached dashboard
+        Pickup.objects.create(user=self.staff, date=now, address='1 Green Street', materials={'glass': 1})
+        response = self.client.get('/api/staff/dashboard/')
+        self.assertEqual(response.data['material_breakdown']['glass'], {'total_kg': 1.0, 'completed_kg': 0.0})
+
+
+class SystemOverviewRollupTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.user = User.objects.create_user('recycler@example.com', 'password')
+        User.objects.filter(pk=self.user.pk).update(date_joined=self.at(-6))
+
+    def at(self, days):
+        return day_start(self.today + timedelta(days=days)) + timedelta(hours=12)
+
+    def recycle(self, days, kg):
+        return RecyclingHistory.objects.create(
+            user=self.user, material_type='plastic', weight_kg=Decimal(kg), co2_saved_kg=Decimal('1.00'),
+            date=self.at(days),
+        )
+
+    def rollup(self, *args):
+        out = StringIO()
+        call_command('rollup_system_overview', *args, stdout=out)
+        return out.getvalue()
+
+    def overview(self, days):
+        return SystemOverview.objects.get(date=self.today + timedelta(days=days))
+
+    def age_writes(self):
+        """Pretend everything so far was written and rolled up a day ago."""
+        earlier = timezone.now() - timedelta(days=1)
+        RecyclingHistory.objects.update(created_at=earlier, updated_at=earlier)
+        Challenge.objects.update(created_at=earlier, updated_at=earlier)
+        RollupCheckpoint.objects.update(high_water_mark=earlier + timedelta(hours=1))
+
+    def test_backfill_writes_cumulative_totals_for_the_range(self):
+        self.recycle(-5, '2.00')
+        self.recycle(-3, '3.00')
+
+        start, end = self.today - timedelta(days=4), self.today - timedelta(days=2)
+        self.assertIn('Wrote 3 overview rows.', self.rollup(f'--start={start}', f'--end={end}'))
+
+        self.assertEqual(
+            [(row.date, row.total_users, row.total_recycled_kg) for row in SystemOverview.objects.order_by('date')],
+            [(start, 1, 2.0), (start + timedelta(days=1), 1, 5.0), (end, 1, 5.0)],
+        )
+
+    def test_backfill_range_is_validated(self):
+        with self.assertRaises(CommandError):
+            self.rollup(f'--start={self.today}')
+        with self.assertRaises(CommandError):
+            self.rollup(f'--start={self.today}', f'--end={self.today - timedelta(days=1)}')
+
+    def test_incremental_runs_only_refresh_new_and_changed_days(self):
+        self.recycle(-3, '2.00')
+        self.assertIn('Wrote 7 overview rows.', self.rollup())
+        self.assertEqual(self.overview(-6).total_users, 1)
+        self.assertEqual(self.overview(0).total_recycled_kg, 2.0)
+
+        self.age_writes()
+        # Nothing changed: only today's row, whose totals are still moving
+        self.assertEqual(run_incremental(), 1)
+
+        self.recycle(-2, '4.00')
+        self.assertEqual(run_incremental(), 3)
+        self.assertEqual(self.overview(-3).total_recycled_kg, 2.0)
+        self.assertEqual(self.overview(-2).total_recycled_kg, 6.0)
+
+    def test_edited_rows_refresh_their_days(self):
+        record = self.recycle(-3, '2.00')
+        challenge = Challenge.objects.create(
+            user=self.user, title='Recycle', description='Recycle 10 kg', target=10, points_reward=5,
+            start_date=self.at(-5), end_date=self.at(-4),
+        )
+        run_incremental()
+        self.assertEqual(self.overview(-5).active_challenges, 1)
+        self.assertEqual(self.overview(-4).completed_challenges, 0)
+
+        self.age_writes()
+        record.refresh_from_db()
+        challenge.refresh_from_db()
+        record.weight_kg = Decimal('5.00')
+        record.save()
+        challenge.progress = 10
+        challenge.save()
+        self.assertEqual(run_incremental(), 6)
+
+        self.assertEqual(self.overview(-3).total_recycled_kg, 5.0)
+        self.assertEqual(self.overview(-5).active_challenges, 0)
+        self.assertEqual(self.overview(-4).completed_challenges, 1)
+
+    def test_deleted_rows_refresh_their_days(self):
+        record = self.recycle(-3, '2.00')
+        challenge = Challenge.objects.create(
+            user=self.user, title='Recycle', description='Recycle 10 kg', target=10, points_reward=5,
+            start_date=self.at(-5), end_date=self.at(-1),
+        )
+        run_incremental()
+        self.assertEqual(self.overview(-3).total_recycled_kg, 2.0)
+        self.assertEqual(self.overview(-5).active_challenges, 1)
+
+        self.age_writes()
+        record.delete()
+        challenge.delete()
+        self.assertEqual(run_incremental(), 6)
+        self.assertEqual(self.overview(-3).total_recycled_kg, 0)
+        self.assertEqual(self.overview(-5).active_challenges, 0)
+
+        # The marks are consumed by the run that recomputed their days
+        self.assertFalse(RollupDirtyDay.objects.exists())
+        self.assertEqual(run_incremental(), 1)
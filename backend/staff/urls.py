@@ -5,9 +5,13 @@ app_name = 'staff'
 
 urlpatterns = [
     path('dashboard/', views.StaffDashboardView.as_view(), name='dashboard'),
+    path('cache-stats/', views.DashboardCacheStatsView.as_view(), name='cache_stats'),
     path('overview/', views.SystemOverviewView.as_view(), name='overview'),
     path('activity/', views.StaffActivityLogView.as_view(), name='activity'),
+    path('activity/export/', views.StaffActivityExportView.as_view(), name='activity_export'),
     path('reports/', views.SystemReportView.as_view(), name='reports'),
+    path('reports/<int:pk>/', views.SystemReportDetailView.as_view(), name='report_detail'),
+    path('reports/<int:pk>/export/', views.SystemReportExportView.as_view(), name='report_export'),
     path('notifications/', views.StaffNotificationView.as_view(), name='notifications'),
     path('notifications/<int:pk>/', views.StaffNotificationView.as_view(), name='notification_detail'),
 ]
\ No newline at end of file
@@ -9,30 +9,55 @@ from .serializers import (
     SystemReportSerializer,
     StaffNotificationSerializer
 )
-from django.db.models import Sum
+from django.db.models import Q, Sum
 from datetime import datetime, timedelta
 from django.utils import timezone
+from core.concurrent import run_concurrently
+from core.conditional import conditional_dashboard, conditional_list
+from core.dashboard_cache import cache_stats
+from core.materials import breakdown
+from core.pagination import KeysetPagination
+from core.streaming import EXPORT_FORMATS, export_queryset, export_response
+from individual.models import PickupMaterial
+from recycle_center.models import PickupRequestItem
+from .reports import enqueue, flatten
+from .rollup import day_start
 
 class StaffDashboardView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        # Get today's system overview
+        return conditional_dashboard(
+            request, 'staff', request.user.pk,
+            lambda: self.get_dashboard_data(request.user),
+            # Pickup writes change the material breakdown
+            shared_scopes=['staff_activity', 'pickups', 'pickup_requests'],
+        )
+    
+    def get_dashboard_data(self, staff_member):
         today = timezone.now().date()
-        try:
-            overview = SystemOverview.objects.get(date=today)
-        except SystemOverview.DoesNotExist:
-            # Create a default overview if none exists for today
-            overview = SystemOverview.objects.create(date=today)
-        
-        # Get recent activity (last 10)
-        recent_activity = StaffActivityLog.objects.all()[:10]
-        
-        # Get recent reports (last 5)
-        recent_reports = SystemReport.objects.all()[:5]
-        
-        # Get unread notifications
-        notifications = StaffNotification.objects.filter(staff_member=request.user, is_read=False)
+        month_start = day_start(today.replace(day=1))
+        next_month_start = day_start((today.replace(day=1) + timedelta(days=32)).replace(day=1))
+        results = run_concurrently(
+            # Latest overview computed by the rollup_system_overview job
+            overview=lambda: SystemOverview.objects.filter(date__lte=today).first(),
+            # Get recent activity (last 10)
+            recent_activity=StaffActivityLog.objects.select_related('staff_member')[:10],
+            # Get recent reports (last 5)
+            recent_reports=SystemReport.objects.select_related('generated_by')[:5],
+            # Get unread notifications
+            notifications=StaffNotification.objects.filter(staff_member=staff_member, is_read=False),
+            # Material kg of this month's pickups
+            pickup_materials=lambda: PickupMaterial.objects.filter(
+                date__gte=month_start, date__lt=next_month_start,
+            ).exclude(pickup__status='cancelled').totals_by_material(completed=Q(pickup__status='completed')),
+            request_materials=lambda: PickupRequestItem.objects.filter(
+                scheduled_date__gte=month_start, scheduled_date__lt=next_month_start,
+            ).exclude(request__status='cancelled').totals_by_material(completed=Q(request__status='completed')),
+        )
+        overview = results['overview']
+        if overview is None:
+            overview = SystemOverview(date=today)
         
         data = {
             'total_users': overview.total_users,
@@ -41,13 +66,24 @@ class StaffDashboardView(APIView):
             'co2_saved_kg': overview.co2_saved_kg,
             'active_challenges': overview.active_challenges,
             'completed_challenges': overview.completed_challenges,
-            'recent_activity': recent_activity,
-            'recent_reports': recent_reports,
-            'notifications': notifications
+            'material_breakdown': breakdown(results['pickup_materials'], results['request_materials']),
+            'recent_activity': results['recent_activity'],
+            'recent_reports': results['recent_reports'],
+            'notifications': results['notifications']
         }
         
         serializer = StaffDashboardSerializer(data)
-        return Response(serializer.data)
+        return serializer.data
+
+class DashboardCacheStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        if request.user.user_type != 'staff':
+            return Response({'error': 'Only staff can view cache statistics'}, status=403)
+        # Hit/miss counters kept in the dashboard cache, so per worker
+        # unless the cache is shared
+        return Response(cache_stats())
 
 class SystemOverviewView(APIView):
     permission_classes = [IsAuthenticated]
@@ -69,8 +105,10 @@ class SystemOverviewView(APIView):
             # Get all overviews
             overviews = SystemOverview.objects.all()
             
-        serializer = SystemOverviewSerializer(overviews, many=True)
-        return Response(serializer.data)
+        return conditional_list(
+            request, overviews, 'updated_at',
+            lambda: Response(SystemOverviewSerializer(overviews, many=True).data),
+        )
 
 class StaffActivityLogView(APIView):
     permission_classes = [IsAuthenticated]
@@ -80,7 +118,7 @@ class StaffActivityLogView(APIView):
         action = request.GET.get('action', '')
         staff_member = request.GET.get('staff_member', '')
         
-        logs = StaffActivityLog.objects.all()
+        logs = StaffActivityLog.objects.select_related('staff_member')
         
         if action:
             logs = logs.filter(action=action)
@@ -88,7 +126,16 @@ class StaffActivityLogView(APIView):
         if staff_member:
             logs = logs.filter(staff_member_id=staff_member)
             
-        # Pagination
+        return conditional_list(request, logs, 'timestamp', lambda: self.get_page(request, logs))
+    
+    def get_page(self, request, logs):
+        # Cursor pagination when requested, page/per_page for older clients
+        if KeysetPagination.is_requested(request):
+            paginator = KeysetPagination('timestamp', default_per_page=20)
+            rows, next_cursor, previous_cursor = paginator.paginate_queryset(logs, request)
+            serializer = StaffActivityLogSerializer(rows, many=True)
+            return Response(paginator.get_paginated_data(serializer.data, next_cursor, previous_cursor))
+        
         page = int(request.GET.get('page', 1))
         per_page = int(request.GET.get('per_page', 20))
         start = (page - 1) * per_page
@@ -110,6 +157,25 @@ class StaffActivityLogView(APIView):
             return Response(serializer.data, status=201)
         return Response(serializer.errors, status=400)
 
+class StaffActivityExportView(APIView):
+    """Stream the activity log as CSV or NDJSON (see ``export_queryset``)."""
+    permission_classes = [IsAuthenticated]
+    
+    COLUMNS = ['id', 'timestamp', 'staff_member__email', 'action', 'description']
+    
+    def get(self, request):
+        if request.user.user_type != 'staff':
+            return Response({'error': 'Only staff can export the activity log'}, status=403)
+        
+        logs = StaffActivityLog.objects.order_by('timestamp', 'id')
+        action = request.GET.get('action', '')
+        if action:
+            logs = logs.filter(action=action)
+        staff_member = request.GET.get('staff_member', '')
+        if staff_member:
+            logs = logs.filter(staff_member_id=staff_member)
+        return export_queryset(request, logs, self.COLUMNS, 'staff-activity', date_field='timestamp')
+
 class SystemReportView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -117,18 +183,34 @@ class SystemReportView(APIView):
         report_type = request.GET.get('type', 'all')
         search = request.GET.get('search', '')
         
-        reports = SystemReport.objects.all()
+        reports = SystemReport.objects.select_related('generated_by')
         
         if report_type != 'all':
             reports = reports.filter(report_type=report_type)
             
         if search:
+            # Reports have no free text: match the type (code or label) and
+            # who generated them
+            types = [
+                code for code, label in SystemReport.REPORT_TYPES
+                if search.lower() in code or search.lower() in label.lower()
+            ]
             reports = reports.filter(
-                models.Q(title__icontains=search) |
-                models.Q(description__icontains=search)
+                Q(report_type__in=types) |
+                Q(generated_by__email__icontains=search)
             )
             
-        # Pagination
+        # updated_at also moves when a report's status changes
+        return conditional_list(request, reports, 'updated_at', lambda: self.get_page(request, reports))
+    
+    def get_page(self, request, reports):
+        # Cursor pagination when requested, page/per_page for older clients
+        if KeysetPagination.is_requested(request):
+            paginator = KeysetPagination('generated_at', default_per_page=10)
+            rows, next_cursor, previous_cursor = paginator.paginate_queryset(reports, request)
+            serializer = SystemReportSerializer(rows, many=True)
+            return Response(paginator.get_paginated_data(serializer.data, next_cursor, previous_cursor))
+        
         page = int(request.GET.get('page', 1))
         per_page = int(request.GET.get('per_page', 10))
         start = (page - 1) * per_page
@@ -138,28 +220,66 @@ class SystemReportView(APIView):
         return Response(serializer.data)
     
     def post(self, request):
-        # Generate a new report
+        # Queue a new report; it is generated in the background
         serializer = SystemReportSerializer(data={
             'generated_by': request.user.id,
             'report_type': request.data.get('report_type'),
             'start_date': request.data.get('start_date'),
             'end_date': request.data.get('end_date'),
-            'data': request.data.get('data', {})
         })
         
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=201)
+            report = serializer.save()
+            enqueue(report)
+            return Response(serializer.data, status=202)
         return Response(serializer.errors, status=400)
 
+class SystemReportDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, pk):
+        # Poll a report's generation status
+        try:
+            report = SystemReport.objects.select_related('generated_by').get(pk=pk)
+        except SystemReport.DoesNotExist:
+            return Response({'error': 'Report not found'}, status=404)
+        return Response(SystemReportSerializer(report).data)
+
+class SystemReportExportView(APIView):
+    """Download a generated report's data as ``key,value`` rows, one per
+    figure, in CSV or NDJSON (``?fmt=``, ``?gzip=1``)."""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, pk):
+        if request.user.user_type != 'staff':
+            return Response({'error': 'Only staff can export reports'}, status=403)
+        export_format = request.GET.get('fmt', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response({'error': f"Unsupported format. Use one of: {', '.join(EXPORT_FORMATS)}."}, status=400)
+        
+        try:
+            report = SystemReport.objects.only('report_type', 'start_date', 'end_date', 'status', 'data').get(pk=pk)
+        except SystemReport.DoesNotExist:
+            return Response({'error': 'Report not found'}, status=404)
+        if report.status != 'done':
+            return Response({'error': f"Report is {report.status}", 'status': report.status}, status=409)
+        
+        filename = f'{report.report_type}-report-{report.start_date}-{report.end_date}'
+        return export_response(
+            flatten(report.data), ['key', 'value'], export_format, filename,
+            compress=request.GET.get('gzip') in ('1', 'true'),
+        )
+
 class StaffNotificationView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
         # Get notifications for current user
         notifications = StaffNotification.objects.filter(staff_member=request.user)
-        serializer = StaffNotificationSerializer(notifications, many=True)
-        return Response(serializer.data)
+        return conditional_list(
+            request, notifications, 'updated_at',
+            lambda: Response(StaffNotificationSerializer(notifications, many=True).data),
+        )
     
     def post(self, request):
         # Create a new notification
@@ -183,4 +303,4 @@ class StaffNotificationView(APIView):
             serializer = StaffNotificationSerializer(notification)
             return Response(serializer.data)
         except StaffNotification.DoesNotExist:
-            return Response({'error': 'Notification not found'}, status=404)
\ No newline at end of file
+            return Response({'error': 'Notification not found'}, status=404)
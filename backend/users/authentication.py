@@ -0,0 +1,152 @@
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .blacklist import is_blacklisted
+from .models import User
+
+# Authenticating a JWT normally costs one query to load the user. This path
+# avoids it in two ways:
+#
+# * tokens carry the fields most views need as claims, so the user can be
+#   rebuilt without a query; any other field is loaded on first access,
+#   since it is deferred on the rebuilt instance;
+# * users that were loaded are kept in a small per-process cache for a few
+#   seconds.
+#
+# Both are only used while they match the user's ``token_version``, which
+# saves changing the password, the active flag or a claim field increment.
+# The current version is read from the database and kept in the cache for
+# AUTH_USER_CACHE_TTL seconds; such a save drops the cached value, so with a
+# shared cache (REDIS_URL) they apply on the next request, and other
+# processes of a per-process cache notice within the TTL. Other profile
+# changes keep the version and reach other processes' cached users within
+# the TTL. A missing or evicted version is read again, never assumed
+# unchanged.
+
+CLAIM_FIELDS = ['email', 'first_name', 'last_name', 'user_type', 'is_staff']
+TOKEN_VERSION_CLAIM = 'token_version'
+
+
+def _ttl():
+    return getattr(settings, 'AUTH_USER_CACHE_TTL', 30)
+
+
+def _max_entries():
+    return getattr(settings, 'AUTH_USER_CACHE_MAX_ENTRIES', 10000)
+
+
+def _shared_cache():
+    return caches[getattr(settings, 'AUTH_USER_CACHE_ALIAS', 'default')]
+
+
+def _version_key(user_id):
+    return f'auth:token_version:{user_id}'
+
+
+_lock = threading.Lock()
+_users = {}  # user id -> (expires_at, user)
+
+
+def token_version(user_id):
+    """The user's current token version, or None for an unknown user."""
+    cache = _shared_cache()
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        version = User.objects.filter(pk=user_id).values_list('token_version', flat=True).first()
+        if version is not None:
+            cache.set(_version_key(user_id), version, _ttl())
+    return version
+
+
+def _forget(user_id):
+    _shared_cache().delete(_version_key(user_id))
+    with _lock:
+        _users.pop(user_id, None)
+
+
+def user_changed(user_id):
+    """Retire cached copies and token claims of a user."""
+    _forget(user_id)
+    # Again once committed, in case a request re-read the old version
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _forget(user_id))
+
+
+def clear_user_cache():
+    with _lock:
+        _users.clear()
+
+
+class UserClaimsRefreshToken(RefreshToken):
+    """Refresh token whose access tokens carry the user's profile claims."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for field in CLAIM_FIELDS:
+            token[field] = getattr(user, field)
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        return token
+
+    def check_blacklist(self):
+        # Same check as simplejwt's, prefiltered by the in-memory filter
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError("Token is blacklisted")
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication that loads the user from token claims or a
+    short-lived process cache, and from the database only when neither is
+    current."""
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+        version = token_version(user_id)
+        if version is None:
+            # Deleted; let simplejwt report it
+            return super().get_user(validated_token)
+
+        now = time.monotonic()
+        entry = _users.get(user_id)
+        if entry is not None:
+            expires_at, user = entry
+            if expires_at > now and user.token_version == version:
+                # Each request gets its own instance to modify
+                return copy.copy(user)
+
+        user = self.user_from_claims(validated_token, version)
+        if user is not None:
+            return user
+
+        user = super().get_user(validated_token)
+        with _lock:
+            if len(_users) >= _max_entries():
+                _users.clear()
+            _users[user_id] = (now + _ttl(), user)
+        return user
+
+    def user_from_claims(self, validated_token, version):
+        if validated_token.get(TOKEN_VERSION_CLAIM) != version:
+            return None
+        if any(field not in validated_token for field in CLAIM_FIELDS):
+            return None
+        # Only tokens of active users are issued and deactivation is a
+        # save, so a current claim set implies an active user.
+        known = {field: validated_token[field] for field in CLAIM_FIELDS}
+        known.update(
+            id=validated_token[api_settings.USER_ID_CLAIM], is_active=True, token_version=version,
+        )
+        # from_db expects values in model field order
+        field_names = [f.attname for f in User._meta.concrete_fields if f.attname in known]
+        return User.from_db('default', field_names, [known[name] for name in field_names])
@@ -0,0 +1,135 @@
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Max
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .models import TokenPrune
+
+# Refresh tokens are checked against the blacklist on every verification.
+# Each process keeps a Bloom filter of blacklisted JTIs so that tokens it
+# has never seen blacklisted (nearly all of them) are accepted without a
+# query; a filter hit is confirmed against the table, so false positives
+# only cost the query the check used to make.
+#
+# The filter is built on first use and then extended incrementally with
+# rows above the highest id loaded so far. Other processes' writes are
+# detected from the table itself: at most every
+# TOKEN_BLACKLIST_CHECK_INTERVAL seconds a check reads the highest id, and
+# a new one triggers a load. A token blacklisted by another process can
+# therefore be accepted for up to that interval (0 checks on every
+# verification). Each load re-reads a few ids below the highest one seen,
+# in case rows committed out of id order.
+#
+# Pruned tokens stay in a filter as harmless false positives. Each
+# ``prune_tokens`` run adds a TokenPrune row, and the check also reads the
+# highest prune id, so every process rebuilds its filter after a prune.
+
+ID_OVERLAP = 100
+
+
+def _capacity():
+    return getattr(settings, 'TOKEN_BLACKLIST_FILTER_CAPACITY', 100000)
+
+
+def _error_rate():
+    return getattr(settings, 'TOKEN_BLACKLIST_FILTER_ERROR_RATE', 0.001)
+
+
+def _check_interval():
+    return getattr(settings, 'TOKEN_BLACKLIST_CHECK_INTERVAL', 1.0)
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        # Double hashing: two 64-bit halves of one digest give every index
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, value, new=True):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += int(new)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+    @property
+    def is_full(self):
+        return self.count > self.capacity
+
+
+class BlacklistFilter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.high_water = 0
+        self.state = None
+        self.checked_at = None
+
+    def reset(self):
+        with self.lock:
+            self.bloom, self.high_water, self.state, self.checked_at = None, 0, None, None
+
+    def add(self, jti):
+        """Record a blacklist write made by this process."""
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti, new=False)
+
+    def _load(self):
+        previous = self.high_water
+        rows = (
+            BlacklistedToken.objects.filter(pk__gt=max(0, previous - ID_OVERLAP))
+            .order_by('pk').values_list('pk', 'token__jti')
+        )
+        for row_id, jti in rows.iterator(chunk_size=5000):
+            self.bloom.add(jti, new=row_id > previous)
+            self.high_water = max(self.high_water, row_id)
+
+    def _table_state(self):
+        return (
+            BlacklistedToken.objects.aggregate(last_id=Max('pk'))['last_id'],
+            TokenPrune.objects.aggregate(last_id=Max('pk'))['last_id'],
+        )
+
+    def refresh(self):
+        now = time.monotonic()
+        if self.bloom is not None and now - self.checked_at < _check_interval():
+            return
+        # Read the state first, so rows written during the load trigger another
+        state = self._table_state()
+        with self.lock:
+            if self.bloom is None or self.bloom.is_full or state[1] != self.state[1]:
+                rows = BlacklistedToken.objects.count()
+                self.bloom = BloomFilter(max(_capacity(), rows * 2), _error_rate())
+                self.high_water = 0
+                self._load()
+            elif state != self.state:
+                self._load()
+            self.state, self.checked_at = state, now
+
+    def might_contain(self, jti):
+        self.refresh()
+        return jti in self.bloom
+
+
+blacklist_filter = BlacklistFilter()
+
+
+def is_blacklisted(jti):
+    """Exact blacklist check that only queries when the filter matches."""
+    if not blacklist_filter.might_contain(jti):
+        return False
+    return BlacklistedToken.objects.filter(token__jti=jti).exists()
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from users.blacklist import blacklist_filter
+from users.models import TokenPrune
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding and blacklisted refresh tokens in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help="Seconds to pause between batches to limit load.",
+        )
+
+    def handle(self, *args, batch_size=1000, sleep=0, **options):
+        now = timezone.now()
+        last_id = 0
+        outstanding = blacklisted = 0
+        while True:
+            # Walking the primary key keeps each batch a range scan instead
+            # of re-reading the rows already kept
+            ids = list(
+                OutstandingToken.objects.filter(pk__gt=last_id, expires_at__lt=now)
+                .order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            with transaction.atomic():
+                blacklisted += BlacklistedToken.objects.filter(token_id__in=ids).delete()[0]
+                outstanding += OutstandingToken.objects.filter(pk__in=ids).delete()[0]
+            if sleep:
+                time.sleep(sleep)
+
+        # Every process, this one included, rebuilds its filter without the
+        # pruned JTIs once it sees the new prune
+        TokenPrune.objects.create(blacklisted=blacklisted)
+        blacklist_filter.reset()
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {outstanding} expired outstanding and {blacklisted} blacklisted tokens."
+        ))
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0003_alter_user_managers"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="latitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="longitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
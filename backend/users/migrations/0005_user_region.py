@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0004_user_location"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="region",
+            field=models.CharField(blank=True, default="", max_length=50),
+        ),
+    ]
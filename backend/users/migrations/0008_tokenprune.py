@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0007_user_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TokenPrune",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("pruned_at", models.DateTimeField(auto_now_add=True)),
+                ("blacklisted", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
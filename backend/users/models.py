@@ -37,10 +37,35 @@ class User(AbstractUser):
     user_type = models.CharField(max_length=20, choices=USER_TYPES, default="individual")
     phone = models.CharField(max_length=15, blank=True, null=True)
     address = models.CharField(max_length=100, blank=True, null=True)
+    # Service location of recycling centers, used to assign pickups
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    # Regional leaderboard the user competes on; blank for the global one only
+    region = models.CharField(max_length=50, blank=True, default="")
+    # Bumped by saves that change credentials or token claims; claims issued
+    # under another value are stale
+    token_version = models.PositiveIntegerField(default=0, editable=False)
+    # Set by every save; recycling center changes are detected from it
+    updated_at = models.DateTimeField(auto_now=True)
 
     USERNAME_FIELD = "email"      # now email is the login field
     REQUIRED_FIELDS = []   
     objects = CustomUserManager()        # removes username requirement
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=["user_type", "updated_at"], name="user_type_updated_idx"),
+        ]
+
     def __str__(self):
         return f"{self.email} ({self.user_type})"
+
+
+class TokenPrune(models.Model):
+    """One run of ``prune_tokens``; a new row tells every process to rebuild
+    its blacklist filter without the pruned tokens."""
+    pruned_at = models.DateTimeField(auto_now_add=True)
+    blacklisted = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Pruned {self.blacklisted} blacklisted tokens at {self.pruned_at}"
@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from .authentication import UserClaimsRefreshToken
 from .models import User
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -9,7 +11,8 @@ class RegisterSerializer(serializers.ModelSerializer):
         model = User
         fields = [
             'first_name', 'last_name',
-            'email', 'password', 'phone', 'address', 'user_type'
+            'email', 'password', 'phone', 'address', 'user_type',
+            'latitude', 'longitude', 'region'
         ]
 
     def create(self, validated_data):
@@ -20,6 +23,9 @@ class RegisterSerializer(serializers.ModelSerializer):
             phone=validated_data.get('phone'),
             address=validated_data.get('address'),
             user_type=validated_data.get('user_type', 'individual'),
+            latitude=validated_data.get('latitude'),
+            longitude=validated_data.get('longitude'),
+            region=validated_data.get('region', ''),
         )
         user.set_password(validated_data['password'])
         user.save()
@@ -45,3 +51,6 @@ class LoginSerializer(serializers.Serializer):
             raise serializers.ValidationError("Invalid credentials")
         return user
 
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = UserClaimsRefreshToken
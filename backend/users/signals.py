@@ -0,0 +1,47 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .authentication import CLAIM_FIELDS, user_changed
+from .blacklist import blacklist_filter
+from .models import User
+
+
+# Fields whose change retires issued token claims; other saves (last_login,
+# profile details) keep them
+TOKEN_FIELDS = ['password', 'is_active', *CLAIM_FIELDS]
+
+
+@receiver(pre_save, sender=User)
+def detect_token_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._token_fields_changed = False
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    fields = [field for field in TOKEN_FIELDS if update_fields is None or field in update_fields]
+    if not fields:
+        return
+    previous = User.objects.filter(pk=instance.pk).values(*fields).first()
+    instance._token_fields_changed = previous is None or any(
+        previous[field] != getattr(instance, field) for field in fields
+    )
+
+
+@receiver(post_save, sender=User)
+def retire_cached_user(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw and getattr(instance, '_token_fields_changed', False):
+        User.objects.filter(pk=instance.pk).update(token_version=F('token_version') + 1)
+        instance.token_version += 1
+    user_changed(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def retire_deleted_user(sender, instance, **kwargs):
+    user_changed(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def add_to_blacklist_filter(sender, instance, created=False, **kwargs):
+    if created:
+        blacklist_filter.add(instance.token.jti)
@@ -1,3 +1,210 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authentication import CachedJWTAuthentication, UserClaimsRefreshToken, clear_user_cache
+from .blacklist import BloomFilter, blacklist_filter
+from .models import TokenPrune, User
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    url = '/api/individual/pickups/'
+
+    def setUp(self):
+        cache.clear()
+        clear_user_cache()
+        self.user = User.objects.create_user(
+            'reader@example.com', 'password', first_name='Ada', address='1 Green Street',
+        )
+
+    def authenticate(self, token_class=UserClaimsRefreshToken):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token_class.for_user(self.user).access_token}')
+
+    def user_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return [query for query in context.captured_queries if 'FROM "users_user"' in query['sql']]
+
+    def test_login_tokens_carry_profile_claims(self):
+        response = self.client.post('/api/auth/login/', {'email': 'reader@example.com', 'password': 'password'})
+        access = UserClaimsRefreshToken(response.data['refresh']).access_token
+        self.assertEqual((access['user_type'], access['first_name']), ('individual', 'Ada'))
+
+    def test_claims_authenticate_without_loading_the_user(self):
+        self.authenticate()
+        # Only the token version is read, and then cached
+        queries = self.user_queries()
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]['sql'].startswith('SELECT "users_user"."token_version" FROM'))
+        self.assertEqual(self.user_queries(), [])
+
+    def test_tokens_without_claims_load_the_user_once(self):
+        self.authenticate(RefreshToken)
+        self.assertEqual(len(self.user_queries()), 2)
+        self.assertEqual(self.user_queries(), [])
+
+    def test_saving_the_user_retires_claims_and_cached_copies(self):
+        self.authenticate()
+        self.user.user_type = 'recycling_center'
+        self.user.save()
+
+        authenticated = self.client.get('/api/center/pickups/')
+        self.assertEqual(authenticated.status_code, 200)
+        self.assertEqual(len(self.user_queries()), 0)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_only_credential_and_claim_changes_retire_tokens(self):
+        self.user.refresh_from_db()
+        version = self.user.token_version
+
+        update_last_login(None, self.user)
+        self.user.last_login = timezone.now()
+        self.user.address = '2 Green Street'
+        self.user.save()
+        self.assertEqual(User.objects.get(pk=self.user.pk).token_version, version)
+
+        self.user.set_password('changed')
+        self.user.save()
+        self.assertEqual(User.objects.get(pk=self.user.pk).token_version, version + 1)
+        self.user.first_name = 'Grace'
+        self.user.save(update_fields=['first_name'])
+        self.assertEqual(User.objects.get(pk=self.user.pk).token_version, version + 2)
+
+    def test_evicted_versions_are_read_again(self):
+        self.authenticate()
+        self.user_queries()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+        cache.clear()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    @override_settings(AUTH_USER_CACHE_TTL=0)
+    def test_changes_made_by_other_processes_apply_once_the_version_expires(self):
+        self.authenticate()
+        self.user_queries()
+        # Saved elsewhere: the version is bumped without this process's handler
+        User.objects.filter(pk=self.user.pk).update(is_active=False, token_version=F('token_version') + 1)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_claim_users_load_other_fields_on_access(self):
+        token = UserClaimsRefreshToken.for_user(self.user).access_token
+        user = CachedJWTAuthentication().get_user(token)
+
+        self.assertEqual(user.email, 'reader@example.com')
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(user.address, '1 Green Street')
+        self.assertEqual(len(context.captured_queries), 1)
+
+
+class TokenBlacklistTests(APITestCase):
+    url = '/api/auth/token/refresh/'
+
+    def setUp(self):
+        blacklist_filter.reset()
+        self.user = User.objects.create_user('member@example.com', 'password')
+
+    def refresh(self, token):
+        return self.client.post(self.url, {'refresh': str(token)})
+
+    def test_blacklisted_tokens_are_rejected(self):
+        token = UserClaimsRefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(token).status_code, 200)
+
+        token.blacklist()
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_tokens_are_rejected_after_another_process_blacklists_them(self):
+        token = UserClaimsRefreshToken.for_user(self.user)
+        self.refresh(UserClaimsRefreshToken.for_user(self.user))
+
+        # Written without this process's signal handler, as another worker would
+        outstanding = OutstandingToken.objects.get(jti=token['jti'])
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=outstanding)])
+
+        with override_settings(TOKEN_BLACKLIST_CHECK_INTERVAL=0):
+            self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_the_table_is_checked_again_after_the_interval(self):
+        token = UserClaimsRefreshToken.for_user(self.user)
+        self.refresh(UserClaimsRefreshToken.for_user(self.user))
+        outstanding = OutstandingToken.objects.get(jti=token['jti'])
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=outstanding)])
+
+        blacklist_filter.checked_at -= 60
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    @override_settings(TOKEN_BLACKLIST_CHECK_INTERVAL=60)
+    def test_valid_tokens_skip_the_blacklist_table(self):
+        UserClaimsRefreshToken.for_user(self.user).blacklist()
+        token = UserClaimsRefreshToken.for_user(self.user)
+        self.refresh(token)
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.refresh(token).status_code, 200)
+        self.assertFalse(
+            [query for query in context.captured_queries if 'token_blacklist' in query['sql']]
+        )
+
+    @override_settings(TOKEN_BLACKLIST_CHECK_INTERVAL=0)
+    def test_checks_read_only_the_highest_ids(self):
+        UserClaimsRefreshToken.for_user(self.user).blacklist()
+        token = UserClaimsRefreshToken.for_user(self.user)
+        self.refresh(token)
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.refresh(token).status_code, 200)
+        checks = [query['sql'] for query in context.captured_queries if 'MAX(' in query['sql']]
+        self.assertEqual(len(checks), 2)
+        self.assertFalse([sql for sql in checks if 'COUNT(' in sql])
+
+    @override_settings(TOKEN_BLACKLIST_CHECK_INTERVAL=0)
+    def test_prunes_by_another_process_rebuild_the_filter(self):
+        token = UserClaimsRefreshToken.for_user(self.user)
+        token.blacklist()
+        self.assertTrue(blacklist_filter.might_contain(token['jti']))
+
+        # Pruned elsewhere: this process's filter is not reset
+        BlacklistedToken.objects.all().delete()
+        TokenPrune.objects.create(blacklisted=1)
+        self.assertFalse(blacklist_filter.might_contain(token['jti']))
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(capacity=2000, error_rate=0.01)
+        for i in range(2000):
+            bloom.add(f'jti-{i}')
+
+        self.assertTrue(all(f'jti-{i}' in bloom for i in range(2000)))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_prune_deletes_only_expired_tokens(self):
+        fresh = UserClaimsRefreshToken.for_user(self.user)
+        expired = [UserClaimsRefreshToken.for_user(self.user) for _ in range(5)]
+        for token in expired[:2]:
+            token.blacklist()
+        OutstandingToken.objects.filter(jti__in=[token['jti'] for token in expired]).update(
+            expires_at=timezone.now() - timedelta(days=1)
+        )
+
+        call_command('prune_tokens', batch_size=2, stdout=StringIO())
+
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [fresh['jti']])
+        self.assertFalse(BlacklistedToken.objects.exists())
+        self.assertEqual(TokenPrune.objects.get().blacklisted, 2)
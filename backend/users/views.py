@@ -1,7 +1,7 @@
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import UserClaimsRefreshToken
 from .models import User
 from .serializers import RegisterSerializer, LoginSerializer, UserSerializer
 
@@ -15,7 +15,7 @@ class RegisterView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
-        refresh = RefreshToken.for_user(user)
+        refresh = UserClaimsRefreshToken.for_user(user)
         return Response({
             "user": UserSerializer(user).data,
             "refresh": str(refresh),
@@ -32,7 +32,7 @@ class LoginView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data
-        refresh = RefreshToken.for_user(user)
+        refresh = UserClaimsRefreshToken.for_user(user)
         return Response({
             "user": UserSerializer(user).data,
             "refresh": str(refresh),